@@ -0,0 +1,288 @@
+"""
+Latency/throughput suite for the license API.
+
+Runs each scenario against a dataset from benchmarks.seed (seeded on the fly
+if the tag doesn't exist yet) and writes one JSON document per run: p50/p95/p99
+latency, requests per second, status counts and queries per request, plus the
+git commit, so runs can be compared across commits (benchmarks.compare).
+
+Drivers:
+  client   Django test client, in-process, one request at a time
+  server   real HTTP via benchmarks.loadgen: an in-process threaded runserver
+           (queries are counted), or --url for a server you started yourself
+           (gunicorn/uvicorn; queries per request are not visible then)
+
+    python -m benchmarks.api --driver client --requests 2000 --output base.json
+    python -m benchmarks.api --driver server --concurrency 64 --keys 1000000 --keep
+    python -m benchmarks.compare base.json head.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks import loadgen
+from benchmarks.seed import Dataset, cleanup, seed
+
+
+API = "/api/v1/licenses"
+
+
+def _check(ds, i, rnd):
+    return "GET", f"{API}/check/?" + urlencode({"license_key": ds.key(rnd.randrange(ds.keys))}), None, {}
+
+
+def _check_unknown(ds, i, rnd):
+    return "GET", f"{API}/check/?" + urlencode({"license_key": f"lk_{ds.tag}_missing_{i}"}), None, {}
+
+
+def _check_batch(ds, i, rnd):
+    keys = [ds.key(rnd.randrange(ds.keys)) for _ in range(100)]
+    return "POST", f"{API}/check/batch/", {"license_keys": keys}, {}
+
+
+def _activate(ds, i, rnd):
+    body = {"license_key": ds.key(rnd.randrange(ds.keys)), "instance_id": f"https://run{rnd.random():.8f}-{i}.example"}
+    return "POST", f"{API}/activate/", body, {}
+
+
+def _deactivate(ds, i, rnd):
+    body = {
+        "license_key": ds.key(rnd.randrange(ds.keys)),
+        "product_code": "p0",
+        "instance_id": ds.instance(rnd.randrange(max(ds.activations, 1))),
+    }
+    return "POST", f"{API}/deactivate/", body, {}
+
+
+def _provision(ds, i, rnd):
+    body = {"customer_email": f"new{i}.{rnd.random():.8f}@{ds.tag}.example", "product_codes": ["p0"]}
+    return "POST", f"{API}/provision/", body, {"X-API-Key": ds.api_keys[0]}
+
+
+def _lifecycle(ds, i, rnd):
+    n = rnd.randrange(ds.keys)
+    body = {"license_key": ds.key(n), "product_code": "p0", "action": "renew", "extend_days": 1}
+    return "POST", f"{API}/lifecycle/", body, {"X-API-Key": ds.api_keys[ds.brand_index(n)]}
+
+
+def _by_email(ds, i, rnd):
+    query = urlencode({"email": ds.email(rnd.randrange(ds.keys))})
+    return "GET", f"/api/v1/internal/licenses/by-email/?{query}", None, {"X-API-Key": ds.api_keys[0]}
+
+
+SCENARIOS = {
+    "check": _check,
+    "check_unknown": _check_unknown,
+    "check_batch": _check_batch,
+    "activate": _activate,
+    "deactivate": _deactivate,
+    "provision": _provision,
+    "lifecycle": _lifecycle,
+    "by_email": _by_email,
+}
+
+
+def drive_client(requests):
+    """One request at a time through the Django test client; counts queries per request."""
+    from django.db import connection
+    from django.test import Client
+
+    count = 0
+
+    def counter(execute, sql, params, many, context):
+        nonlocal count
+        count += 1
+        return execute(sql, params, many, context)
+
+    client = Client()
+    latencies, statuses, queries = [], {}, []
+    started = time.perf_counter()
+    for method, path, body, headers in requests:
+        count = 0
+        t0 = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            resp = client.generic(
+                method, path,
+                data=json.dumps(body) if body is not None else "",
+                content_type="application/json",
+                headers=headers,
+            )
+        latencies.append(time.perf_counter() - t0)
+        queries.append(count)
+        statuses[str(resp.status_code)] = statuses.get(str(resp.status_code), 0) + 1
+    result = loadgen.summarize(latencies, time.perf_counter() - started, statuses)
+    result["queries_per_request"] = round(sum(queries) / len(queries), 2) if queries else 0.0
+    result["max_queries"] = max(queries, default=0)
+    return result
+
+
+class CountingApp:
+    """WSGI wrapper that counts DB queries across all requests (server driver)."""
+
+    def __init__(self, app):
+        self.app = app
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        from django.db import connection
+
+        count = 0
+
+        def counter(execute, sql, params, many, context):
+            nonlocal count
+            count += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(counter):
+            result = self.app(environ, start_response)
+            try:
+                body = list(result)  # drain inside the wrapper so streamed queries count too
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+        with self._lock:
+            self.queries += count
+        return body
+
+
+def start_server():
+    """Threaded runserver on a free port; returns (host, port, counting_app, stop)."""
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    app = CountingApp(get_wsgi_application())
+    httpd = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+    httpd.set_app(app)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    def stop():
+        httpd.shutdown()
+        httpd.server_close()
+
+    return "127.0.0.1", httpd.server_address[1], app, stop
+
+
+def drive_server(requests, host, port, concurrency, app=None):
+    raw = [loadgen.build_request(method, path, f"{host}:{port}", body, headers) for method, path, body, headers in requests]
+    before = app.queries if app else 0
+    result = asyncio.run(loadgen.run(host, port, raw, concurrency))
+    if app:
+        result["queries_per_request"] = round((app.queries - before) / max(len(raw), 1), 2)
+    else:
+        result["queries_per_request"] = None
+    return result
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--driver", choices=["client", "server"], default="client")
+    parser.add_argument("--url", help="server driver: base URL of a running server (default: start one)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=50, help="Unrecorded requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="server driver only")
+    parser.add_argument("--tag", default="bench", help="Dataset tag (benchmarks.seed)")
+    parser.add_argument("--keys", type=int, default=10_000, help="Keys to seed if the tag doesn't exist")
+    parser.add_argument("--brands", type=int, default=3)
+    parser.add_argument("--keep", action="store_true", help="Keep a dataset this run had to seed")
+    parser.add_argument("--random-seed", type=int, default=1)
+    parser.add_argument("--output", help="Write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    ds = Dataset.load(args.tag)
+    seeded_here = ds is None
+    if seeded_here:
+        ds = Dataset(tag=args.tag, brands=args.brands, keys=args.keys)
+        started = time.monotonic()
+        seed(ds)
+        print(f"seeded {ds.keys} keys in {time.monotonic() - started:.1f}s", file=sys.stderr)
+
+    stop = app = None
+    logging.getLogger("django.request").setLevel(logging.ERROR)  # 403/404s are part of the mix
+    if args.driver == "client":
+        setup_test_environment()  # lets the test client through ALLOWED_HOSTS
+    elif args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port, app, stop = start_server()
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "driver": args.driver if not args.url else f"server:{args.url}",
+        "concurrency": args.concurrency if args.driver == "server" else 1,
+        "dataset": {
+            "brands": ds.brands, "products": ds.products, "keys": ds.keys,
+            "licenses_per_key": ds.licenses_per_key, "activations": ds.activations,
+        },
+        "scenarios": {},
+    }
+    try:
+        for name in scenarios:
+            rnd = random.Random(f"{args.random_seed}:{name}")
+            requests = [SCENARIOS[name](ds, i, rnd) for i in range(args.warmup + args.requests)]
+            warmup, measured = requests[:args.warmup], requests[args.warmup:]
+            if args.driver == "client":
+                drive_client(warmup)
+                result = drive_client(measured)
+            else:
+                drive_server(warmup, host, port, args.concurrency)
+                result = drive_server(measured, host, port, args.concurrency, app)
+            report["scenarios"][name] = result
+            print(f"{name}: {result['rps']} rps, p99 {result['p99_ms']} ms", file=sys.stderr)
+    finally:
+        if stop:
+            stop()
+        if seeded_here and not args.keep:
+            cleanup(ds.tag)
+
+    out = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(out + "\n")
+    else:
+        print(out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Side-by-side throughput of the sync (WSGI) and async (ASGI) product endpoints.
+
+Starts each server as a subprocess on a free local port, drives it with
+benchmarks.loadgen at high concurrency and prints one JSON report:
+
+  wsgi        gunicorn (gthread)  -> /api/v1/licenses/<endpoint>/        (DRF, sync)
+  asgi_sync   uvicorn             -> /api/v1/licenses/<endpoint>/        (DRF, thread hop)
+  asgi_async  uvicorn             -> /api/v1/async/licenses/<endpoint>/  (async_views)
+
+    python -m benchmarks.asgi_vs_wsgi --concurrency 256 --requests 20000 --workers 4
+
+Needs gunicorn and uvicorn on PATH (servers that are missing are skipped).
+Uses DJANGO_SETTINGS_MODULE (default benchmarks.settings, rate limiting off);
+seeds its own brand and removes it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from datetime import timedelta
+
+from benchmarks import loadgen
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on :{port} did not come up")
+
+
+SERVERS = {
+    "wsgi": lambda port, a: [
+        "gunicorn", "license_service.wsgi:application", "-b", f"127.0.0.1:{port}",
+        "-w", str(a.workers), "-k", "gthread", "--threads", str(a.threads), "--log-level", "warning",
+    ],
+    "asgi_sync": lambda port, a: [
+        "uvicorn", "license_service.asgi:application", "--port", str(port),
+        "--workers", str(a.workers), "--log-level", "warning", "--no-access-log",
+    ],
+}
+SERVERS["asgi_async"] = SERVERS["asgi_sync"]
+
+PREFIX = {"wsgi": "/api/v1/licenses", "asgi_sync": "/api/v1/licenses", "asgi_async": "/api/v1/async/licenses"}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--endpoint", choices=["check", "activate"], default="check")
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--keys", type=int, default=500, help="Distinct license keys to spread load over")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--servers", default="wsgi,asgi_sync,asgi_async")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.utils import timezone
+    from licenses.models import Brand, License, LicenseKey, Product
+
+    brand = Brand.objects.create(name=f"bench-asgi-{uuid.uuid4().hex[:8]}")
+    product = Product.objects.create(brand=brand, code="bench", name="Bench")
+    keys = LicenseKey.objects.bulk_create(
+        [
+            LicenseKey(brand=brand, customer_email=f"asgi{i}@example.com", key=LicenseKey.generate_key())
+            for i in range(args.keys)
+        ]
+    )
+    expires_at = timezone.now() + timedelta(days=1)
+    License.objects.bulk_create([License(license_key=lk, product=product, expires_at=expires_at) for lk in keys])
+    connection.close()
+
+    report = {"endpoint": args.endpoint, "concurrency": args.concurrency, "workers": args.workers, "results": {}}
+    try:
+        for name in args.servers.split(","):
+            port = _free_port()
+            cmd = SERVERS[name](port, args)
+            if not shutil.which(cmd[0]):
+                report["results"][name] = {"skipped": f"{cmd[0]} not installed"}
+                continue
+
+            host = f"127.0.0.1:{port}"
+            proc = subprocess.Popen(cmd, env=os.environ.copy())
+            try:
+                _wait_for_port(port)
+                requests = []
+                for i in range(args.requests):
+                    lk = keys[i % len(keys)]
+                    if args.endpoint == "check":
+                        requests.append(loadgen.build_request(
+                            "GET", f"{PREFIX[name]}/check/?license_key={lk.key}", host))
+                    else:
+                        requests.append(loadgen.build_request(
+                            "POST", f"{PREFIX[name]}/activate/", host,
+                            body={"license_key": lk.key, "instance_id": f"https://{name}-{i}.example"}))
+
+                # warm-up pass so worker startup and cold caches don't skew the numbers
+                asyncio.run(loadgen.run("127.0.0.1", port, requests[: min(500, len(requests))], args.concurrency))
+                report["results"][name] = asyncio.run(loadgen.run("127.0.0.1", port, requests, args.concurrency))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=20)
+    finally:
+        License.objects.filter(product=product).delete()
+        LicenseKey.objects.filter(brand=brand).delete()
+        product.delete()
+        brand.delete()
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""
+Compare two benchmarks.api JSON reports scenario by scenario.
+
+    python -m benchmarks.compare base.json head.json
+"""
+import argparse
+import json
+import sys
+
+METRICS = [("rps", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False), ("queries_per_request", False)]
+
+
+def _delta(old, new):
+    if old in (None, 0) or new is None:
+        return ""
+    return f"{(new - old) / old:+.1%}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    args = parser.parse_args(argv)
+
+    with open(args.base) as fh:
+        base = json.load(fh)
+    with open(args.head) as fh:
+        head = json.load(fh)
+
+    print(f"base {str(base.get('commit'))[:10]}  vs  head {str(head.get('commit'))[:10]}")
+    print(f"{'scenario':<16}{'metric':<22}{'base':>12}{'head':>12}{'delta':>10}")
+    for name, new in head["scenarios"].items():
+        old = base["scenarios"].get(name)
+        if old is None:
+            continue
+        for metric, higher_is_better in METRICS:
+            a, b = old.get(metric), new.get(metric)
+            if a is None and b is None:
+                continue
+            print(f"{name:<16}{metric + (' (+ better)' if higher_is_better else ''):<22}{a!s:>12}{b!s:>12}{_delta(a, b):>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
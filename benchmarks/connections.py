@@ -0,0 +1,166 @@
+"""
+Connection-setup overhead per DB_CONN_MODE under concurrent load.
+
+Runs one worker subprocess per mode with license_service.settings_production.
+Each worker emulates WSGI request handling on N threads: request_started, one
+query, request_finished (where Django closes or keeps the connection, exactly
+as in a real request), and reports latency, throughput and how many new
+connections were opened per request.
+
+  none        connect per request (Django's default)
+  persistent  CONN_MAX_AGE + health checks: one connection per thread
+  pool        psycopg pool (PostgreSQL only; needs psycopg[pool])
+
+With --engine sqlite the tuned (WAL + pragmas) and plain SQLite profiles are
+both run, so the cost of the per-connection init_command shows up too.
+
+    DB_HOST=... DB_PASSWORD=... python -m benchmarks.connections --threads 32
+    python -m benchmarks.connections --engine sqlite --db /tmp/bench.sqlite3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks import loadgen
+
+
+MODES = ["none", "persistent", "pool"]
+
+
+def worker(threads, requests, query):
+    import django
+    django.setup()
+
+    from django.core import signals
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+
+    connects = 0
+    lock = threading.Lock()
+
+    def count(sender, connection, **kwargs):
+        nonlocal connects
+        with lock:
+            connects += 1
+
+    connection_created.connect(count, weak=False)
+
+    latencies = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def run(slot):
+        barrier.wait()
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            signals.request_started.send(sender=__name__)
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(query)
+                    cursor.fetchall()
+            finally:
+                signals.request_finished.send(sender=__name__)
+            latencies[slot].append(time.perf_counter() - t0)
+        connection.close()
+
+    pool = [threading.Thread(target=run, args=(slot,)) for slot in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    result = loadgen.summarize([s for per_thread in latencies for s in per_thread], elapsed)
+    result["connects"] = connects
+    result["connects_per_request"] = round(connects / max(threads * requests, 1), 3)
+    db = connection.settings_dict
+    result["conn_max_age"] = db["CONN_MAX_AGE"]
+    if getattr(connection, "pool", None) is not None:
+        # with the pool, connection_created fires per checkout; this is the real count
+        result["pool"] = connection.pool.get_stats()
+    return result
+
+
+def run_mode(mode, args, extra_env):
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "license_service.settings_production",
+        "DB_ENGINE": args.engine,
+        "DB_CONN_MODE": mode,
+        **extra_env,
+    }
+    env.setdefault("DJANGO_SECRET_KEY", "benchmark-only")
+    if args.db:
+        env["DB_NAME"] = args.db
+    cmd = [
+        sys.executable, "-m", "benchmarks.connections", "--worker",
+        "--threads", str(args.threads), "--requests", str(args.requests), "--query", args.query,
+    ]
+    out = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if out.returncode:
+        return {"error": (out.stderr.strip().splitlines() or ["worker failed"])[-1]}
+    return json.loads(out.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--engine", choices=["postgresql", "sqlite"], default=os.environ.get("DB_ENGINE", "postgresql"))
+    parser.add_argument("--db", help="DB_NAME (database name, or file path for sqlite)")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated subset")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per thread")
+    parser.add_argument("--query", default="SELECT 1")
+    parser.add_argument("--output", help="Write JSON here instead of stdout")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(worker(args.threads, args.requests, args.query)))
+        return 0
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+
+    profiles = {}
+    for mode in modes:
+        if mode == "pool" and args.engine == "sqlite":
+            profiles[mode] = {"skipped": "the pool needs PostgreSQL"}
+            continue
+        if args.engine == "sqlite":
+            profiles[f"{mode}_tuned"] = run_mode(mode, args, {"DB_SQLITE_TUNED": "1"})
+            profiles[f"{mode}_plain"] = run_mode(mode, args, {"DB_SQLITE_TUNED": "0"})
+        else:
+            profiles[mode] = run_mode(mode, args, {})
+
+    for name, result in profiles.items():
+        if "rps" in result:
+            print(f"{name}: {result['rps']} rps, p99 {result['p99_ms']} ms, "
+                  f"{result['connects_per_request']} connects/request", file=sys.stderr)
+        else:
+            print(f"{name}: {result.get('skipped') or result.get('error')}", file=sys.stderr)
+
+    report = {
+        "engine": args.engine,
+        "threads": args.threads,
+        "requests_per_thread": args.requests,
+        "query": args.query,
+        "modes": profiles,
+    }
+    out = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(out + "\n")
+    else:
+        print(out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""
+Query plans and timings of the activation/license hot paths, before and after
+the index tuning in migration 0010.
+
+Seeds a dataset (benchmarks.seed) where most activations are revoked, as they
+are in a long-lived table, then runs each hot query on the old index set and
+on the new one, reporting EXPLAIN output and median time. The index swap is
+done in place with the schema editor and always undone, so the database ends
+up as migrated.
+
+    python -m benchmarks.explain                                  # 10M activations
+    python -m benchmarks.explain --keys 20000 --output plans.json # quick run
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+
+QUERIES = {}
+
+
+def query(fn):
+    QUERIES[fn.__name__] = fn
+    return fn
+
+
+@query
+def check_activations(sample):
+    """/check/ and batch check: live activations of a key's licenses."""
+    from licenses.models import Activation
+    return (
+        Activation.objects.filter(license_id__in=sample["license_ids"], revoked_at__isnull=True)
+        .values_list("license_id", "sent_instance_id")
+    )
+
+
+@query
+def seat_count(sample):
+    """enforce_seat_limits(): live seats held by other instances."""
+    from django.db.models import Count
+    from licenses.models import Activation
+    return (
+        Activation.objects.filter(license_id__in=sample["license_ids"], revoked_at__isnull=True)
+        .exclude(instance_id__in=[sample["instance_id"]])
+        .values("license_id").annotate(n=Count("id")).values_list("license_id", "n")
+    )
+
+
+@query
+def valid_licenses(sample):
+    """lock_active_licenses(): a key's valid, unexpired licenses."""
+    from django.utils import timezone
+    from licenses.models import License
+    return License.objects.filter(
+        license_key_id=sample["key_id"], status=License.STATUS_VALID, expires_at__gt=timezone.now()
+    ).values_list("id", "max_activations")
+
+
+@query
+def deactivate_lookup(sample):
+    """Deactivate: the live activation of one instance on one license."""
+    from licenses.models import Activation
+    return Activation.objects.filter(
+        license_id=sample["license_ids"][0], instance_id=sample["instance_id"], revoked_at__isnull=True
+    ).values_list("id")
+
+
+@query
+def instance_lookup(sample):
+    """Which licenses an instance is (or was) activated on."""
+    from licenses.models import Activation
+    return Activation.objects.filter(instance_id=sample["instance_id"]).values_list("license_id", "revoked_at")
+
+
+def index_sets():
+    """(old, new): the indexes migration 0010 removed and the ones it added."""
+    from django.db import models
+    from licenses.models import Activation, License
+
+    new = [(Activation, idx) for idx in Activation._meta.indexes] + [
+        (License, idx) for idx in License._meta.indexes if idx.name == "license_valid_by_key_idx"
+    ]
+    old = [
+        (Activation, models.Index(fields=["instance_id"], name="licenses_ac_instanc_66f950_idx")),
+        # stands in for the implicit FK index on activation.license_id
+        (Activation, models.Index(fields=["license"], name="bench_activation_license_fk")),
+    ]
+    return old, new
+
+
+def swap(remove, add):
+    from django.db import connection
+
+    with connection.schema_editor() as editor:
+        for model, index in add:
+            editor.add_index(model, index)
+        for model, index in remove:
+            editor.remove_index(model, index)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def measure(qs, repeat):
+    """Median ms of the query's SQL on a raw cursor, so ORM overhead doesn't blur the plans."""
+    from django.db import connection
+
+    sql, params = qs.query.sql_with_params()
+    timings = []
+    with connection.cursor() as cursor:
+        for _ in range(repeat + 1):  # the first run warms the page cache
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings[1:]) * 1000, 3)
+
+
+def index_sizes(indexes):
+    """{index name: bytes} where the backend can tell (SQLite dbstat, PostgreSQL)."""
+    from django.db import DatabaseError, connection
+
+    names = [index.name for _, index in indexes]
+    placeholders = ", ".join(["%s"] * len(names))
+    if connection.vendor == "sqlite":
+        sql = f"SELECT name, SUM(pgsize) FROM dbstat WHERE name IN ({placeholders}) GROUP BY name"
+    elif connection.vendor == "postgresql":
+        sql = f"SELECT relname, pg_relation_size(oid) FROM pg_class WHERE relname IN ({placeholders})"
+    else:
+        return {}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, names)
+            return dict(cursor.fetchall())
+    except DatabaseError:  # SQLite built without dbstat
+        return {}
+
+
+def run_queries(samples, repeat):
+    out = {}
+    for name, fn in QUERIES.items():
+        plan = fn(samples[0]).explain()
+        per_sample = [measure(fn(sample), repeat) for sample in samples]
+        out[name] = {"plan": plan.splitlines(), "median_ms": round(statistics.median(per_sample), 3)}
+    return out
+
+
+def pick_samples(ds, n):
+    """
+    n keys spread over the dataset, each with one extra live activation on a
+    unique instance (seeded instance_ids are shared by every license).
+    """
+    from licenses.models import Activation, License, LicenseKey
+
+    step = max(ds.keys // n, 1)
+    samples = []
+    for i in range(0, ds.keys, step)[:n]:
+        key_id = LicenseKey.objects.filter(key=ds.key(i)).values_list("id", flat=True).first()
+        samples.append({
+            "key_id": key_id,
+            "license_ids": list(License.objects.filter(license_key_id=key_id).values_list("id", flat=True)),
+            "instance_id": f"probe{i}.{ds.tag}.example",
+        })
+    Activation.objects.bulk_create(
+        [
+            Activation(license_id=s["license_ids"][0], instance_id=s["instance_id"], sent_instance_id=s["instance_id"])
+            for s in samples
+        ],
+        ignore_conflicts=True,
+    )
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tag", default="explain")
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--licenses-per-key", type=int, default=2)
+    parser.add_argument("--activations", type=int, default=5, help="Activations per license")
+    parser.add_argument("--live", type=int, default=1, help="Activations per license left unrevoked")
+    parser.add_argument("--samples", type=int, default=20, help="Keys to run each query for")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="Keep a dataset this run had to seed")
+    parser.add_argument("--output", help="Write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.utils import timezone
+    from licenses.models import Activation
+    from benchmarks.seed import Dataset, cleanup, seed
+
+    ds = Dataset.load(args.tag)
+    seeded_here = ds is None
+    if seeded_here:
+        ds = Dataset(
+            tag=args.tag, brands=1, products=args.licenses_per_key, keys=args.keys,
+            licenses_per_key=args.licenses_per_key, activations=args.activations,
+        )
+        started = time.monotonic()
+        counts = seed(ds, batch_size=20_000)
+        # revoked rows dominate a real table: instances come and go, rows stay
+        revoked = Activation.objects.filter(
+            instance_id__in=[ds.instance(j) for j in range(args.live, ds.activations)]
+        ).update(revoked_at=timezone.now())
+        print(f"seeded {counts['activations']} activations ({revoked} revoked) "
+              f"in {time.monotonic() - started:.1f}s", file=sys.stderr)
+
+    samples = pick_samples(ds, args.samples)
+    old, new = index_sets()
+    report = {
+        "database": connection.vendor,
+        "activations": Activation.objects.count(),
+        "live_activations": Activation.objects.filter(revoked_at__isnull=True).count(),
+    }
+    try:
+        swap(remove=new, add=old)
+        try:
+            report["before"] = {"index_bytes": index_sizes(old), "queries": run_queries(samples, args.repeat)}
+        finally:
+            swap(remove=old, add=new)
+        report["after"] = {"index_bytes": index_sizes(new), "queries": run_queries(samples, args.repeat)}
+    finally:
+        if seeded_here and not args.keep:
+            cleanup(ds.tag)
+
+    before, after = report["before"]["queries"], report["after"]["queries"]
+    for name in QUERIES:
+        print(f"{name}: {before[name]['median_ms']} ms -> {after[name]['median_ms']} ms", file=sys.stderr)
+    for phase in ("before", "after"):
+        print(f"{phase}: " + ", ".join(f"{k} {v // 1024} KiB" for k, v in report[phase]["index_bytes"].items()),
+              file=sys.stderr)
+    out = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(out + "\n")
+    else:
+        print(out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
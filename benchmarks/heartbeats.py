@@ -0,0 +1,88 @@
+"""
+Cost of Activation.last_seen_at heartbeats through the coalescing buffer.
+
+Records --heartbeats heartbeats spread over the activations of a seeded
+dataset (benchmarks.seed), as /check/?instance_id= would, then flushes once,
+and reports the recording rate, the UPDATE statements the flush issued and
+how long it took, next to the statement count of writing every heartbeat.
+
+    python -m benchmarks.heartbeats --heartbeats 1000000 --keys 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tag", default="heartbeat")
+    parser.add_argument("--keys", type=int, default=100_000, help="Keys to seed if the tag doesn't exist")
+    parser.add_argument("--heartbeats", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, help="Rows per UPDATE (default: LICENSE_HEARTBEATS)")
+    parser.add_argument("--keep", action="store_true", help="Keep a dataset this run had to seed")
+    parser.add_argument("--random-seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+    django.setup()
+
+    from django.db import connection
+    from licenses.heartbeats import heartbeats
+    from benchmarks.seed import Dataset, cleanup, seed
+
+    ds = Dataset.load(args.tag)
+    seeded_here = ds is None
+    if seeded_here:
+        ds = Dataset(tag=args.tag, brands=1, keys=args.keys)
+        seed(ds)
+    # seeded instance_ids repeat across every license; without statistics the
+    # planner would drive the flush from activation_instance_idx
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    if args.batch_size:
+        heartbeats.batch_size = args.batch_size
+
+    # heartbeats arrive from instances of every key, many times each
+    rnd = random.Random(args.random_seed)
+    calls = [
+        (ds.key(rnd.randrange(ds.keys)), ds.instance(rnd.randrange(max(ds.activations, 1))))
+        for _ in range(args.heartbeats)
+    ]
+    heartbeats.reset()
+    started = time.perf_counter()
+    for key, instance_id in calls:
+        heartbeats.record(key, instance_id)
+    record_seconds = time.perf_counter() - started
+    pending = heartbeats.pending()
+
+    try:
+        started = time.perf_counter()
+        updated = heartbeats.flush()
+        flush_seconds = time.perf_counter() - started
+    finally:
+        if seeded_here and not args.keep:
+            cleanup(ds.tag)
+
+    stats = heartbeats.stats()
+    report = {
+        "database": connection.vendor,
+        "activations": ds.keys * ds.licenses_per_key * ds.activations,
+        "heartbeats": args.heartbeats,
+        "record_per_second": round(args.heartbeats / record_seconds),
+        "record_ns_each": round(record_seconds / args.heartbeats * 1e9),
+        "coalesced_pairs": pending,
+        "rows_updated": updated,
+        "update_statements": stats["statements"],
+        "statements_without_buffer": args.heartbeats,
+        "flush_seconds": round(flush_seconds, 3),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Tiny closed-loop HTTP/1.1 load generator (asyncio, keep-alive, stdlib only).
+
+Good enough to compare server setups on one machine; not a replacement for
+wrk/k6 when you need open-loop arrival rates.
+"""
+import asyncio
+import json
+import time
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies, elapsed, statuses=None):
+    """Latencies in seconds -> JSON-friendly dict (ms)."""
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "seconds": round(elapsed, 4),
+        "rps": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        **({"statuses": statuses} if statuses is not None else {}),
+    }
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("server closed connection")
+    status = int(status_line.split()[1])
+    # HTTP/1.0 servers (wsgiref and friends) close unless told otherwise
+    length, chunked, close = 0, False, status_line.startswith(b"HTTP/1.0")
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding" and "chunked" in value:
+            chunked = True
+        elif name == "connection":
+            close = value == "close" or (close and value != "keep-alive")
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status, close
+
+
+def build_request(method, path, host, body=None, headers=None):
+    payload = b""
+    lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", "Connection: keep-alive"]
+    if body is not None:
+        payload = json.dumps(body).encode()
+        lines += ["Content-Type: application/json", f"Content-Length: {len(payload)}"]
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode() + payload
+
+
+async def run(host, port, requests, concurrency):
+    """
+    Send every raw request in `requests` (bytes, see build_request) using
+    `concurrency` keep-alive connections. Returns summarize(...) output.
+    """
+    queue = asyncio.Queue()
+    for raw in requests:
+        queue.put_nowait(raw)
+    latencies, statuses = [], {}
+
+    async def worker():
+        reader = writer = None
+        while True:
+            try:
+                raw = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            for attempt in range(2):
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(host, port)
+                    started = time.perf_counter()
+                    writer.write(raw)
+                    await writer.drain()
+                    status, close = await _read_response(reader)
+                    latencies.append(time.perf_counter() - started)
+                    statuses[str(status)] = statuses.get(str(status), 0) + 1
+                    if close:
+                        writer.close()
+                        writer = None
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                    writer = None
+                    if attempt:
+                        statuses["error"] = statuses.get("error", 0) + 1
+        if writer is not None:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, statuses)
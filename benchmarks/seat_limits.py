@@ -0,0 +1,108 @@
+"""
+Seat-limit load test.
+
+Fires N parallel activations (distinct instance_ids) at ONE license key whose
+product allows `--limit` seats and checks that no more than `--limit` ever land.
+Then fires the same number of activations at N DISTINCT keys to show that the
+per-license row lock doesn't serialize unrelated traffic.
+
+    python -m benchmarks.seat_limits --threads 64 --limit 5
+
+Run it against PostgreSQL for meaningful numbers: SQLite has no row locks and
+serializes all writers (use OPTIONS {"transaction_mode": "IMMEDIATE"} there). Creates its own brand and cleans it up afterwards.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.utils import timezone
+    from licenses.models import Activation, Brand, License, LicenseKey, Product
+
+    setup_test_environment()  # lets the test client through ALLOWED_HOSTS
+    logging.getLogger("django.request").setLevel(logging.ERROR)  # 409s are expected here
+
+    brand = Brand.objects.create(name=f"bench-seats-{uuid.uuid4().hex[:8]}")
+    product = Product.objects.create(brand=brand, code="seats", name="Seats", max_activations=args.limit)
+    expires_at = timezone.now() + timedelta(days=1)
+    keys = LicenseKey.objects.bulk_create(
+        [
+            LicenseKey(brand=brand, customer_email=f"seat{i}@example.com", key=LicenseKey.generate_key())
+            for i in range(args.threads + 1)
+        ]
+    )
+    License.objects.bulk_create(
+        [License(license_key=lk, product=product, max_activations=args.limit, expires_at=expires_at) for lk in keys]
+    )
+    shared, distinct = keys[0], keys[1:]
+
+    def activate(key, instance_id):
+        try:
+            resp = Client().post(
+                "/api/v1/licenses/activate/",
+                {"license_key": key, "instance_id": instance_id},
+                content_type="application/json",
+            )
+            return resp.status_code
+        except Exception as exc:  # e.g. "database is locked" on SQLite
+            return type(exc).__name__
+        finally:
+            connection.close()
+
+    def run(jobs):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            results = list(pool.map(lambda job: activate(*job), jobs))
+        elapsed = time.perf_counter() - started
+        summary = {}
+        for r in results:
+            summary[str(r)] = summary.get(str(r), 0) + 1
+        return {"requests": len(jobs), "seconds": round(elapsed, 4), "rps": round(len(jobs) / elapsed, 1),
+                "statuses": summary}
+
+    try:
+        same_key = run([(shared.key, f"https://site{i}.example") for i in range(args.threads)])
+        same_key["active_seats"] = Activation.objects.filter(
+            license__license_key=shared, revoked_at__isnull=True
+        ).count()
+        same_key["limit"] = args.limit
+        same_key["ok"] = same_key["active_seats"] <= args.limit
+
+        distinct_keys = run([(lk.key, "https://site.example") for lk in distinct])
+
+        report = {
+            "vendor": connection.vendor,
+            "threads": args.threads,
+            "same_key": same_key,
+            "distinct_keys": distinct_keys,
+        }
+        print(json.dumps(report, indent=2))
+        return 0 if same_key["ok"] else 1
+    finally:
+        Activation.objects.filter(license__product=product).delete()
+        LicenseKey.objects.filter(brand=brand).delete()
+        product.delete()
+        brand.delete()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
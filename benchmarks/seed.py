@@ -0,0 +1,203 @@
+"""
+Seed a synthetic dataset at configurable scale, with chunked bulk inserts.
+
+Keys are deterministic (lk_<tag>_<index>) so drivers can pick existing keys,
+emails and activated instance_ids without reading them back from the database.
+
+    python -m benchmarks.seed --keys 1000000 --brands 10 --products 5
+    python -m benchmarks.seed --cleanup
+
+Every brand is named "<tag>-brand-<n>"; --cleanup removes the whole tag.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+
+
+@dataclass
+class Dataset:
+    tag: str = "bench"
+    brands: int = 3
+    products: int = 3            # per brand
+    keys: int = 10_000           # spread over brands round-robin
+    licenses_per_key: int = 2    # products p0..p<n-1> of the key's brand
+    activations: int = 1         # per license: instance_ids site0..site<n-1>
+    keys_per_email: int = 2      # same customer across brands (by-email fan-out)
+    api_keys: list = field(default_factory=list)  # brand index -> API key
+
+    def key(self, i):
+        return f"lk_{self.tag}_{i:09d}"
+
+    def email(self, i):
+        # a customer has at most one key per brand (uniq_brand_customer_email)
+        return f"user{i // min(self.keys_per_email, self.brands)}@{self.tag}.example"
+
+    def brand_index(self, i):
+        return i % self.brands
+
+    def brand_name(self, b):
+        return f"{self.tag}-brand-{b}"
+
+    def instance(self, j):
+        # stored as the API stores it (normalize_instance_id): no scheme
+        return f"site{j}.{self.tag}.example"
+
+    @classmethod
+    def load(cls, tag):
+        """Rebuild the description of an already seeded tag from the database."""
+        from licenses.models import Activation, Brand, License, LicenseKey
+
+        brands = list(Brand.objects.filter(name__startswith=f"{tag}-brand-"))
+        if not brands:
+            return None
+        brands.sort(key=lambda b: int(b.name.rsplit("-", 1)[1]))
+        first = LicenseKey.objects.filter(key=f"lk_{tag}_{0:09d}").first()
+        return cls(
+            tag=tag,
+            brands=len(brands),
+            products=brands[0].products.count(),
+            keys=LicenseKey.objects.filter(key__startswith=f"lk_{tag}_").count(),
+            licenses_per_key=License.objects.filter(license_key=first).count() if first else 0,
+            activations=Activation.objects.filter(license__license_key=first).values("instance_id").distinct().count()
+            if first else 0,
+            keys_per_email=LicenseKey.objects.filter(customer_email=first.customer_email).count() if first else 1,
+            api_keys=[b.api_key for b in brands],
+        )
+
+
+def seed(ds, *, batch_size=5000, on_batch=None):
+    """
+    Insert ds.brands brands, their products, then keys/licenses/activations in
+    chunks of batch_size keys (one transaction per chunk). Fills ds.api_keys.
+    Returns row counts.
+    """
+    from django.db import transaction
+    from django.utils import timezone
+    from licenses.models import Activation, Brand, License, LicenseKey, Product
+
+    brands = Brand.objects.bulk_create([Brand(name=ds.brand_name(b)) for b in range(ds.brands)])
+    ds.api_keys = [b.api_key for b in brands]
+    products = Product.objects.bulk_create(
+        [Product(brand=brand, code=f"p{p}", name=f"Product {p}") for brand in brands for p in range(ds.products)]
+    )
+    products_by_brand = [products[b * ds.products:(b + 1) * ds.products] for b in range(ds.brands)]
+
+    now = timezone.now()
+    counts = {"brands": len(brands), "products": len(products), "keys": 0, "licenses": 0, "activations": 0}
+    for start in range(0, ds.keys, batch_size):
+        started = time.monotonic()
+        with transaction.atomic():
+            keys = LicenseKey.objects.bulk_create(
+                [
+                    LicenseKey(brand=brands[ds.brand_index(i)], customer_email=ds.email(i), key=ds.key(i))
+                    for i in range(start, min(start + batch_size, ds.keys))
+                ]
+            )
+            licenses = License.objects.bulk_create(
+                [
+                    License(
+                        license_key=lk,
+                        product=product,
+                        # a few suspended / already-lapsed licenses, like a real table
+                        status=License.STATUS_SUSPENDED if (start + n) % 50 == 0 else License.STATUS_VALID,
+                        expires_at=now + timedelta(days=-1 if (start + n) % 97 == 0 else 365),
+                    )
+                    for n, lk in enumerate(keys)
+                    for product in products_by_brand[ds.brand_index(start + n)][:ds.licenses_per_key]
+                ]
+            )
+            activations = Activation.objects.bulk_create(
+                [
+                    Activation(license=lic, instance_id=ds.instance(j), sent_instance_id=ds.instance(j))
+                    for lic in licenses for j in range(ds.activations)
+                ]
+            )
+        counts["keys"] += len(keys)
+        counts["licenses"] += len(licenses)
+        counts["activations"] += len(activations)
+        if on_batch:
+            on_batch(start // batch_size + 1, len(keys) + len(licenses) + len(activations), time.monotonic() - started)
+    return counts
+
+
+def cleanup(tag, *, batch_size=10_000):
+    """Delete everything under the tag's brands, in key-pk chunks."""
+    from django.db import transaction
+    from licenses.models import Activation, Brand, License, LicenseKey, Product
+
+    brands = list(Brand.objects.filter(name__startswith=f"{tag}-brand-").values_list("pk", flat=True))
+    last_pk = 0
+    while True:
+        pks = list(
+            LicenseKey.objects.filter(brand_id__in=brands, pk__gt=last_pk)
+            .order_by("pk").values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            break
+        with transaction.atomic():
+            Activation.objects.filter(license__license_key_id__in=pks).delete()
+            License.objects.filter(license_key_id__in=pks).delete()
+            LicenseKey.objects.filter(pk__in=pks).delete()
+        last_pk = pks[-1]
+    Product.objects.filter(brand_id__in=brands).delete()
+    Brand.objects.filter(pk__in=brands).delete()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tag", default="bench")
+    parser.add_argument("--brands", type=int, default=3)
+    parser.add_argument("--products", type=int, default=3, help="Products per brand")
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--licenses-per-key", type=int, default=2)
+    parser.add_argument("--activations", type=int, default=1, help="Activations per license")
+    parser.add_argument("--keys-per-email", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--cleanup", action="store_true", help="Delete the tag's data instead of seeding")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+    django.setup()
+
+    started = time.monotonic()
+    if args.cleanup:
+        cleanup(args.tag)
+        print(json.dumps({"cleanup": args.tag, "seconds": round(time.monotonic() - started, 2)}))
+        return 0
+
+    if Dataset.load(args.tag):
+        print(f"tag {args.tag!r} is already seeded; run with --cleanup first", file=sys.stderr)
+        return 1
+
+    ds = Dataset(
+        tag=args.tag,
+        brands=args.brands,
+        products=args.products,
+        keys=args.keys,
+        licenses_per_key=min(args.licenses_per_key, args.products),
+        activations=args.activations,
+        keys_per_email=args.keys_per_email,
+    )
+
+    def on_batch(batch_no, rows, seconds):
+        print(f"batch {batch_no}: {rows} rows in {seconds * 1000:.0f} ms", file=sys.stderr)
+
+    counts = seed(ds, batch_size=args.batch_size, on_batch=on_batch)
+    elapsed = time.monotonic() - started
+    rows = sum(counts.values())
+    print(json.dumps({
+        "dataset": {k: v for k, v in asdict(ds).items() if k != "api_keys"},
+        "rows": counts,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(rows / elapsed),
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
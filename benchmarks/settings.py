@@ -0,0 +1,10 @@
+"""
+Settings for the benchmarks: the project settings with rate limiting off, since
+a load generator on one IP would otherwise mostly measure 429s.
+
+    DJANGO_SETTINGS_MODULE=benchmarks.settings python -m benchmarks.asgi_vs_wsgi
+"""
+from license_service.settings import *  # noqa: F401,F403
+from license_service.settings import LICENSE_RATE_LIMIT
+
+LICENSE_RATE_LIMIT = {**LICENSE_RATE_LIMIT, "ENABLED": False}
@@ -0,0 +1,231 @@
+"""
+Offline license token helper for end-user products.
+
+The license service returns a compact signed token from /activate/ and from
+/check/?instance_id=... . A product stores it and calls `verify_token()` on
+startup instead of hitting /check/; it only needs to call back once the
+token's refresh deadline (`rdl`) has passed or verification fails.
+
+Token format (all parts base64url, no padding):
+
+    v2.<payload>.<signature>
+
+payload   canonical JSON (sorted keys, no whitespace):
+          {"alg": "EdDSA", "brand": ..., "key": ..., "instance": ...,
+           "products": {"<code>": <expires_at epoch>, ...},
+           "iat": <issued epoch>, "rdl": <refresh deadline epoch>}
+signature Ed25519 (RFC 8032) over "v2." + <payload>, made with the brand's
+          private signing key
+
+Products ship only the brand's public key (Brand.verify_key, shown in the
+admin): it verifies tokens but can't make them. The private key never leaves
+the service.
+
+Standard library only, so it can be vendored into any Python product. The
+Ed25519 arithmetic is plain Python: about a millisecond to sign and a few to
+verify, which is fine once per startup; it is not constant-time, which only
+matters to the signing side, and that runs on the service.
+"""
+import base64
+import functools
+import hashlib
+import json
+import time
+
+VERSION = "v2"
+ALGORITHM = "EdDSA"
+
+
+class TokenError(Exception):
+    pass
+
+
+class InvalidToken(TokenError):
+    pass
+
+
+class ExpiredToken(TokenError):
+    """Signature is fine but the refresh deadline has passed: call /check/ again."""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def canonical_json(payload: dict) -> bytes:
+    return json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+
+
+# Ed25519 over edwards25519, points in extended coordinates (X, Y, Z, T), x = X/Z, y = Y/Z, xy = T/Z.
+_P = 2**255 - 19
+_L = 2**252 + 27742317777372353535851937790883648493
+_D = -121665 * pow(121666, _P - 2, _P) % _P
+_SQRT_M1 = pow(2, (_P - 1) // 4, _P)
+_IDENTITY = (0, 1, 1, 0)
+
+
+def _add(p, q):
+    a = (p[1] - p[0]) * (q[1] - q[0]) % _P
+    b = (p[1] + p[0]) * (q[1] + q[0]) % _P
+    c = 2 * p[3] * q[3] * _D % _P
+    d = 2 * p[2] * q[2] % _P
+    e, f, g, h = b - a, d - c, d + c, b + a
+    return (e * f % _P, g * h % _P, f * g % _P, e * h % _P)
+
+
+def _mul(scalar, point):
+    result = _IDENTITY
+    while scalar:
+        if scalar & 1:
+            result = _add(result, point)
+        point = _add(point, point)
+        scalar >>= 1
+    return result
+
+
+def _recover_x(y, sign):
+    if y >= _P:
+        return None
+    x2 = (y * y - 1) * pow(_D * y * y + 1, _P - 2, _P) % _P
+    if x2 == 0:
+        return None if sign else 0
+    x = pow(x2, (_P + 3) // 8, _P)
+    if (x * x - x2) % _P:
+        x = x * _SQRT_M1 % _P
+        if (x * x - x2) % _P:
+            return None
+    return _P - x if x & 1 != sign else x
+
+
+def _compress(point):
+    z_inv = pow(point[2], _P - 2, _P)
+    x, y = point[0] * z_inv % _P, point[1] * z_inv % _P
+    return (y | (x & 1) << 255).to_bytes(32, "little")
+
+
+def _decompress(data):
+    if len(data) != 32:
+        return None
+    y = int.from_bytes(data, "little")
+    sign, y = y >> 255, y & ((1 << 255) - 1)
+    x = _recover_x(y, sign)
+    return None if x is None else (x, y, 1, x * y % _P)
+
+
+@functools.lru_cache(maxsize=None)
+def _base_powers():
+    # 2^i * B for every bit of a scalar mod L, so multiples of B are additions only
+    y = 4 * pow(5, _P - 2, _P) % _P
+    x = _recover_x(y, 0)
+    point, powers = (x, y, 1, x * y % _P), []
+    for _ in range(_L.bit_length()):
+        powers.append(point)
+        point = _add(point, point)
+    return powers
+
+
+def _base_mul(scalar):
+    result = _IDENTITY
+    for i, point in enumerate(_base_powers()):
+        if scalar >> i & 1:
+            result = _add(result, point)
+    return result
+
+
+def _hash_int(*parts):
+    return int.from_bytes(hashlib.sha512(b"".join(parts)).digest(), "little")
+
+
+class SigningKey:
+    """A brand's private Ed25519 key (base64url 32-byte seed). Service side only."""
+
+    def __init__(self, seed: str):
+        digest = hashlib.sha512(_b64decode(seed)).digest()
+        self._scalar = (int.from_bytes(digest[:32], "little") & ((1 << 254) - 8) | 1 << 254) % _L
+        self._prefix = digest[32:]
+        self._public = _compress(_base_mul(self._scalar))
+        self.verify_key = _b64encode(self._public)
+
+    def sign(self, message: bytes) -> bytes:
+        r = _hash_int(self._prefix, message) % _L
+        encoded_r = _compress(_base_mul(r))
+        k = _hash_int(encoded_r, self._public, message) % _L
+        return encoded_r + ((r + k * self._scalar) % _L).to_bytes(32, "little")
+
+
+def _verify(verify_key: str, message: bytes, signature: bytes) -> bool:
+    try:
+        public = _b64decode(verify_key)
+    except ValueError:
+        return False
+    point_a = _decompress(public)
+    if point_a is None or len(signature) != 64:
+        return False
+    point_r = _decompress(signature[:32])
+    s = int.from_bytes(signature[32:], "little")
+    if point_r is None or s >= _L:
+        return False
+    k = _hash_int(signature[:32], public, message) % _L
+    # [s]B == R + [k]A, compared projectively
+    left, right = _base_mul(s), _add(point_r, _mul(k, point_a))
+    return (left[0] * right[2] - right[0] * left[2]) % _P == 0 and (left[1] * right[2] - right[1] * left[2]) % _P == 0
+
+
+def sign_token(payload: dict, signing_key: SigningKey) -> str:
+    signing_input = f"{VERSION}.{_b64encode(canonical_json(payload))}"
+    return f"{signing_input}.{_b64encode(signing_key.sign(signing_input.encode()))}"
+
+
+def decode_token(token: str) -> dict:
+    """Payload without verifying it (for display/debugging only)."""
+    try:
+        version, body, _sig = token.split(".")
+        if version != VERSION:
+            raise InvalidToken(f"unsupported token version {version!r}")
+        return json.loads(_b64decode(body))
+    except (ValueError, TypeError) as exc:
+        raise InvalidToken("malformed token") from exc
+
+
+def verify_token(token: str, verify_key: str, *, instance_id=None, product=None, now=None) -> dict:
+    """
+    Verify `token` with the brand's public key and return its payload.
+
+    instance_id: reject tokens issued for another site/machine
+    product:     require an unexpired entitlement to this product code
+    Tokens entitling no product at all are always rejected.
+    Raises InvalidToken or ExpiredToken.
+    """
+    try:
+        version, body, sig = token.split(".")
+    except (ValueError, AttributeError) as exc:
+        raise InvalidToken("malformed token") from exc
+
+    if version != VERSION:
+        raise InvalidToken(f"unsupported token version {version!r}")
+    try:
+        valid = _verify(verify_key, f"{version}.{body}".encode(), _b64decode(sig))
+    except ValueError:
+        valid = False
+    if not valid:
+        raise InvalidToken("bad signature")
+
+    payload = decode_token(token)
+    if payload.get("alg") != ALGORITHM:
+        raise InvalidToken(f"unsupported algorithm {payload.get('alg')!r}")
+
+    now = time.time() if now is None else now
+    if payload["rdl"] <= now:
+        raise ExpiredToken("refresh deadline passed")
+    if not payload.get("products"):
+        raise InvalidToken("token carries no entitlements")
+    if instance_id is not None and payload["instance"] != instance_id:
+        raise InvalidToken("token was issued for another instance")
+    if product is not None and payload["products"].get(product, 0) <= now:
+        raise InvalidToken(f"no active entitlement for {product!r}")
+
+    return payload
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'license_service.settings')
 
 application = get_asgi_application()
+
+# the license key filter scans every key; do it now, off the request path
+from licenses.keyfilter import key_filter  # noqa: E402
+
+key_filter.build_in_background()
@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'licenses.metrics.MetricsMiddleware',  # first, so it times the whole stack
+    'licenses.routers.ReadReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,6 +85,18 @@ DATABASES = {
     }
 }
 
+# Read replicas: add their aliases to DATABASES and list them in
+# LICENSE_DB_ROUTING["REPLICAS"]; check/by-email reads then go to a replica
+# (licenses/routers.py). Writes always use the primary.
+DATABASE_ROUTERS = ["licenses.routers.ReplicaRouter"]
+
+LICENSE_DB_ROUTING = {
+    "PRIMARY": "default",
+    "REPLICAS": [],
+    "SELECTION": "round_robin",  # or "least_latency"
+    "PIN_SECONDS": 5,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -108,6 +122,9 @@ REST_FRAMEWORK = {
   "DEFAULT_PERMISSION_CLASSES": [
     "rest_framework.permissions.AllowAny",
   ],
+  # client ident for the per-IP rate limit: REMOTE_ADDR only. Unset, DRF takes the
+  # client's own X-Forwarded-For; set it to the number of trusted proxies in front.
+  "NUM_PROXIES": 0,
 }
 
 
@@ -129,3 +146,83 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+
+# Caching
+# LocMemCache is per-process; point "default" at Redis/Memcached in prod so the
+# /check/ cache is shared across workers.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+LICENSE_CHECK_CACHE = {
+    "ALIAS": "default",
+    "TIMEOUT": 300,
+    "LOCAL_TIMEOUT": 5,
+    "LOCAL_MAXSIZE": 10_000,
+}
+
+# Brand API key -> Brand, per process (licenses/auth.py)
+LICENSE_BRAND_AUTH_CACHE = {
+    "TTL": 300,
+    "NEGATIVE_TTL": 30,
+    "MAXSIZE": 10_000,
+}
+
+# Offline license tokens: products re-check at most this often (seconds)
+LICENSE_TOKEN_TTL = 3 * 24 * 3600
+# Brand signing keys are cached per process this long (seconds): the most any
+# worker keeps signing with a key after rotate_signing_key()
+LICENSE_SIGNING_KEY_TTL = 30
+
+# Unauthenticated product endpoints (activate/check/deactivate), licenses/throttling.py.
+# BACKEND "local" limits per process; "cache" shares counters through CACHES[ALIAS].
+LICENSE_RATE_LIMIT = {
+    "ENABLED": True,
+    "BACKEND": "local",
+    "ALIAS": "default",
+    "RATES": {
+        "ip": "600/min",
+        "license_key": "120/min",
+    },
+    "MAXSIZE": 100_000,
+}
+
+# Per-process Bloom filter of license keys: unknown keys get a 404 without a DB
+# lookup (licenses/keyfilter.py). New keys reach other processes via CACHES[ALIAS].
+LICENSE_KEY_FILTER = {
+    "ENABLED": True,
+    "FALSE_POSITIVE_RATE": 0.01,
+    "MIN_CAPACITY": 100_000,
+    "ALIAS": "default",
+    # whether CACHES[ALIAS] is shared by every process (None: guess from the backend).
+    # The filter only rejects keys with a shared cache; with this file's LocMemCache
+    # it is off in effect and every lookup goes to the database.
+    "SHARED": False,
+    "SYNC_INTERVAL": 5,
+}
+
+# Per-URL-name latency / SQL / size metrics served at /metrics (licenses/metrics.py).
+# SLOW_REQUEST_MS logs slower requests with their SQL to "licenses.slow_requests".
+LICENSE_METRICS = {
+    "ENABLED": True,
+    "SLOW_REQUEST_MS": None,
+}
+
+# Activation.last_seen_at heartbeats, coalesced per process (licenses/heartbeats.py).
+# AUTOSTART runs the flusher thread in every process that loads the app, web
+# workers included (they record heartbeats); without it they're only written
+# by an explicit heartbeats.flush().
+LICENSE_HEARTBEATS = {
+    "ENABLED": True,
+    "AUTOSTART": True,
+    "FLUSH_INTERVAL": 30,
+    "BATCH_SIZE": 1000,
+}
+
+# gc_activations --stale-days floor: last_seen_at only moves on activation and
+# /check/?instance_id=, so this must stay well above how often clients check
+LICENSE_STALE_MIN_DAYS = 7
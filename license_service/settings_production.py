@@ -0,0 +1,151 @@
+"""
+Production profile: the base settings plus everything deployment-specific,
+read from the environment.
+
+    DJANGO_SETTINGS_MODULE=license_service.settings_production
+
+Django:
+    DJANGO_SECRET_KEY (required), DJANGO_ALLOWED_HOSTS (comma-separated), DJANGO_DEBUG
+
+Database, DB_ENGINE=postgresql (default):
+    DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+    DB_CONN_MODE        persistent (default): reuse a connection per worker thread
+                          for DB_CONN_MAX_AGE seconds, health-checked before reuse
+                        pool: psycopg's native pool, DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE /
+                          DB_POOL_TIMEOUT (needs psycopg[pool])
+                        none: connect per request (Django's default)
+    DB_REPLICA_HOSTS    read replicas (comma-separated hosts, same name/credentials),
+                        routed by licenses/routers.py; DB_REPLICA_SELECTION picks
+                        round_robin or least_latency
+
+Database, DB_ENGINE=sqlite (single node):
+    DB_NAME             file path (default: db.sqlite3 next to manage.py)
+    DB_CONN_MODE        persistent (default) or none
+    DB_SQLITE_TUNED     1 (default): WAL journal + the pragmas in SQLITE_OPTIONS
+
+Proxies:
+    NUM_PROXIES         trusted reverse proxies in front of the app (default 0); the
+                        per-IP rate limit reads the client address that many hops
+                        back in X-Forwarded-For, or REMOTE_ADDR when 0
+
+Cache:
+    CACHE_URL           redis://... shares the /check/ cache, rate limits, replica
+                        pins and key filter generations across workers (default:
+                        per-process LocMemCache). Without it the license key filter
+                        can't reject unknown keys, and every lookup hits the database
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, LICENSE_DB_ROUTING, LICENSE_KEY_FILTER, REST_FRAMEWORK
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    return default if value is None else value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_list(name):
+    return [item.strip() for item in os.environ.get(name, "").split(",") if item.strip()]
+
+
+SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY")
+if not SECRET_KEY:
+    raise ImproperlyConfigured("DJANGO_SECRET_KEY must be set")
+DEBUG = env_bool("DJANGO_DEBUG", False)
+ALLOWED_HOSTS = env_list("DJANGO_ALLOWED_HOSTS")
+
+
+REST_FRAMEWORK = {**REST_FRAMEWORK, "NUM_PROXIES": env_int("NUM_PROXIES", 0)}
+
+
+DB_ENGINE = os.environ.get("DB_ENGINE", "postgresql")
+DB_CONN_MODE = os.environ.get("DB_CONN_MODE", "persistent")
+if DB_CONN_MODE not in ("persistent", "pool", "none"):
+    raise ImproperlyConfigured(f"DB_CONN_MODE must be persistent, pool or none, not {DB_CONN_MODE!r}")
+
+if DB_CONN_MODE == "persistent":
+    CONNECTION_SETTINGS = {
+        "CONN_MAX_AGE": env_int("DB_CONN_MAX_AGE", 60),
+        # ping a reused connection once per request before handing it out
+        "CONN_HEALTH_CHECKS": True,
+    }
+else:
+    # the pool does its own reuse; Django refuses CONN_MAX_AGE alongside it
+    CONNECTION_SETTINGS = {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False}
+
+SQLITE_OPTIONS = {
+    # take the write lock at BEGIN, so concurrent writers wait (timeout) instead
+    # of failing with "database is locked" when a read transaction upgrades
+    "transaction_mode": "IMMEDIATE",
+    "timeout": 20,
+    "init_command": (
+        "PRAGMA journal_mode=WAL;"        # readers don't block the writer and vice versa
+        "PRAGMA synchronous=NORMAL;"      # fsync at checkpoints only; safe with WAL
+        "PRAGMA temp_store=MEMORY;"
+        "PRAGMA cache_size=-65536;"       # 64 MiB page cache per connection
+        "PRAGMA mmap_size=268435456;"     # 256 MiB memory-mapped reads
+    ),
+}
+
+
+def postgres(host):
+    options = {}
+    if DB_CONN_MODE == "pool":
+        options["pool"] = {
+            "min_size": env_int("DB_POOL_MIN_SIZE", 2),
+            "max_size": env_int("DB_POOL_MAX_SIZE", 10),
+            "timeout": env_int("DB_POOL_TIMEOUT", 10),
+        }
+    return {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("DB_NAME", "license_service"),
+        "USER": os.environ.get("DB_USER", "license_service"),
+        "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+        "HOST": host,
+        "PORT": os.environ.get("DB_PORT", "5432"),
+        "OPTIONS": options,
+        **CONNECTION_SETTINGS,
+    }
+
+
+if DB_ENGINE == "postgresql":
+    DATABASES = {"default": postgres(os.environ.get("DB_HOST", "localhost"))}
+    replicas = []
+    for n, host in enumerate(env_list("DB_REPLICA_HOSTS")):
+        DATABASES[f"replica{n}"] = {**postgres(host), "TEST": {"MIRROR": "default"}}
+        replicas.append(f"replica{n}")
+    LICENSE_DB_ROUTING = {
+        **LICENSE_DB_ROUTING,
+        "REPLICAS": replicas,
+        "SELECTION": os.environ.get("DB_REPLICA_SELECTION", LICENSE_DB_ROUTING["SELECTION"]),
+    }
+elif DB_ENGINE == "sqlite":
+    if DB_CONN_MODE == "pool":
+        raise ImproperlyConfigured("DB_CONN_MODE=pool needs PostgreSQL; use persistent with SQLite")
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DB_NAME", str(BASE_DIR / "db.sqlite3")),
+            "OPTIONS": SQLITE_OPTIONS if env_bool("DB_SQLITE_TUNED", True) else {},
+            **CONNECTION_SETTINGS,
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"DB_ENGINE must be postgresql or sqlite, not {DB_ENGINE!r}")
+
+
+if os.environ.get("CACHE_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["CACHE_URL"],
+        }
+    }
+    LICENSE_KEY_FILTER = {**LICENSE_KEY_FILTER, "SHARED": True}
@@ -0,0 +1,17 @@
+"""
+Settings for the test suite (manage.py test picks them up): the project
+settings plus a second database standing in for a read replica.
+
+"replica" is migrated separately and nothing replicates into it, so a read
+that finds nothing went there (ReplicaRoutingTests).
+"""
+from license_service.settings import *  # noqa: F401,F403
+from license_service.settings import DATABASES, LICENSE_HEARTBEATS
+
+DATABASES = {
+    **DATABASES,
+    "replica": {**DATABASES["default"], "TEST": {"MIRROR": None}},
+}
+
+# tests flush heartbeats explicitly
+LICENSE_HEARTBEATS = {**LICENSE_HEARTBEATS, "AUTOSTART": False}
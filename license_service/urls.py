@@ -1,10 +1,12 @@
 from django.contrib import admin
 from django.urls import path
-from licenses import views
+from licenses import async_views, views
+from licenses.metrics import metrics_view
 from licenses.views import DeactivateLicenseView
 from licenses.views import (
-    ProvisionLicenseView, ActivateLicenseView, CheckLicenseKeyView,
-    ListLicensesByEmailView, DeactivateLicenseView, LicenseLifecycleView
+    ProvisionLicenseView, ActivateLicenseView, CheckLicenseKeyView, BatchCheckLicenseKeyView,
+    ListLicensesByEmailView, ListActivationsByInstanceView, DeactivateLicenseView, LicenseLifecycleView,
+    BulkProvisionLicenseView, BatchActivateLicenseView, BulkLicenseLifecycleView,
 )
 
 
@@ -17,10 +19,22 @@ urlpatterns = [
     path("api/v1/internal/licenses/by-email/", views.ListLicensesByEmailView.as_view(), name="by_email"),
       path("api/v1/licenses/deactivate/", DeactivateLicenseView.as_view(), name="deactivate"),
        path("api/v1/licenses/provision/", ProvisionLicenseView.as_view(), name="provision"),
+  path("api/v1/licenses/provision/bulk/", BulkProvisionLicenseView.as_view(), name="provision_bulk"),
   path("api/v1/licenses/activate/", ActivateLicenseView.as_view(), name="activate"),
+  path("api/v1/licenses/activate/batch/", BatchActivateLicenseView.as_view(), name="activate_batch"),
   path("api/v1/licenses/check/", CheckLicenseKeyView.as_view(), name="check"),
+  path("api/v1/licenses/check/batch/", BatchCheckLicenseKeyView.as_view(), name="check_batch"),
   path("api/v1/licenses/deactivate/", DeactivateLicenseView.as_view(), name="deactivate"),
   path("api/v1/licenses/lifecycle/", LicenseLifecycleView.as_view(), name="lifecycle"),
+  path("api/v1/licenses/lifecycle/bulk/", BulkLicenseLifecycleView.as_view(), name="lifecycle_bulk"),
   path("api/v1/internal/licenses/by-email/", ListLicensesByEmailView.as_view(), name="by_email"),
+  path("api/v1/internal/activations/by-instance/", ListActivationsByInstanceView.as_view(), name="by_instance"),
+
+  # ASGI-native variants of the product-facing endpoints (serve under asgi.py)
+  path("api/v1/async/licenses/activate/", async_views.AsyncActivateLicenseView.as_view(), name="activate_async"),
+  path("api/v1/async/licenses/check/", async_views.AsyncCheckLicenseKeyView.as_view(), name="check_async"),
+  path("api/v1/async/licenses/deactivate/", async_views.AsyncDeactivateLicenseView.as_view(), name="deactivate_async"),
+
+  path("metrics", metrics_view, name="metrics"),
 
 ]
@@ -1,15 +1,19 @@
 from django.contrib import admin
-from .models import Brand, Product, LicenseKey, License, Activation
+from django.db.models import Q
+
+from .models import Brand, Product, LicenseKey, License, Activation, normalize_instance_id
 
 @admin.register(Brand)
 class BrandAdmin(admin.ModelAdmin):
     list_display = ("id", "name", "api_key")
     search_fields = ("name",)
+    # the public key products verify offline tokens with
+    readonly_fields = ("verify_key",)
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ("id", "brand", "code", "name")
+    list_display = ("id", "brand", "code", "name", "max_activations")
     list_filter = ("brand",)
     search_fields = ("code", "name")
 
@@ -22,7 +26,7 @@ class LicenseKeyAdmin(admin.ModelAdmin):
 
 @admin.register(License)
 class LicenseAdmin(admin.ModelAdmin):
-    list_display = ("id", "product", "status", "expires_at", "license_key", "created_at")
+    list_display = ("id", "product", "status", "expires_at", "max_activations", "license_key", "created_at")
     list_filter = ("status", "product__brand")
     search_fields = ("license_key__key", "license_key__customer_email")
 
@@ -30,3 +34,12 @@ class LicenseAdmin(admin.ModelAdmin):
 class ActivationAdmin(admin.ModelAdmin):
     list_display = ("id", "license", "instance_id", "created_at", "revoked_at")
     search_fields = ("instance_id", "license__license_key__key")
+
+    def get_search_results(self, request, queryset, search_term):
+        # exact match on the indexed columns instead of icontains table scans
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        return queryset.filter(
+            Q(instance_id=normalize_instance_id(term)) | Q(license__license_key__key=term)
+        ), False
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class LicensesConfig(AppConfig):
     name = 'licenses'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .heartbeats import heartbeats
+
+        if heartbeats.autostart:
+            # heartbeat writes get their own thread; requests only record them
+            heartbeats.start()
@@ -0,0 +1,186 @@
+# licenses/async_views.py
+#
+# ASGI-native versions of the product-facing endpoints (activate / check / deactivate).
+# Same request/response contract as the DRF views in views.py, but written as plain
+# async Django views so they don't hop to a thread per request under ASGI.
+# Only the activation write path (row locks need a transaction) runs in a thread.
+
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.http import parse_etags
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from .cache import entitlement_cache, entitlements_changed
+from .heartbeats import heartbeat_from_check
+from .keyfilter import key_filter
+from .models import Activation, License, LicenseKey, normalize_instance_id
+from .routers import key_identity, read_from_replica
+from .serializers import ActivateSerializer
+from .throttling import arate_limit, throttled_message
+from .tokens import token_for_check_payload
+from .views import activate_instance, check_entry, check_queryset, etag_still_fresh
+
+
+def _request_data(request):
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+
+def _detail(detail, status):
+    return JsonResponse({"detail": detail}, status=status)
+
+
+def _throttled(wait):
+    return JsonResponse({"detail": throttled_message(wait)}, status=429, headers={"Retry-After": str(math.ceil(wait))})
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncActivateLicenseView(View):
+    """
+    Async ActivateLicenseView. Key lookup is async; locking, seat checks and the
+    upsert run in one transaction on a worker thread (transactions are sync-only).
+    """
+    async def post(self, request):
+        data = _request_data(request)
+        if data is None:
+            return _detail("Malformed JSON", 400)
+        wait = await arate_limit(request, data.get("license_key"))
+        if wait:
+            return _throttled(wait)
+
+        s = ActivateSerializer(data=data)
+        if not s.is_valid():
+            return JsonResponse(s.errors, status=400)
+
+        if not await key_filter.amight_exist(s.validated_data["license_key"]):
+            return _detail("License key not found", 404)
+
+        lk = await LicenseKey.objects.filter(key=s.validated_data["license_key"]).select_related("brand").afirst()
+        if not lk:
+            return _detail("License key not found", 404)
+
+        body, status_code = await sync_to_async(transaction.atomic(activate_instance))(
+            lk, s.validated_data["instance_id"]
+        )
+        return JsonResponse(body, status=status_code)
+
+
+class AsyncCheckLicenseKeyView(View):
+    """Async CheckLicenseKeyView: async cache tiers, async ORM, same ETag semantics."""
+
+    async def get(self, request):
+        key = request.GET.get("license_key")
+        if not key:
+            return _detail("license_key query param is required", 400)
+        wait = await arate_limit(request, key)
+        if wait:
+            return _throttled(wait)
+        if not await key_filter.amight_exist(key):
+            return _detail("License key not found", 404)
+        read_from_replica(key_identity(key))
+
+        instance_id = request.GET.get("instance_id")
+        client_etags = [] if instance_id else parse_etags(request.headers.get("If-None-Match", ""))
+
+        entry, generation = await entitlement_cache.alookup(key)
+        if entry is None and client_etags:
+            version = await LicenseKey.objects.filter(key=key).values_list("version", flat=True).afirst()
+            if version is None:
+                return _detail("License key not found", 404)
+            for etag in client_etags:
+                if etag_still_fresh(etag, version):
+                    return HttpResponse(status=304, headers={"ETag": etag})
+
+        if entry is None:
+            entry, timeout = check_entry(await check_queryset().filter(key=key).afirst())
+            if entry is None:
+                return _detail("License key not found", 404)
+            await entitlement_cache.aset(key, entry, timeout, generation)
+
+        if instance_id:
+            payload = entry["payload"]
+            heartbeat_from_check(payload, instance_id)
+            token = await sync_to_async(token_for_check_payload)(payload, instance_id)
+            return JsonResponse({**payload, "token": token})
+
+        if entry["etag"] in client_etags:
+            return HttpResponse(status=304, headers={"ETag": entry["etag"]})
+        return JsonResponse(entry["payload"], headers={"ETag": entry["etag"]})
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncDeactivateLicenseView(View):
+    """Async DeactivateLicenseView: lookups plus one set-based UPDATE."""
+
+    async def post(self, request):
+        data = _request_data(request)
+        if data is None:
+            return _detail("Malformed JSON", 400)
+        wait = await arate_limit(request, data.get("license_key"))
+        if wait:
+            return _throttled(wait)
+
+        license_key = data.get("license_key")
+        product_code = data.get("product_code")
+        instance_id = data.get("instance_id")
+        if instance_id:
+            # matched normalized, echoed as sent
+            sent_instance_id, instance_id = str(instance_id), normalize_instance_id(str(instance_id))
+
+        if not license_key or not product_code or not instance_id:
+            return _detail("license_key, product_code and instance_id are required", 400)
+
+        if not await key_filter.amight_exist(license_key):
+            return _detail("License key not found", 404)
+
+        lk = await LicenseKey.objects.filter(key=license_key).afirst()
+        if not lk:
+            return _detail("License key not found", 404)
+
+        lic = await License.objects.filter(license_key=lk, product__code=product_code).afirst()
+        if not lic:
+            return _detail("License not found for product", 404)
+
+        revoked_at = timezone.now()
+        deactivated = await Activation.objects.filter(
+            license=lic,
+            instance_id=instance_id,
+            revoked_at__isnull=True
+        ).aupdate(revoked_at=revoked_at)
+
+        if not deactivated:
+            return JsonResponse(
+                {
+                    "license_key": lk.key,
+                    "product": product_code,
+                    "instance_id": sent_instance_id,
+                    "deactivated": False,
+                    "detail": "No active activation found"
+                },
+                status=200
+            )
+
+        await sync_to_async(entitlements_changed)(lk.key)
+
+        return JsonResponse(
+            {
+                "license_key": lk.key,
+                "product": product_code,
+                "instance_id": sent_instance_id,
+                "deactivated": True,
+                "revoked_at": revoked_at.isoformat(),
+            },
+            status=200
+        )
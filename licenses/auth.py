@@ -1,7 +1,12 @@
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
+
+from django.conf import settings
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
-from .models import Brand
+from .models import Brand, api_key_digest
 
 @dataclass
 class BrandPrincipal:
@@ -11,6 +16,69 @@ class BrandPrincipal:
     def is_authenticated(self) -> bool:
         return True
 
+
+class BrandKeyCache:
+    """
+    In-process cache: sha256(api_key) -> Brand (or None for unknown keys).
+
+    - positive entries live for TTL seconds
+    - negative entries live for NEGATIVE_TTL seconds, so key-guessing floods
+      are answered from memory instead of the database
+    - bounded (LRU) so a flood of random keys can't grow it without limit
+    - cleared for a brand on Brand save/delete (see signals.py)
+    """
+
+    def __init__(self, ttl=300, negative_ttl=30, maxsize=10_000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # digest -> (expires_at_monotonic, brand | None)
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        """Returns (found, brand). found=False means not cached."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return False, None
+            expires, brand = entry
+            if expires <= time.monotonic():
+                del self._entries[digest]
+                return False, None
+            self._entries.move_to_end(digest)
+            return True, brand
+
+    def set(self, digest, brand):
+        ttl = self.ttl if brand is not None else self.negative_ttl
+        with self._lock:
+            self._entries[digest] = (time.monotonic() + ttl, brand)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_brand(self, brand_id):
+        with self._lock:
+            stale = [
+                d for d, (_, b) in self._entries.items()
+                # negative entries too: a new brand may own a key we cached as unknown
+                if b is None or b.pk == brand_id
+            ]
+            for d in stale:
+                del self._entries[d]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_opts = getattr(settings, "LICENSE_BRAND_AUTH_CACHE", {})
+brand_key_cache = BrandKeyCache(
+    ttl=_opts.get("TTL", 300),
+    negative_ttl=_opts.get("NEGATIVE_TTL", 30),
+    maxsize=_opts.get("MAXSIZE", 10_000),
+)
+
+
 class BrandAPIKeyAuthentication(BaseAuthentication):
     header_name = "X-API-Key"
 
@@ -19,9 +87,13 @@ class BrandAPIKeyAuthentication(BaseAuthentication):
         if not api_key:
             return None  # unauthenticated
 
-        try:
-            brand = Brand.objects.get(api_key=api_key)
-        except Brand.DoesNotExist:
+        digest = api_key_digest(api_key)
+        found, brand = brand_key_cache.get(digest)
+        if not found:
+            brand = Brand.objects.filter(api_key_digest=digest).first()
+            brand_key_cache.set(digest, brand)
+
+        if brand is None:
             raise AuthenticationFailed("Invalid API key")
 
         return (BrandPrincipal(brand=brand), api_key)
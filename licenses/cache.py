@@ -0,0 +1,309 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+from .models import LicenseKey
+from .routers import db_routing, key_identity, read_replica_used
+
+
+DEFAULTS = {
+    "ALIAS": "default",
+    "TIMEOUT": 300,        # shared tier (Django cache backend)
+    "LOCAL_TIMEOUT": 5,    # in-process tier; bounds staleness across workers
+    "LOCAL_MAXSIZE": 10_000,
+}
+
+
+class EntitlementCache:
+    """
+    Read-through cache for the /check/ payload, keyed by license key.
+
+    Two tiers:
+      - a bounded in-process LRU (no network hop, short TTL)
+      - a shared Django cache backend (survives across workers)
+
+    Writers call invalidate(key) after commit; that clears this process'
+    LRU entry and the shared entry. Other processes pick the change up
+    once their local entry times out (LOCAL_TIMEOUT).
+
+    A miss can race an invalidation: the payload is read from the database,
+    the write commits and invalidates, then the old payload is stored. So each
+    key has a generation in the shared tier (a random token that invalidate()
+    deletes) and shared entries are stamped with the generation the lookup saw
+    before the payload was built. An entry whose stamp isn't the current
+    generation is a miss. Locally, an invalidation in this process stops
+    lookups started before it from filling the LRU.
+
+    Payloads built from a replica read may predate a write that hasn't
+    replicated yet, so they are kept no longer than the read-your-writes pin
+    (LICENSE_DB_ROUTING PIN_SECONDS) rather than TIMEOUT.
+    """
+    prefix = "lic:check:"
+    generation_prefix = "lic:gen:"
+
+    def __init__(self, options=None):
+        opts = {**DEFAULTS, **(options or {})}
+        self.alias = opts["ALIAS"]
+        self.timeout = opts["TIMEOUT"]
+        self.local_timeout = opts["LOCAL_TIMEOUT"]
+        self.local_maxsize = opts["LOCAL_MAXSIZE"]
+
+        self._local = OrderedDict()  # cache_key -> (expires_at_monotonic, payload)
+        self._lock = threading.Lock()
+        self._epoch = 0  # bumped by every invalidate() in this process
+        self.hits = 0
+        self.local_hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _cache_key(self, license_key: str) -> str:
+        # hash so arbitrary client input is always a valid backend key
+        return self.prefix + hashlib.sha256(license_key.encode()).hexdigest()
+
+    def _generation_key(self, ck):
+        return self.generation_prefix + ck[len(self.prefix):]
+
+    def _generation_timeout(self):
+        # outlives the entries stamped with it; losing it early only costs a rebuild
+        return 2 * self.timeout
+
+    def _local_get(self, ck):
+        with self._lock:
+            entry = self._local.get(ck)
+            if entry is None:
+                return None
+            expires, payload = entry
+            if expires <= time.monotonic():
+                del self._local[ck]
+                return None
+            self._local.move_to_end(ck)
+            return payload
+
+    def _local_set(self, ck, payload, timeout, epoch):
+        with self._lock:
+            if epoch != self._epoch:
+                # an invalidation landed since the lookup: payload may predate it
+                return
+            self._local[ck] = (time.monotonic() + timeout, payload)
+            self._local.move_to_end(ck)
+            while len(self._local) > self.local_maxsize:
+                self._local.popitem(last=False)
+
+    def _count(self, hits=0, local_hits=0, misses=0):
+        with self._lock:
+            self.hits += hits
+            self.local_hits += local_hits
+            self.misses += misses
+
+    def _resolve(self, cks, found, epoch):
+        """
+        Split a shared get_many() of entries and generations into
+        ({ck: payload}, {ck: generation to set() a built payload with}).
+        Keys with no generation get a fresh one, stored before returning so
+        it precedes the database read.
+        """
+        payloads, generations, fresh = {}, {}, {}
+        for ck in cks:
+            gk = self._generation_key(ck)
+            token, entry = found.get(gk), found.get(ck)
+            if token is None:
+                token = fresh[gk] = secrets.token_hex(8)
+            elif entry is not None and entry[0] == token:
+                payloads[ck] = entry[1]
+                self._local_set(ck, entry[1], self.local_timeout, epoch)
+                continue
+            generations[ck] = (token, epoch)
+        return payloads, generations, fresh
+
+    def lookup(self, license_key: str):
+        """
+        (payload, None) on a hit, (None, generation) on a miss. Pass the
+        generation to set() with the payload built after this call.
+        """
+        ck = self._cache_key(license_key)
+        epoch = self._epoch
+
+        payload = self._local_get(ck)
+        if payload is not None:
+            self._count(hits=1, local_hits=1)
+            return payload, None
+
+        payloads, generations, fresh = self._resolve(
+            [ck], self.shared.get_many([ck, self._generation_key(ck)]), epoch
+        )
+        if fresh:
+            self.shared.set_many(fresh, self._generation_timeout())
+        if payloads:
+            self._count(hits=1)
+            return payloads[ck], None
+        self._count(misses=1)
+        return None, generations[ck]
+
+    def get(self, license_key: str):
+        return self.lookup(license_key)[0]
+
+    def _timeout(self, timeout):
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        if read_replica_used():
+            timeout = min(timeout, db_routing.pin_seconds)
+        return timeout
+
+    def set(self, license_key: str, payload, timeout, generation):
+        timeout = self._timeout(timeout)
+        if timeout <= 0:
+            return
+        ck = self._cache_key(license_key)
+        token, epoch = generation
+        self.shared.set(ck, (token, payload), timeout)
+        self._local_set(ck, payload, min(timeout, self.local_timeout), epoch)
+
+    def lookup_many(self, license_keys):
+        """
+        ({license_key: payload} for the keys cached in either tier,
+         {license_key: generation} for the rest); one shared round trip,
+        plus one write when some keys have no generation yet.
+        """
+        epoch = self._epoch
+        found, missing = {}, {}
+        for key in license_keys:
+            ck = self._cache_key(key)
+            payload = self._local_get(ck)
+            if payload is not None:
+                found[key] = payload
+            else:
+                missing[ck] = key
+        local_hits = len(found)
+
+        generations = {}
+        if missing:
+            shared = self.shared.get_many([*missing, *map(self._generation_key, missing)])
+            payloads, miss_generations, fresh = self._resolve(list(missing), shared, epoch)
+            if fresh:
+                self.shared.set_many(fresh, self._generation_timeout())
+            found.update((missing[ck], payload) for ck, payload in payloads.items())
+            generations = {missing[ck]: generation for ck, generation in miss_generations.items()}
+
+        self._count(hits=len(found), local_hits=local_hits, misses=len(generations))
+        return found, generations
+
+    def set_many(self, entries, generations):
+        """
+        entries: {license_key: (payload, timeout)}, generations: lookup_many()'s;
+        one shared write per distinct timeout.
+        """
+        by_timeout = {}
+        for key, (payload, timeout) in entries.items():
+            timeout = self._timeout(timeout)
+            if timeout > 0:
+                by_timeout.setdefault(timeout, []).append((self._cache_key(key), payload, generations[key]))
+        for timeout, batch in by_timeout.items():
+            self.shared.set_many({ck: (token, payload) for ck, payload, (token, _) in batch}, timeout)
+            for ck, payload, (_, epoch) in batch:
+                self._local_set(ck, payload, min(timeout, self.local_timeout), epoch)
+
+    async def alookup(self, license_key: str):
+        """lookup() for async views: the LRU tier is plain memory, the shared tier is awaited."""
+        ck = self._cache_key(license_key)
+        epoch = self._epoch
+
+        payload = self._local_get(ck)
+        if payload is not None:
+            self._count(hits=1, local_hits=1)
+            return payload, None
+
+        payloads, generations, fresh = self._resolve(
+            [ck], await self.shared.aget_many([ck, self._generation_key(ck)]), epoch
+        )
+        if fresh:
+            await self.shared.aset_many(fresh, self._generation_timeout())
+        if payloads:
+            self._count(hits=1)
+            return payloads[ck], None
+        self._count(misses=1)
+        return None, generations[ck]
+
+    async def aset(self, license_key: str, payload, timeout, generation):
+        timeout = self._timeout(timeout)
+        if timeout <= 0:
+            return
+        ck = self._cache_key(license_key)
+        token, epoch = generation
+        await self.shared.aset(ck, (token, payload), timeout)
+        self._local_set(ck, payload, min(timeout, self.local_timeout), epoch)
+
+    def get_or_build(self, license_key: str, builder):
+        """
+        builder(license_key) -> (payload, timeout) or (None, None) when the key
+        does not exist. Misses are not cached.
+        """
+        payload, generation = self.lookup(license_key)
+        if payload is not None:
+            return payload
+
+        payload, timeout = builder(license_key)
+        if payload is not None:
+            self.set(license_key, payload, timeout, generation)
+        return payload
+
+    def invalidate(self, *license_keys):
+        cks = [self._cache_key(k) for k in license_keys if k]
+        if not cks:
+            return
+        with self._lock:
+            self._epoch += 1
+            for ck in cks:
+                self._local.pop(ck, None)
+        # dropping the generation is what rejects a racing set() of an older payload
+        self.shared.delete_many([*cks, *map(self._generation_key, cks)])
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "local_hits": self.local_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+                "local_size": len(self._local),
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.local_hits = self.misses = 0
+
+
+entitlement_cache = EntitlementCache(getattr(settings, "LICENSE_CHECK_CACHE", None))
+
+
+def entitlements_changed(*license_keys):
+    """
+    Call from every write that changes what /check/ returns for a key.
+    Bumps LicenseKey.version (the check ETag) inside the current transaction;
+    once it commits, drops cached /check/ payloads and pins the keys' reads
+    to the primary for a moment (read-your-writes with replicas).
+    """
+    keys = [k for k in license_keys if k]
+    if not keys:
+        return
+    LicenseKey.objects.filter(key__in=keys).update(version=F("version") + 1)
+
+    def committed():
+        # pin first: a rebuild after the invalidation must not read a lagging replica
+        db_routing.pin(*(key_identity(k) for k in keys))
+        entitlement_cache.invalidate(*keys)
+
+    transaction.on_commit(committed)
@@ -0,0 +1,211 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+from .models import Activation, License, LicenseKey, normalize_instance_id
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    "AUTOSTART": False,        # start() from LicensesConfig.ready()
+    "FLUSH_INTERVAL": 30,      # seconds between flushes (per process)
+    "MAX_PENDING": 100_000,    # flush early once this many (key, instance) pairs wait
+    "BATCH_SIZE": 1000,        # rows per UPDATE statement
+    "ALIAS": "default",        # database written to (the primary)
+}
+
+logger = logging.getLogger(__name__)
+
+
+class HeartbeatBuffer:
+    """
+    Coalesces Activation.last_seen_at writes. record() only touches a dict
+    keyed by (license_key, instance_id), so repeated heartbeats from the same
+    instance cost nothing until the next flush, which writes each pending pair
+    once: one UPDATE ... FROM (VALUES ...) per BATCH_SIZE pairs.
+
+    Flushes run on a daemon thread every FLUSH_INTERVAL, or as soon as
+    MAX_PENDING pairs are waiting, so requests only ever record; and at
+    process exit. Nothing starts on import: start() does, called from
+    LicensesConfig.ready() when AUTOSTART is set, and it also registers the
+    exit flush and the restart in forked children (pre-forking servers load
+    the app before forking, and threads don't survive a fork). Processes that
+    never call start() only write on an explicit flush(). Heartbeats are best
+    effort: a failed flush is logged and dropped, and at most one interval is
+    lost if a worker dies.
+    """
+
+    def __init__(self, options=None):
+        opts = {**DEFAULTS, **(options or {})}
+        self.enabled = opts["ENABLED"]
+        self.autostart = opts["AUTOSTART"]
+        self.flush_interval = opts["FLUSH_INTERVAL"]
+        self.max_pending = opts["MAX_PENDING"]
+        self.batch_size = opts["BATCH_SIZE"]
+        self.alias = opts["ALIAS"]
+
+        self._pending = {}  # (license_key, instance_id) -> last seen datetime
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._wake = threading.Event()
+        self._thread = None
+        self._hooks_registered = False
+        self.recorded = 0
+        self.flushed = 0
+        self.statements = 0
+
+    def record(self, license_key, instance_id, seen=None):
+        if not self.enabled:
+            return
+        seen = seen or timezone.now()
+        with self._lock:
+            self._pending[(license_key, instance_id)] = seen
+            self.recorded += 1
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def due(self):
+        return bool(self._pending) and (
+            len(self._pending) >= self.max_pending
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        )
+
+    def start(self):
+        """Start the flusher thread unless it's running (again in forked children)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="heartbeat-flush", daemon=True)
+            self._thread.start()
+            if not self._hooks_registered:
+                os.register_at_fork(after_in_child=self._after_fork)
+                atexit.register(self._flush_at_exit)
+                self._hooks_registered = True
+
+    def _after_fork(self):
+        # Only the forking thread survives: the parent's locks may have been
+        # held and its event waited on by a flusher that is gone, and its
+        # pending heartbeats and counters are the parent's to write and report.
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._thread = None
+        self.recorded = self.flushed = self.statements = 0
+        self.start()
+
+    def _flush_at_exit(self):
+        if self.pending():
+            try:
+                self.flush()
+            except Exception:  # interpreter shutdown; nothing left to report to
+                pass
+
+    def _run(self):
+        while True:
+            self._wake.wait(max(self.flush_interval - (time.monotonic() - self._last_flush), 0))
+            self._wake.clear()
+            if not self.due():
+                if not self._pending:
+                    self._last_flush = time.monotonic()  # idle: the next heartbeat waits one interval
+                continue
+            try:
+                self.flush(wait=True)
+            except Exception:
+                logger.exception("heartbeat flush failed")
+            finally:
+                connections[self.alias].close()  # this thread's own connection
+
+    def flush(self, wait=False):
+        """
+        Write every pending heartbeat; returns the number of activations updated.
+        If another thread is flushing, returns 0 at once, or with wait=True
+        waits for it to finish first, so nothing recorded before the call is
+        left unwritten.
+        """
+        if not self._flush_lock.acquire(blocking=wait):
+            return 0  # another thread is flushing
+        try:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._last_flush = time.monotonic()
+            rows = [(key, instance_id, seen) for (key, instance_id), seen in pending.items()]
+            updated = 0
+            for start in range(0, len(rows), self.batch_size):
+                try:
+                    updated += self._write(rows[start:start + self.batch_size])
+                except DatabaseError:
+                    logger.exception("dropping %d heartbeats", len(rows) - start)
+                    break
+            with self._lock:
+                self.flushed += updated
+            return updated
+        finally:
+            self._flush_lock.release()
+
+    def _write(self, rows):
+        connection = connections[self.alias]
+        qn = connection.ops.quote_name
+        activation, lic, key = (qn(m._meta.db_table) for m in (Activation, License, LicenseKey))
+        values = ", ".join(["(%s, %s, %s)"] * len(rows))
+        params = []
+        for license_key, instance_id, seen in rows:
+            params += [license_key, instance_id, connection.ops.adapt_datetimefield_value(seen)]
+        # UPDATE ... FROM (VALUES ...): PostgreSQL, and SQLite >= 3.33. Both name
+        # VALUES columns column1..N; the subquery gives them readable names.
+        sql = (
+            f"UPDATE {activation} SET last_seen_at = v.seen "
+            f"FROM (SELECT column1 AS license_key, column2 AS instance_id, column3 AS seen "
+            f"FROM (VALUES {values}) AS t) AS v, {lic} AS l, {key} AS k "
+            f"WHERE k.key = v.license_key AND l.license_key_id = k.id "
+            f"AND {activation}.license_id = l.id AND {activation}.instance_id = v.instance_id "
+            f"AND {activation}.revoked_at IS NULL "
+            f"AND ({activation}.last_seen_at IS NULL OR {activation}.last_seen_at < v.seen)"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            updated = cursor.rowcount
+        with self._lock:
+            self.statements += 1
+        return updated
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "recorded": self.recorded,
+                "pending": len(self._pending),
+                "flushed": self.flushed,
+                "statements": self.statements,
+            }
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+            self.recorded = self.flushed = self.statements = 0
+
+
+heartbeats = HeartbeatBuffer(getattr(settings, "LICENSE_HEARTBEATS", None))
+
+
+def heartbeat_from_check(payload, instance_id):
+    """/check/?instance_id=...: a heartbeat if the instance is activated on the key."""
+    instance_id = normalize_instance_id(instance_id)
+    # active_instances lists ids as their products sent them
+    if any(instance_id in map(normalize_instance_id, lic["active_instances"]) for lic in payload["licenses"]):
+        heartbeats.record(payload["license_key"], instance_id)
+
@@ -0,0 +1,289 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import LicenseKey
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    "FALSE_POSITIVE_RATE": 0.01,
+    "MIN_CAPACITY": 100_000,   # sized for max(this, 2 x current keys); rebuilt when full
+    "ALIAS": "default",        # shared cache used to tell other processes about new keys
+    "SHARED": None,            # is CACHES[ALIAS] shared by every process? None: not LocMem/Dummy
+    "SYNC_INTERVAL": 5,        # seconds between catch-up reads while the generation is unchanged
+    "GAP_TTL": 600,            # seconds to keep re-reading skipped ids (uncommitted inserts)
+}
+
+GAP_WINDOW = 10_000  # only track id gaps this close to the highest id seen
+MAX_GAPS = 100
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Plain Bloom filter over strings: bit array + k positions from double hashing
+    one blake2b digest. No false negatives; false positives at ~fp_rate once
+    `capacity` items are in.
+    """
+
+    def __init__(self, capacity, fp_rate=0.01):
+        self.capacity = max(1, capacity)
+        self.fp_rate = fp_rate
+        self.num_bits = max(8, math.ceil(-self.capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        bits = self.bits
+        for pos in self._positions(item):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    @property
+    def memory_bytes(self):
+        return len(self.bits)
+
+    def expected_fp_rate(self):
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class LicenseKeyFilter:
+    """
+    Per-process Bloom filter over every LicenseKey.key, so lookups for keys that
+    definitely don't exist (guessing, stale keys) are answered without the database.
+
+    - built from one streamed scan ordered by pk, in a background thread
+      started at server startup (wsgi.py/asgi.py) or by the first lookup
+    - keys created in this process are added directly (post_save / bulk_create)
+    - keys created elsewhere: writers bump a generation counter in the shared
+      cache on commit; a negative answer first checks it and, if it moved (or
+      SYNC_INTERVAL passed), reads rows with pk above the last one seen, plus
+      recently skipped ids whose inserts may still have been uncommitted
+    - `rebuild_key_filter` bumps an epoch that makes every process rebuild
+
+    A "no" is only given when it is provably current: never while the filter
+    is (re)building or another thread is syncing it, and never when
+    CACHES[ALIAS] is per-process (LocMem), since then other processes' new
+    keys can't be announced. Those lookups fall through to the database.
+    Deleted keys stay "maybe present" likewise. With the base settings'
+    LocMemCache the filter therefore never rejects anything (SHARED=False);
+    it needs a shared cache (settings_production with CACHE_URL).
+    """
+    generation_key = "lic:keyfilter:generation"
+    epoch_key = "lic:keyfilter:epoch"
+
+    def __init__(self, options=None):
+        opts = {**DEFAULTS, **(options or {})}
+        self.enabled = opts["ENABLED"]
+        self.fp_rate = opts["FALSE_POSITIVE_RATE"]
+        self.min_capacity = opts["MIN_CAPACITY"]
+        self.alias = opts["ALIAS"]
+        self.cache_is_shared = opts["SHARED"]
+        self.sync_interval = opts["SYNC_INTERVAL"]
+        self.gap_ttl = opts["GAP_TTL"]
+
+        self._bloom = None
+        self._pending = None  # keys added while a build is scanning
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._building = False
+        self.high_water = 0
+        self._gaps = []  # (lo_pk, hi_pk, seen_at_monotonic)
+        self.generation = self.epoch = None
+        self.synced_at = 0.0
+        self.short_circuits = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def can_reject(self):
+        if self.cache_is_shared is None:
+            self.cache_is_shared = not isinstance(self.shared, (LocMemCache, DummyCache))
+        return self.cache_is_shared
+
+    def _shared_state(self):
+        state = self.shared.get_many([self.generation_key, self.epoch_key])
+        return state.get(self.generation_key, 0), state.get(self.epoch_key, 0)
+
+    def _read(self, bloom, rows, now):
+        """Add (pk, key) rows (pk order) to bloom; advance high_water and note skipped ids."""
+        last = self.high_water
+        for pk, key in rows:
+            bloom.add(key)
+            if pk > last:
+                if pk > last + 1:
+                    self._gaps.append((last + 1, pk - 1, now))
+                last = pk
+        self.high_water = last
+        self._gaps = [
+            g for g in self._gaps if g[1] > last - GAP_WINDOW and now - g[2] < self.gap_ttl
+        ][-MAX_GAPS:]
+
+    def build(self):
+        """Full streamed scan into a fresh filter, swapped in when done."""
+        with self._build_lock:
+            generation, epoch = self._shared_state()
+            with self._lock:
+                self._pending = []
+            bloom = BloomFilter(max(self.min_capacity, 2 * LicenseKey.objects.count()), self.fp_rate)
+
+            self.high_water, self._gaps = 0, []
+            rows = LicenseKey.objects.order_by("pk").values_list("pk", "key").iterator(chunk_size=10_000)
+            self._read(bloom, rows, time.monotonic())
+
+            with self._lock:
+                for key in self._pending:
+                    bloom.add(key)
+                self._pending = None
+                self._bloom = bloom
+            self.generation, self.epoch = generation, epoch
+            self.synced_at = time.monotonic()
+            return bloom
+
+    def build_in_background(self):
+        """Start build() on a daemon thread unless one is already running."""
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._background_build, name="key-filter-build", daemon=True).start()
+
+    def _background_build(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception("license key filter build failed; lookups fall through to the database")
+        finally:
+            self._building = False
+            connection.close()  # this thread's own connection
+
+    def sync(self):
+        """
+        Pick up keys created by other processes (see class docstring). Returns
+        False when the filter can't currently rule keys out: a build or another
+        sync holds the lock (never waited for; a build is a full table scan),
+        or a full rebuild is needed, which is started in the background.
+        """
+        if not self._build_lock.acquire(blocking=False):
+            return False
+        try:
+            generation, epoch = self._shared_state()
+            if self._bloom is None or epoch != self.epoch or self._bloom.count > self._bloom.capacity:
+                needs_build = True
+            else:
+                needs_build = False
+                now = time.monotonic()
+                if generation == self.generation and now - self.synced_at < self.sync_interval:
+                    return True
+                cond = Q(pk__gt=self.high_water)
+                for lo, hi, _ in self._gaps:
+                    cond |= Q(pk__range=(lo, hi))
+                rows = LicenseKey.objects.filter(cond).order_by("pk").values_list("pk", "key")
+                with self._lock:
+                    self._read(self._bloom, rows, now)
+                self.generation, self.synced_at = generation, now
+        finally:
+            self._build_lock.release()
+        if needs_build:
+            self.build_in_background()
+            return False
+        return True
+
+    def add_many(self, keys):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(keys)
+            if self._bloom is not None:
+                for key in keys:
+                    self._bloom.add(key)
+
+    def bump_generation(self):
+        self._bump(self.generation_key)
+
+    def bump_epoch(self):
+        self._bump(self.epoch_key)
+
+    def _bump(self, cache_key):
+        self.shared.add(cache_key, 0, timeout=None)
+        try:
+            self.shared.incr(cache_key)
+        except ValueError:
+            self.shared.set(cache_key, 1, timeout=None)
+
+    def might_exist(self, key):
+        """False only if no LicenseKey has this key."""
+        if not self.enabled or not isinstance(key, str):
+            return True
+        bloom = self._bloom
+        if bloom is None:
+            self.build_in_background()
+            return True
+        if key in bloom or not self.can_reject():
+            return True
+        if not self.sync() or key in self._bloom:
+            return True
+        self.short_circuits += 1
+        return False
+
+    async def amight_exist(self, key):
+        bloom = self._bloom
+        if bloom is None:
+            return self.might_exist(key)  # starts the background build; no database work here
+        if not self.enabled or not isinstance(key, str) or key in bloom or not self.can_reject():
+            return True
+        return await sync_to_async(self.might_exist)(key)
+
+    def stats(self):
+        bloom = self._bloom
+        if bloom is None:
+            return {"enabled": self.enabled, "built": False, "short_circuits": self.short_circuits}
+        return {
+            "enabled": self.enabled,
+            "built": True,
+            "keys": bloom.count,
+            "capacity": bloom.capacity,
+            "bits": bloom.num_bits,
+            "hashes": bloom.num_hashes,
+            "memory_bytes": bloom.memory_bytes,
+            "expected_fp_rate": bloom.expected_fp_rate(),
+            "short_circuits": self.short_circuits,
+        }
+
+
+key_filter = LicenseKeyFilter(getattr(settings, "LICENSE_KEY_FILTER", None))
+
+
+def license_keys_created(keys):
+    """
+    Record newly inserted keys: in this process' filter right away, in other
+    processes once the transaction commits.
+    """
+    keys = list(keys)
+    if not keys or not key_filter.enabled:
+        return
+    key_filter.add_many(keys)
+    transaction.on_commit(key_filter.bump_generation)
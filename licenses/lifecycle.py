@@ -0,0 +1,273 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .cache import entitlements_changed
+from .heartbeats import heartbeats
+from .models import Activation, ArchivedActivation, License
+from .signals import license_status_changed
+
+
+ACTIONS = ("suspend", "resume", "cancel", "renew")
+
+# shortest revoke_stale() window: last_seen_at trails by up to a heartbeat flush
+# interval per worker, and only moves on activation and /check/?instance_id=, so
+# it has to cover the slowest client check cadence with room to spare
+STALE_MIN_DAYS = getattr(settings, "LICENSE_STALE_MIN_DAYS", 7)
+
+
+def select_licenses(brand, *, items=None, product_code=None, status=None,
+                    expires_before=None, expires_after=None, all_licenses=False):
+    """
+    Brand-scoped License queryset for a bulk lifecycle run, from either explicit
+    (license_key, product_code) items or a filter. A filter without criteria
+    raises ValueError unless all_licenses=True: every license of the brand is
+    never selected by accident.
+    """
+    qs = License.objects.filter(license_key__brand=brand)
+
+    if items is not None:
+        wanted = {(i["license_key"], i["product_code"]) for i in items}
+        ids = [
+            lic_id
+            for lic_id, key, code in qs.filter(
+                license_key__key__in={k for k, _ in wanted},
+                product__code__in={c for _, c in wanted},
+            ).values_list("id", "license_key__key", "product__code")
+            if (key, code) in wanted
+        ]
+        return qs.filter(id__in=ids)
+
+    if not (product_code or status or expires_before or expires_after or all_licenses):
+        raise ValueError("No filter criteria; pass all_licenses=True to select every license of the brand")
+    if product_code:
+        qs = qs.filter(product__code=product_code)
+    if status:
+        qs = qs.filter(status=status)
+    if expires_before:
+        qs = qs.filter(expires_at__lt=expires_before)
+    if expires_after:
+        qs = qs.filter(expires_at__gte=expires_after)
+    return qs
+
+
+def _updates(action, extend_days, now):
+    if action == "suspend":
+        return {"status": License.STATUS_SUSPENDED}
+    if action == "resume":
+        return {"status": License.STATUS_VALID}
+    if action == "cancel":
+        return {"status": License.STATUS_CANCELLED}
+    if action == "renew":
+        # same rule as LicenseLifecycleView: extend from expiry, or from now if already expired
+        delta = timedelta(days=extend_days)
+        return {
+            "status": License.STATUS_VALID,
+            "expires_at": Case(
+                When(expires_at__gt=now, then=F("expires_at") + delta),
+                default=Value(now + delta),
+            ),
+        }
+    raise ValueError(f"Unknown action: {action}")
+
+
+def apply_bulk_lifecycle(qs, action, *, extend_days=365, batch_size=1000, dry_run=False, on_batch=None):
+    """
+    Apply `action` to every license in `qs` as set-based UPDATEs over id-ordered
+    batches of at most `batch_size` rows, one transaction per batch (short locks,
+    progress survives a crash). Returns {"matched", "updated", "batches"}.
+
+    on_batch(batch_no, rows, seconds) is called after each committed batch.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f"Unknown action: {action}")
+    if action == "resume":
+        # cancelled is terminal; expired needs a renew
+        qs = qs.exclude(status__in=[License.STATUS_CANCELLED, License.STATUS_EXPIRED])
+
+    if dry_run:
+        return {"matched": qs.count(), "updated": 0, "batches": 0}
+
+    now = timezone.now()
+    updates = _updates(action, extend_days, now)
+    result = {"matched": 0, "updated": 0, "batches": 0}
+    last_id = 0
+    while True:
+        started = time.monotonic()
+        with transaction.atomic():
+            rows = list(
+                qs.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", "license_key__key")[:batch_size]
+            )
+            if not rows:
+                break
+            ids = [r[0] for r in rows]
+            keys = {r[1] for r in rows}
+            result["updated"] += License.objects.filter(id__in=ids).update(**updates)
+            entitlements_changed(*keys)
+            transaction.on_commit(
+                lambda ids=ids, keys=keys: license_status_changed.send(
+                    sender=License, license_ids=ids, license_keys=sorted(keys),
+                    status=updates["status"], reason=action,
+                )
+            )
+
+        last_id = ids[-1]
+        result["matched"] += len(ids)
+        result["batches"] += 1
+        if on_batch:
+            on_batch(result["batches"], len(ids), time.monotonic() - started)
+
+    return result
+
+
+def sweep_expired(*, batch_size=1000, on_batch=None, now=None):
+    """
+    Flip valid licenses whose expires_at has passed to `expired`, in batches
+    taken off the expires_at index (oldest first). Each batch is its own
+    transaction, bumps the affected keys' versions and sends
+    license_status_changed once committed.
+
+    on_batch(batch_no, rows, seconds) is called after each batch.
+    Returns the number of licenses expired.
+    """
+    now = timezone.now() if now is None else now
+    total = batches = 0
+    while True:
+        started = time.monotonic()
+        with transaction.atomic():
+            rows = list(
+                License.objects
+                .filter(status=License.STATUS_VALID, expires_at__lte=now)
+                .order_by("expires_at", "id")
+                .values_list("id", "license_key__key")[:batch_size]
+            )
+            if not rows:
+                break
+            ids = [r[0] for r in rows]
+            keys = {r[1] for r in rows}
+            # re-check the predicate: a renew may have landed since the select
+            updated = License.objects.filter(
+                id__in=ids, status=License.STATUS_VALID, expires_at__lte=now
+            ).update(status=License.STATUS_EXPIRED)
+            entitlements_changed(*keys)
+            transaction.on_commit(
+                lambda ids=ids, keys=keys: license_status_changed.send(
+                    sender=License, license_ids=ids, license_keys=sorted(keys),
+                    status=License.STATUS_EXPIRED, reason="expired",
+                )
+            )
+
+        total += updated
+        batches += 1
+        if on_batch:
+            on_batch(batches, updated, time.monotonic() - started)
+        if len(rows) < batch_size:
+            break
+    return total
+
+
+ARCHIVE_FIELDS = ("id", "license_id", "instance_id", "sent_instance_id", "created_at", "revoked_at", "last_seen_at")
+
+
+def archive_to_table(rows):
+    """Default archive for archive_revoked(): ArchivedActivation, in the same transaction."""
+    ArchivedActivation.objects.bulk_create(
+        [ArchivedActivation(**row) for row in rows], ignore_conflicts=True
+    )
+
+
+def archive_revoked(*, revoked_before, batch_size=1000, archive=archive_to_table, on_batch=None):
+    """
+    Move activations revoked before `revoked_before` out of the live table:
+    each batch is handed to archive(rows) (dicts of ARCHIVE_FIELDS) and then
+    deleted, in one transaction. Batches walk the primary key (id > last id),
+    so every batch is a bounded range read and nothing holds locks for long.
+    Rows are locked while archived, and the delete re-checks revoked_at, so a
+    re-activation never loses its row.
+
+    An archive outside the database (a file) sees a batch before its delete
+    commits: if that commit fails the batch is archived again on the next run.
+
+    on_batch(batch_no, rows, seconds) is called after each batch.
+    Returns the number of activations deleted.
+    """
+    total = batches = last_id = 0
+    while True:
+        started = time.monotonic()
+        with transaction.atomic():
+            rows = list(
+                Activation.objects.select_for_update()
+                .filter(id__gt=last_id, revoked_at__lt=revoked_before)
+                .order_by("id")
+                .values(*ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+            ids = [row["id"] for row in rows]
+            archive(rows)
+            deleted, _ = Activation.objects.filter(id__in=ids, revoked_at__lt=revoked_before).delete()
+
+        # revoked rows aren't in any check payload: no cache to invalidate
+        last_id = ids[-1]
+        total += deleted
+        batches += 1
+        if on_batch:
+            on_batch(batches, deleted, time.monotonic() - started)
+        if len(rows) < batch_size:
+            break
+    return total
+
+
+def revoke_stale(*, seen_before, batch_size=1000, on_batch=None, now=None):
+    """
+    Revoke live activations whose instance hasn't been seen (last_seen_at,
+    else created_at for rows that predate heartbeats) since `seen_before`,
+    freeing their seats. Same id-keyset batching as archive_revoked(); each
+    batch bumps the affected keys' versions.
+
+    Only activation and /check/ calls carrying instance_id count as seen:
+    products that check without it look idle. This process's buffered
+    heartbeats are written first; other workers' can trail by up to their
+    flush interval, so a `seen_before` less than STALE_MIN_DAYS ago raises
+    ValueError.
+
+    on_batch(batch_no, rows, seconds) is called after each batch.
+    Returns the number of activations revoked.
+    """
+    now = timezone.now() if now is None else now
+    if seen_before > now - timedelta(days=STALE_MIN_DAYS):
+        raise ValueError(f"Activations must be unseen for at least {STALE_MIN_DAYS} days to count as stale")
+    heartbeats.flush(wait=True)
+    stale = Q(revoked_at__isnull=True) & (
+        Q(last_seen_at__lt=seen_before) | Q(last_seen_at__isnull=True, created_at__lt=seen_before)
+    )
+    total = batches = last_id = 0
+    while True:
+        started = time.monotonic()
+        with transaction.atomic():
+            rows = list(
+                Activation.objects.filter(stale, id__gt=last_id)
+                .order_by("id")
+                .values_list("id", "license__license_key__key")[:batch_size]
+            )
+            if not rows:
+                break
+            ids = [r[0] for r in rows]
+            # re-check: a heartbeat or re-activation may have landed since the select
+            revoked = Activation.objects.filter(stale, id__in=ids).update(revoked_at=now)
+            entitlements_changed(*{r[1] for r in rows})
+
+        last_id = ids[-1]
+        total += revoked
+        batches += 1
+        if on_batch:
+            on_batch(batches, revoked, time.monotonic() - started)
+        if len(rows) < batch_size:
+            break
+    return total
@@ -0,0 +1,85 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from licenses.lifecycle import ACTIONS, apply_bulk_lifecycle, select_licenses
+from licenses.models import Brand, License
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply suspend/resume/cancel/renew to many licenses of one brand, either from a "
+        "CSV of license_key,product_code rows or from a filter. Runs set-based UPDATEs in "
+        "batches of --batch-size rows, one transaction per batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=ACTIONS)
+        parser.add_argument("--brand", required=True, help="Brand name")
+        parser.add_argument("--items", help="CSV file with license_key,product_code rows")
+        parser.add_argument("--product", help="Filter: product code")
+        parser.add_argument("--status", choices=[c for c, _ in License.STATUS_CHOICES], help="Filter: current status")
+        parser.add_argument("--expires-before", help="Filter: expires_at < ISO datetime")
+        parser.add_argument("--expires-after", help="Filter: expires_at >= ISO datetime")
+        parser.add_argument("--all", action="store_true", help="Every license of the brand (no filter)")
+        parser.add_argument("--extend-days", type=int, default=365, help="renew only")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Only count matching licenses")
+
+    def handle(self, *args, **options):
+        brand = Brand.objects.filter(name=options["brand"]).first()
+        if not brand:
+            raise CommandError(f"Brand {options['brand']!r} not found")
+
+        if options["items"]:
+            with open(options["items"], newline="") as fh:
+                items = [
+                    {"license_key": row[0].strip(), "product_code": row[1].strip()}
+                    for row in csv.reader(fh)
+                    if len(row) >= 2 and row[0].strip() and row[0].strip() != "license_key"
+                ]
+            qs = select_licenses(brand, items=items)
+        else:
+            try:
+                qs = select_licenses(
+                    brand,
+                    product_code=options["product"],
+                    status=options["status"],
+                    expires_before=self._dt(options["expires_before"]),
+                    expires_after=self._dt(options["expires_after"]),
+                    all_licenses=options["all"],
+                )
+            except ValueError:
+                raise CommandError("Give --items, at least one filter option, or --all") from None
+
+        def on_batch(batch_no, rows, seconds):
+            self.stderr.write(f"batch {batch_no}: {rows} rows in {seconds * 1000:.1f} ms")
+
+        started = time.monotonic()
+        result = apply_bulk_lifecycle(
+            qs,
+            options["action"],
+            extend_days=options["extend_days"],
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+            on_batch=on_batch,
+        )
+        elapsed = max(time.monotonic() - started, 1e-9)
+
+        if options["dry_run"]:
+            self.stdout.write(f"dry run: {result['matched']} licenses would be updated ({options['action']})")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['action']}: updated {result['updated']} licenses in {result['batches']} batches, "
+            f"{elapsed:.1f}s ({result['updated'] / elapsed:.0f} rows/s)"
+        ))
+
+    def _dt(self, value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"Invalid datetime: {value!r}")
+        return parsed
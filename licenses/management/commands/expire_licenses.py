@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from licenses.lifecycle import sweep_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark valid licenses past their expires_at as expired, in batches. Run it from cron, "
+        "or with --loop as a long-running worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--loop", action="store_true", help="Keep sweeping every --interval seconds")
+        parser.add_argument("--interval", type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        def on_batch(batch_no, rows, seconds):
+            self.stderr.write(f"batch {batch_no}: expired {rows} licenses in {seconds * 1000:.1f} ms")
+
+        while True:
+            started = time.monotonic()
+            total = sweep_expired(batch_size=options["batch_size"], on_batch=on_batch)
+            self.stdout.write(f"swept {total} licenses in {time.monotonic() - started:.2f}s")
+
+            if not options["loop"]:
+                break
+            close_old_connections()
+            time.sleep(options["interval"])
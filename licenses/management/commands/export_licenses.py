@@ -0,0 +1,91 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from licenses.models import Activation, License, LicenseKey
+
+
+def _dt(value):
+    return value.isoformat() if value else None
+
+
+def serialize_license_key(lk):
+    """One NDJSON record per license key; the format import_licenses reads back."""
+    return {
+        "brand": lk.brand.name,
+        "license_key": lk.key,
+        "customer_email": lk.customer_email,
+        "created_at": _dt(lk.created_at),
+        "licenses": [
+            {
+                "product": lic.product.code,
+                "product_name": lic.product.name,
+                "status": lic.status,
+                "expires_at": _dt(lic.expires_at),
+                "max_activations": lic.max_activations,
+                "created_at": _dt(lic.created_at),
+                "activations": [
+                    {
+                        "instance_id": act.sent_instance_id or act.instance_id,
+                        "created_at": _dt(act.created_at),
+                        "revoked_at": _dt(act.revoked_at),
+                    }
+                    for act in lic.activations.all()
+                ],
+            }
+            for lic in lk.licenses.all()
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream all license keys (with licenses and activations) as NDJSON. "
+        "Uses server-side cursors where the database supports them, so memory stays "
+        "bounded by --chunk-size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+        parser.add_argument("--brand", help="Only export keys for this brand name")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+
+        qs = (
+            LicenseKey.objects
+            .select_related("brand")
+            .prefetch_related(
+                Prefetch("licenses", queryset=License.objects.select_related("product").order_by("id")),
+                Prefetch("licenses__activations", queryset=Activation.objects.order_by("id")),
+            )
+            .order_by("id")
+        )
+        if options["brand"]:
+            qs = qs.filter(brand__name=options["brand"])
+
+        to_stdout = options["output"] == "-"
+        out = self.stdout if to_stdout else open(options["output"], "w", encoding="utf-8")
+        started = time.monotonic()
+        count = 0
+        try:
+            # iterator(chunk_size=...) runs the prefetches per chunk, never for the full table
+            for lk in qs.iterator(chunk_size=chunk_size):
+                out.write(json.dumps(serialize_license_key(lk), separators=(",", ":")) + "\n")
+                count += 1
+                if count % chunk_size == 0:
+                    self._progress(count, started)
+        finally:
+            if not to_stdout:
+                out.close()
+
+        self._progress(count, started, final=True)
+
+    def _progress(self, count, started, final=False):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        msg = f"{'exported' if final else 'exporting'} {count} keys ({count / elapsed:.0f} keys/s)"
+        # progress goes to stderr so stdout stays pure NDJSON
+        self.stderr.write(self.style.SUCCESS(msg) if final else msg)
@@ -0,0 +1,103 @@
+import gzip
+import json
+import os
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from licenses.lifecycle import STALE_MIN_DAYS, archive_revoked, archive_to_table, revoke_stale
+
+
+class NdjsonArchive:
+    """
+    archive_revoked() sink appending one gzip member of NDJSON per batch.
+
+    The member is compressed in memory and appended with a single write, then
+    fsynced before archive_revoked() commits the delete. A failed write is
+    truncated away, so the batch's rows stay in the table and nothing partial
+    is left. A hard crash (power loss, SIGKILL) mid-write can still leave a
+    truncated last member: gzip readers then fail after the last complete
+    batch, and that batch's rows, whose delete never committed, are archived
+    again on the next run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, rows):
+        lines = "".join(
+            json.dumps({k: v.isoformat() if hasattr(v, "isoformat") else v for k, v in row.items()},
+                       separators=(",", ":")) + "\n"
+            for row in rows
+        )
+        member = gzip.compress(lines.encode("utf-8"))
+        with open(self.path, "ab") as fh:
+            size = fh.seek(0, os.SEEK_END)
+            try:
+                fh.write(member)
+                fh.flush()
+                os.fsync(fh.fileno())
+            except BaseException:
+                fh.truncate(size)
+                raise
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive and delete activations revoked more than --retention-days ago, in batches, "
+        "and optionally revoke activations not seen for --stale-days first. Archives go to the "
+        "ArchivedActivation table, or to a gzipped NDJSON file with --output. Run it from cron, "
+        "or with --loop as a long-running worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retention-days", type=float, default=90.0,
+                            help="Keep revoked activations this long before archiving them")
+        parser.add_argument("--stale-days", type=float,
+                            help="Also revoke live activations not seen for this long (off by default; at "
+                                 f"least {STALE_MIN_DAYS}, LICENSE_STALE_MIN_DAYS). Only activations and "
+                                 "/check/ calls with instance_id count as seen: keep it well above the "
+                                 "slowest client's check interval")
+        parser.add_argument("-o", "--output", help="Append archived rows to this .ndjson.gz file instead")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--loop", action="store_true", help="Keep collecting every --interval seconds")
+        parser.add_argument("--interval", type=float, default=3600.0)
+
+    def handle(self, *args, **options):
+        if options["retention_days"] < 0:
+            raise CommandError("--retention-days can't be negative")
+        if options["stale_days"] is not None and options["stale_days"] < STALE_MIN_DAYS:
+            raise CommandError(f"--stale-days must be at least {STALE_MIN_DAYS}")
+        archive = NdjsonArchive(options["output"]) if options["output"] else archive_to_table
+
+        def on_batch(verb):
+            def report(batch_no, rows, seconds):
+                self.stderr.write(
+                    f"batch {batch_no}: {verb} {rows} activations in {seconds * 1000:.1f} ms "
+                    f"({rows / max(seconds, 1e-9):.0f} rows/s)"
+                )
+            return report
+
+        while True:
+            now = timezone.now()
+            if options["stale_days"] is not None:
+                self._run("revoked", revoke_stale, options,
+                          seen_before=now - timedelta(days=options["stale_days"]), now=now,
+                          on_batch=on_batch("revoked"))
+            self._run("archived", archive_revoked, options,
+                      revoked_before=now - timedelta(days=options["retention_days"]), archive=archive,
+                      on_batch=on_batch("archived"))
+
+            if not options["loop"]:
+                break
+            close_old_connections()
+            time.sleep(options["interval"])
+
+    def _run(self, verb, sweep, options, **kwargs):
+        started = time.monotonic()
+        total = sweep(batch_size=options["batch_size"], **kwargs)
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(f"{verb} {total} activations in {elapsed:.2f}s ({total / elapsed:.0f} rows/s)")
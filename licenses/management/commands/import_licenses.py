@@ -0,0 +1,296 @@
+import json
+import time
+from datetime import timezone as dt_timezone
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from licenses.cache import entitlements_changed
+from licenses.models import Activation, Brand, License, LicenseKey, Product, normalize_instance_id
+
+
+def _dt(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"invalid datetime: {value!r}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def _check_record(record):
+    """Raise ValueError naming the first field import can't use."""
+    if not isinstance(record, dict):
+        raise ValueError("expected a JSON object")
+    for field in ("brand", "license_key", "customer_email"):
+        if not isinstance(record.get(field), str) or not record[field]:
+            raise ValueError(f"missing {field!r}")
+    dates = [record.get("created_at")]
+    for lic in record.get("licenses", []):
+        if not isinstance(lic, dict) or not lic.get("product") or not lic.get("expires_at"):
+            raise ValueError("each license needs 'product' and 'expires_at'")
+        if lic.get("status") and lic["status"] not in dict(License.STATUS_CHOICES):
+            raise ValueError(f"unknown license status {lic['status']!r}")
+        dates += [lic["expires_at"], lic.get("created_at")]
+        for act in lic.get("activations", []):
+            if not isinstance(act, dict) or not act.get("instance_id"):
+                raise ValueError("each activation needs 'instance_id'")
+            dates += [act.get("created_at"), act.get("revoked_at")]
+    for value in dates:
+        _dt(value)
+
+
+def _restore_created_at(model, stamps):
+    """
+    bulk_create runs pre_save, which makes auto_now_add overwrite created_at.
+    Put the imported timestamps ({pk: datetime}) back on the new rows.
+    """
+    if stamps:
+        model.objects.bulk_update([model(pk=pk, created_at=dt) for pk, dt in stamps.items()], ["created_at"])
+
+
+class Command(BaseCommand):
+    help = (
+        "Import NDJSON license keys (the export_licenses format) in chunked bulk_create "
+        "transactions. Each committed chunk is checkpointed, so an interrupted run can "
+        "be continued with --resume. Re-importing rows is idempotent."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file to import")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Records per transaction")
+        parser.add_argument("--checkpoint", help="Checkpoint file (default: <path>.checkpoint)")
+        parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.is_file():
+            raise CommandError(f"{path} does not exist")
+        checkpoint = Path(options["checkpoint"] or f"{path}.checkpoint")
+        batch_size = options["batch_size"]
+
+        offset, done, lineno = 0, 0, 0
+        if options["resume"] and checkpoint.exists():
+            state = json.loads(checkpoint.read_text())
+            offset, done = state["offset"], state["records"]
+            if "line" in state:
+                lineno = state["line"]
+            else:
+                # checkpoints from before "line" was saved: count what was read
+                with path.open("rb") as fh:
+                    lineno = fh.read(offset).count(b"\n")
+            self.stderr.write(f"resuming at record {done}, line {lineno + 1} (byte {offset})")
+
+        self._brands = {}    # name -> Brand
+        self._products = {}  # (brand_id, code) -> Product
+        self.counts = {"keys": 0, "licenses": 0, "activations": 0}
+
+        started = time.monotonic()
+        imported = 0
+        with path.open("rb") as fh:
+            fh.seek(offset)
+            batch = []  # (line number, record)
+            for raw in fh:
+                offset += len(raw)
+                lineno += 1
+                if not raw.strip():
+                    continue
+                try:
+                    record = json.loads(raw)
+                    _check_record(record)
+                except ValueError as exc:
+                    raise CommandError(f"line {lineno}: {exc}")
+                batch.append((lineno, record))
+
+                if len(batch) >= batch_size:
+                    self._import_batch(batch)
+                    imported += len(batch)
+                    self._checkpoint(checkpoint, offset, done + imported, lineno)
+                    self._progress(done + imported, imported, started)
+                    batch = []
+
+            if batch:
+                self._import_batch(batch)
+                imported += len(batch)
+                self._checkpoint(checkpoint, offset, done + imported, lineno)
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f"imported {imported} records in {elapsed:.1f}s ({imported / elapsed:.0f} records/s): "
+            f"{self.counts['keys']} keys, {self.counts['licenses']} licenses, "
+            f"{self.counts['activations']} activations created"
+        ))
+        checkpoint.unlink(missing_ok=True)
+
+    def _checkpoint(self, checkpoint, offset, records, line):
+        # line: physical lines read so far, blank ones included, for error messages after --resume
+        tmp = checkpoint.with_suffix(checkpoint.suffix + ".tmp")
+        tmp.write_text(json.dumps({"offset": offset, "records": records, "line": line}))
+        tmp.replace(checkpoint)
+
+    def _progress(self, total, imported, started):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stderr.write(f"{total} records ({imported / elapsed:.0f} records/s)")
+
+    def _import_batch(self, batch):
+        try:
+            self._import_records(batch)
+        except (DataError, IntegrityError) as exc:
+            raise CommandError(f"lines {batch[0][0]}-{batch[-1][0]}: {exc}")
+
+    @transaction.atomic
+    def _import_records(self, batch):
+        records = [r for _, r in batch]
+        brands = self._resolve_brands({r["brand"] for r in records})
+        products = self._resolve_products(
+            {
+                (brands[r["brand"]].id, lic["product"]): lic.get("product_name") or lic["product"]
+                for r in records
+                for lic in r.get("licenses", [])
+            }
+        )
+
+        # Keys: `key` is unique, so conflicts mean "already imported".
+        existing_keys = set(
+            LicenseKey.objects.filter(key__in=[r["license_key"] for r in records]).values_list("key", flat=True)
+        )
+        LicenseKey.objects.bulk_create(
+            [
+                LicenseKey(
+                    brand=brands[r["brand"]],
+                    customer_email=r["customer_email"],
+                    key=r["license_key"],
+                )
+                for r in records
+            ],
+            ignore_conflicts=True,
+        )
+        key_ids = dict(
+            LicenseKey.objects
+            .filter(key__in=[r["license_key"] for r in records])
+            .values_list("key", "id")
+        )
+        for lineno, r in batch:
+            if r["license_key"] not in key_ids:
+                # skipped by uniq_brand_customer_email, not by the key
+                raise CommandError(
+                    f"line {lineno}: {r['customer_email']} already has another license key for {r['brand']}"
+                )
+        self.counts["keys"] += len(key_ids) - len(existing_keys)
+        _restore_created_at(LicenseKey, {
+            key_ids[r["license_key"]]: _dt(r["created_at"])
+            for r in records
+            if r.get("created_at") and r["license_key"] not in existing_keys
+        })
+
+        # Licenses: diff against what exists, so only new rows are counted and restamped.
+        def existing_licenses():
+            return {
+                (lk_id, p_id): lic_id
+                for lic_id, lk_id, p_id in License.objects
+                .filter(license_key_id__in=key_ids.values())
+                .values_list("id", "license_key_id", "product_id")
+            }
+
+        licenses = existing_licenses()
+        to_create, stamps = {}, {}
+        for r in records:
+            lk_id = key_ids[r["license_key"]]
+            for lic in r.get("licenses", []):
+                p_id = products[(brands[r["brand"]].id, lic["product"])].id
+                if (lk_id, p_id) in licenses or (lk_id, p_id) in to_create:
+                    continue
+                to_create[(lk_id, p_id)] = License(
+                    license_key_id=lk_id,
+                    product_id=p_id,
+                    status=lic.get("status") or License.STATUS_VALID,
+                    expires_at=_dt(lic["expires_at"]),
+                    max_activations=lic.get("max_activations"),
+                )
+                if lic.get("created_at"):
+                    stamps[(lk_id, p_id)] = _dt(lic["created_at"])
+        if to_create:
+            License.objects.bulk_create(to_create.values())
+            licenses = existing_licenses()
+            self.counts["licenses"] += len(to_create)
+            _restore_created_at(License, {licenses[k]: dt for k, dt in stamps.items()})
+
+        # Activations: (license, instance_id) is unique, so conflicts are safe to ignore.
+        activations, stamps = {}, {}
+        for r in records:
+            lk_id = key_ids[r["license_key"]]
+            for lic in r.get("licenses", []):
+                lic_id = licenses[(lk_id, products[(brands[r["brand"]].id, lic["product"])].id)]
+                for act in lic.get("activations", []):
+                    instance_id = normalize_instance_id(act["instance_id"])
+                    activations.setdefault((lic_id, instance_id), Activation(
+                        license_id=lic_id,
+                        instance_id=instance_id,
+                        sent_instance_id=act["instance_id"],
+                        revoked_at=_dt(act.get("revoked_at")),
+                    ))
+                    if act.get("created_at"):
+                        stamps.setdefault((lic_id, instance_id), _dt(act["created_at"]))
+        if activations:
+            def existing_activations():
+                return {
+                    (lic_id, instance_id): pk
+                    for pk, lic_id, instance_id in Activation.objects
+                    .filter(license_id__in=licenses.values())
+                    .values_list("id", "license_id", "instance_id")
+                }
+
+            before = existing_activations()
+            Activation.objects.bulk_create(
+                [a for k, a in activations.items() if k not in before], ignore_conflicts=True
+            )
+            after = existing_activations()
+            self.counts["activations"] += len(after) - len(before)
+            _restore_created_at(Activation, {
+                after[k]: dt for k, dt in stamps.items() if k not in before and k in after
+            })
+
+        if to_create or activations:
+            # keys that already existed may have gained licenses/activations
+            entitlements_changed(*key_ids)
+
+    def _resolve_brands(self, names):
+        missing = [n for n in names if n not in self._brands]
+        if missing:
+            existing = {b.name: b for b in Brand.objects.filter(name__in=missing)}
+            new = [Brand(name=n) for n in missing if n not in existing]
+            if new:
+                Brand.objects.bulk_create(new, ignore_conflicts=True)
+                existing = {b.name: b for b in Brand.objects.filter(name__in=missing)}
+            self._brands.update(existing)
+        return self._brands
+
+    def _resolve_products(self, wanted):
+        """wanted: {(brand_id, code): name}"""
+        missing = {k: v for k, v in wanted.items() if k not in self._products}
+        if missing:
+            brand_ids = {b for b, _ in missing}
+            codes = {c for _, c in missing}
+
+            def fetch():
+                return {
+                    (p.brand_id, p.code): p
+                    for p in Product.objects.filter(brand_id__in=brand_ids, code__in=codes)
+                }
+
+            existing = fetch()
+            new = [
+                Product(brand_id=b, code=c, name=name)
+                for (b, c), name in missing.items()
+                if (b, c) not in existing
+            ]
+            if new:
+                Product.objects.bulk_create(new, ignore_conflicts=True)
+                existing = fetch()
+            self._products.update(existing)
+        return self._products
@@ -0,0 +1,100 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Min
+
+from licenses.cache import entitlements_changed
+from licenses.models import Activation, License, LicenseKey
+
+
+def duplicate_keys():
+    """[(kept LicenseKey, [other LicenseKey, ...])] per brand and customer with more than one key."""
+    groups = (
+        LicenseKey.objects.values("brand_id", "customer_email")
+        .annotate(n=Count("id")).filter(n__gt=1).order_by("brand_id", "customer_email")
+    )
+    out = []
+    for group in groups:
+        keys = list(
+            # only LicenseKey's own columns: this runs on databases still short of migration 0015
+            LicenseKey.objects.annotate(brand_name=F("brand__name"))
+            .filter(brand_id=group["brand_id"], customer_email=group["customer_email"]).order_by("id")
+        )
+        out.append((keys[0], keys[1:]))
+    return out
+
+
+def duplicate_licenses():
+    """[(kept license id, [other license ids])] per key and product with more than one license."""
+    groups = (
+        License.objects.values("license_key_id", "product_id")
+        .annotate(n=Count("id"), keep=Min("id")).filter(n__gt=1).order_by("license_key_id", "product_id")
+    )
+    return [
+        (
+            group["keep"],
+            list(
+                License.objects.filter(license_key_id=group["license_key_id"], product_id=group["product_id"])
+                .exclude(pk=group["keep"]).values_list("id", flat=True)
+            ),
+        )
+        for group in groups
+    ]
+
+
+def merge_licenses(keep, others):
+    """Move the other licenses' activations onto `keep` (one row per instance) and delete them."""
+    activations = Activation.objects.filter(license_id__in=others)
+    activations.filter(instance_id__in=Activation.objects.filter(license_id=keep).values("instance_id")).delete()
+    # one instance may be on several of the merged licenses: the newest row moves
+    moving = {}
+    for pk, instance_id in activations.order_by("created_at", "pk").values_list("pk", "instance_id"):
+        moving[instance_id] = pk
+    activations.exclude(pk__in=list(moving.values())).delete()
+    Activation.objects.filter(pk__in=list(moving.values())).update(license_id=keep)
+    License.objects.filter(pk__in=others).delete()
+
+
+class Command(BaseCommand):
+    help = (
+        "List license keys that share a brand and customer email, and licenses that share a "
+        "key and product (migration 0015 refuses to run while any exist). With --merge, fold "
+        "each group into its oldest row: the newer keys' licenses and activations move to the "
+        "oldest key and the newer key strings STOP WORKING, so reissue them to their customers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--merge", action="store_true", help="Merge the duplicates (default: only list them)")
+
+    def handle(self, *args, **options):
+        keys = duplicate_keys()
+        for kept, others in keys:
+            self.stdout.write(
+                f"{kept.brand_name} / {kept.customer_email}: keep {kept.key}, "
+                f"retire {', '.join(lk.key for lk in others)}"
+            )
+        licenses = duplicate_licenses()
+        if not options["merge"]:
+            self.stdout.write(
+                f"{len(keys)} customers with duplicate keys, {len(licenses)} duplicate licenses; "
+                f"rerun with --merge to merge them"
+            )
+            return
+
+        with transaction.atomic():
+            for kept, others in keys:
+                License.objects.filter(license_key__in=others).update(license_key_id=kept.id)
+                LicenseKey.objects.filter(pk__in=[lk.pk for lk in others]).delete()
+            licenses = duplicate_licenses()
+            for keep, others in licenses:
+                merge_licenses(keep, others)
+            # cached /check/ payloads of retired keys go too
+            changed = {lk.key for kept, others in keys for lk in [kept, *others]}
+            changed.update(
+                LicenseKey.objects.filter(licenses__id__in=[keep for keep, _ in licenses]).values_list("key", flat=True)
+            )
+            entitlements_changed(*changed)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"merged {sum(len(o) for _, o in keys)} keys into {len(keys)}, "
+            f"{sum(len(o) for _, o in licenses)} licenses into {len(licenses)}"
+        ))
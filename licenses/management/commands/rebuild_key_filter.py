@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from licenses.keyfilter import key_filter
+from licenses.models import LicenseKey
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the license key Bloom filter, report its memory footprint and measured "
+        "false-positive rate, and tell running servers (through the shared cache) to rebuild theirs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--probes", type=int, default=100_000, help="Random unknown keys to test")
+        parser.add_argument("--no-signal", action="store_true", help="Don't ask running servers to rebuild")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        bloom = key_filter.build()
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.stdout.write(
+            f"built: {bloom.count} keys in {elapsed:.2f}s ({bloom.count / elapsed:.0f} keys/s), "
+            f"capacity {bloom.capacity}, {bloom.num_hashes} hashes"
+        )
+        self.stdout.write(f"memory: {bloom.num_bits} bits = {bloom.memory_bytes / 1024:.1f} KiB")
+
+        probes = options["probes"]
+        if probes:
+            # freshly generated keys are unknown to the database, so every hit is a false positive
+            hits = sum(LicenseKey.generate_key() in bloom for _ in range(probes))
+            self.stdout.write(
+                f"false positives: {hits}/{probes} = {hits / probes:.4%} "
+                f"(expected {bloom.expected_fp_rate():.4%}, target {bloom.fp_rate:.2%})"
+            )
+
+        if not options["no_signal"]:
+            key_filter.bump_epoch()
+            self.stdout.write(self.style.SUCCESS("running servers will rebuild on their next unknown key"))
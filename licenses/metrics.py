@@ -0,0 +1,280 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    "LATENCY_BUCKETS": [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0],
+    "QUERY_BUCKETS": [0, 1, 2, 3, 5, 8, 13, 21, 50, 100],
+    "SLOW_REQUEST_MS": None,       # log requests slower than this (None = off)
+    "SLOW_REQUEST_MAX_SQL": 50,    # statements kept per request while the slow log is on
+}
+
+slow_log = logging.getLogger("licenses.slow_requests")
+
+# stats of the request being served; copied into sync_to_async threads, so
+# queries from async views land on the right request too
+_current = ContextVar("license_request_metrics", default=None)
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds", "statements")
+
+    def __init__(self, keep_sql):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.statements = [] if keep_sql else None
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    connection.execute_wrapper hook, installed once per DB connection (see
+    signals.py). Outside a request it is a single ContextVar lookup.
+    """
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.query_seconds += elapsed
+        if stats.statements is not None and len(stats.statements) < metrics.slow_request_max_sql:
+            stats.statements.append((elapsed, sql))
+
+
+class _ViewMetrics:
+    __slots__ = ("latency", "latency_sum", "count", "statuses", "queries", "query_seconds", "query_hist", "bytes", "slow")
+
+    def __init__(self, latency_buckets, query_buckets):
+        self.latency = [0] * (len(latency_buckets) + 1)   # last slot: +Inf
+        self.latency_sum = 0.0
+        self.count = 0
+        self.statuses = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.query_hist = [0] * (len(query_buckets) + 1)
+        self.bytes = 0
+        self.slow = 0
+
+
+class Metrics:
+    """
+    In-process request metrics keyed by URL name, rendered in the Prometheus
+    text exposition format by metrics_view. Each worker process exposes its own.
+    """
+
+    def __init__(self, options=None):
+        opts = {**DEFAULTS, **(options or {})}
+        self.enabled = opts["ENABLED"]
+        self.latency_buckets = list(opts["LATENCY_BUCKETS"])
+        self.query_buckets = list(opts["QUERY_BUCKETS"])
+        self.slow_request_ms = opts["SLOW_REQUEST_MS"]
+        self.slow_request_max_sql = opts["SLOW_REQUEST_MAX_SQL"]
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, status, seconds, stats, size, slow):
+        latency_slot = bisect_left(self.latency_buckets, seconds)
+        query_slot = bisect_left(self.query_buckets, stats.queries)
+        with self._lock:
+            m = self._views.get(view)
+            if m is None:
+                m = self._views[view] = _ViewMetrics(self.latency_buckets, self.query_buckets)
+            m.latency[latency_slot] += 1
+            m.latency_sum += seconds
+            m.count += 1
+            m.statuses[status] = m.statuses.get(status, 0) + 1
+            m.queries += stats.queries
+            m.query_seconds += stats.query_seconds
+            m.query_hist[query_slot] += 1
+            m.bytes += size
+            m.slow += slow
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        with self._lock:
+            views = {
+                name: (list(m.latency), m.latency_sum, m.count, dict(m.statuses), m.queries,
+                       m.query_seconds, list(m.query_hist), m.bytes, m.slow)
+                for name, m in sorted(self._views.items())
+            }
+
+        out = []
+
+        def family(name, kind, help_text):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, bounds, index, sum_index, count_index):
+            for view, v in views.items():
+                running = 0
+                for bound, n in zip(bounds + ["+Inf"], v[index]):
+                    running += n
+                    out.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {running}')
+                out.append(f'{name}_sum{{view="{view}"}} {v[sum_index]}')
+                out.append(f'{name}_count{{view="{view}"}} {v[count_index]}')
+
+        family("license_http_request_duration_seconds", "histogram", "Request latency by URL name.")
+        histogram("license_http_request_duration_seconds", self.latency_buckets, 0, 1, 2)
+
+        family("license_http_requests_total", "counter", "Requests by URL name and status code.")
+        for view, v in views.items():
+            for status, n in sorted(v[3].items()):
+                out.append(f'license_http_requests_total{{view="{view}",status="{status}"}} {n}')
+
+        family("license_db_queries_per_request", "histogram", "SQL statements per request.")
+        histogram("license_db_queries_per_request", self.query_buckets, 6, 4, 2)
+
+        family("license_db_query_duration_seconds_total", "counter", "Time spent executing SQL.")
+        for view, v in views.items():
+            out.append(f'license_db_query_duration_seconds_total{{view="{view}"}} {v[5]}')
+
+        family("license_http_response_bytes_total", "counter", "Response body bytes (streamed bodies excluded).")
+        for view, v in views.items():
+            out.append(f'license_http_response_bytes_total{{view="{view}"}} {v[7]}')
+
+        family("license_slow_requests_total", "counter", "Requests over SLOW_REQUEST_MS.")
+        for view, v in views.items():
+            out.append(f'license_slow_requests_total{{view="{view}"}} {v[8]}')
+
+        out.extend(_component_metrics())
+        return "\n".join(out) + "\n"
+
+
+def _component_metrics():
+    from .cache import entitlement_cache
+    from .heartbeats import heartbeats
+    from .keyfilter import key_filter
+    from .throttling import rate_limiter
+
+    c = entitlement_cache.stats()
+    lines = [
+        "# HELP license_check_cache_requests_total /check/ cache lookups by result.",
+        "# TYPE license_check_cache_requests_total counter",
+        f'license_check_cache_requests_total{{result="local_hit"}} {c["local_hits"]}',
+        f'license_check_cache_requests_total{{result="shared_hit"}} {c["hits"] - c["local_hits"]}',
+        f'license_check_cache_requests_total{{result="miss"}} {c["misses"]}',
+        "# HELP license_check_cache_hit_ratio Share of /check/ cache lookups that hit.",
+        "# TYPE license_check_cache_hit_ratio gauge",
+        f"license_check_cache_hit_ratio {c['hit_ratio']}",
+    ]
+
+    f = key_filter.stats()
+    lines += [
+        "# HELP license_key_filter_short_circuits_total Unknown keys rejected by the Bloom filter.",
+        "# TYPE license_key_filter_short_circuits_total counter",
+        f"license_key_filter_short_circuits_total {f['short_circuits']}",
+    ]
+    if f["built"]:
+        lines += [
+            "# HELP license_key_filter_keys Keys in the Bloom filter.",
+            "# TYPE license_key_filter_keys gauge",
+            f"license_key_filter_keys {f['keys']}",
+        ]
+
+    h = heartbeats.stats()
+    lines += [
+        "# HELP license_heartbeats_recorded_total Heartbeats accepted into the coalescing buffer.",
+        "# TYPE license_heartbeats_recorded_total counter",
+        f"license_heartbeats_recorded_total {h['recorded']}",
+        "# HELP license_heartbeats_pending Distinct (key, instance) pairs waiting for the next flush.",
+        "# TYPE license_heartbeats_pending gauge",
+        f"license_heartbeats_pending {h['pending']}",
+        "# HELP license_heartbeat_flush_statements_total UPDATE statements issued by heartbeat flushes.",
+        "# TYPE license_heartbeat_flush_statements_total counter",
+        f"license_heartbeat_flush_statements_total {h['statements']}",
+    ]
+
+    r = rate_limiter.stats()
+    lines += [
+        "# HELP license_rate_limit_requests_total Rate limiter decisions by scope.",
+        "# TYPE license_rate_limit_requests_total counter",
+    ]
+    for result in ("allowed", "throttled"):
+        for scope, n in sorted(r[result].items()):
+            lines.append(f'license_rate_limit_requests_total{{scope="{scope}",result="{result}"}} {n}')
+    return lines
+
+
+metrics = Metrics(getattr(settings, "LICENSE_METRICS", None))
+
+
+class MetricsMiddleware:
+    """
+    Records latency, SQL count/time and response size per URL name; logs slow
+    requests with their SQL to "licenses.slow_requests". Put it first in
+    MIDDLEWARE so it measures the whole stack. Works for sync and async views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not metrics.enabled:
+            return self.get_response(request)
+
+        stats = RequestStats(keep_sql=metrics.slow_request_ms is not None)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        if not metrics.enabled:
+            return await self.get_response(request)
+
+        stats = RequestStats(keep_sql=metrics.slow_request_ms is not None)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def _record(self, request, response, seconds, stats):
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else "unmatched"
+        if view == "metrics":
+            return
+        size = 0 if response.streaming else len(response.content)
+        slow = metrics.slow_request_ms is not None and seconds * 1000 >= metrics.slow_request_ms
+        metrics.observe(view, response.status_code, seconds, stats, size, slow)
+
+        if slow:
+            sql = "\n".join(f"  {elapsed * 1000:.2f} ms  {statement}" for elapsed, statement in stats.statements)
+            slow_log.warning(
+                "slow request: %s %s (%s) -> %s in %.1f ms, %d queries (%.1f ms)\n%s",
+                request.method, request.path, view, response.status_code, seconds * 1000,
+                stats.queries, stats.query_seconds * 1000, sql,
+            )
+
+
+def metrics_view(request):
+    """GET /metrics: Prometheus text exposition format (this process only)."""
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
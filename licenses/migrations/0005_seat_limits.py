@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0004_alter_activation_unique_together_alter_brand_api_key_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='license',
+            name='max_activations',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='max_activations',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+import secrets
+
+from django.db import migrations, models
+
+
+def generate_signing_secret():
+    # HMAC secrets were replaced by Ed25519 keys in 0017
+    return secrets.token_urlsafe(32)
+
+
+def generate_secrets(apps, schema_editor):
+    # the AddField default is evaluated once; give every existing brand its own secret
+    Brand = apps.get_model("licenses", "Brand")
+    for brand in Brand.objects.using(schema_editor.connection.alias):
+        brand.signing_secret = generate_signing_secret()
+        brand.save(update_fields=["signing_secret"], using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0005_seat_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='brand',
+            name='signing_secret',
+            field=models.CharField(default=generate_signing_secret, editable=False, max_length=64),
+        ),
+        migrations.RunPython(generate_secrets, migrations.RunPython.noop),
+    ]
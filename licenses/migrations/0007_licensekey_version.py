@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0006_brand_signing_secret'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='licensekey',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
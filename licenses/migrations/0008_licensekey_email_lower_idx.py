@@ -0,0 +1,16 @@
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0007_licensekey_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='licensekey',
+            index=models.Index(django.db.models.functions.text.Lower('customer_email'), name='licensekey_email_lower_idx'),
+        ),
+    ]
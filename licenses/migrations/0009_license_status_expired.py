@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0008_licensekey_email_lower_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='license',
+            name='status',
+            field=models.CharField(choices=[('valid', 'valid'), ('suspended', 'suspended'), ('cancelled', 'cancelled'), ('expired', 'expired')], default='valid', max_length=20),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0009_license_status_expired'),
+    ]
+
+    operations = [
+        # new indexes first, so lookups are never left without one mid-migration
+        migrations.AddIndex(
+            model_name='activation',
+            index=models.Index(condition=models.Q(('revoked_at__isnull', True)), fields=['license', 'instance_id'], name='activation_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activation',
+            index=models.Index(fields=['instance_id', 'license', 'revoked_at'], name='activation_instance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='license',
+            index=models.Index(condition=models.Q(('status', 'valid')), fields=['license_key', 'expires_at'], name='license_valid_by_key_idx'),
+        ),
+        # superseded by activation_instance_idx
+        migrations.RemoveIndex(
+            model_name='activation',
+            name='licenses_ac_instanc_66f950_idx',
+        ),
+        # FK indexes duplicating the leading column of a unique constraint
+        migrations.AlterField(
+            model_name='activation',
+            name='license',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='activations', to='licenses.license'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='brand',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='products', to='licenses.brand'),
+        ),
+        # unique=True already creates the index
+        migrations.AlterField(
+            model_name='licensekey',
+            name='key',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,76 @@
+import re
+
+from django.db import migrations
+
+
+_HOSTNAME = re.compile(r"[A-Za-z0-9-]+(\.[A-Za-z0-9-]+)+(:\d+)?")
+
+
+def normalize_instance_id(value):
+    # frozen copy of licenses.models.normalize_instance_id as of this migration
+    value = value.strip()
+    _, sep, rest = value.partition("://")
+    if sep:
+        value = rest
+    host, slash, path = value.partition("/")
+    if sep or _HOSTNAME.fullmatch(host):
+        host = host.lower()
+    return (host + slash + path).rstrip("/")
+
+
+def normalize_instance_ids(apps, schema_editor):
+    """
+    Rewrite stored instance ids in normalized form. Where rows of one license
+    collapse into the same instance, the live (else most recent) row is kept
+    and the others are deleted. Per batch of 5000 rows: one read of the rows
+    they would collide with, one DELETE, one bulk UPDATE.
+    """
+    Activation = apps.get_model("licenses", "Activation")
+    qs = Activation.objects.using(schema_editor.connection.alias)
+    last_pk = 0
+    while True:
+        batch = list(
+            qs.filter(pk__gt=last_pk).order_by("pk")
+            .values_list("pk", "license_id", "instance_id", "revoked_at", "created_at")[:5000]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        changed = [
+            (pk, lic, normalize_instance_id(iid), revoked_at, created_at)
+            for pk, lic, iid, revoked_at, created_at in batch
+            if normalize_instance_id(iid) != iid
+        ]
+        if not changed:
+            continue
+
+        # group each renamed row with the rows already holding its target id
+        groups = {}
+        for pk, lic, iid, revoked_at, created_at in changed:
+            groups.setdefault((lic, iid), []).append((pk, revoked_at, created_at))
+        for pk, lic, iid, revoked_at, created_at in qs.filter(
+            license_id__in={lic for lic, _ in groups}, instance_id__in={iid for _, iid in groups}
+        ).values_list("pk", "license_id", "instance_id", "revoked_at", "created_at"):
+            if (lic, iid) in groups:
+                groups[(lic, iid)].append((pk, revoked_at, created_at))
+
+        renamed, doomed = [], []
+        for (lic, iid), rows in groups.items():
+            keep = max(rows, key=lambda r: (r[1] is None, r[2], r[0]))
+            doomed += [r[0] for r in rows if r[0] != keep[0]]
+            renamed.append(Activation(pk=keep[0], instance_id=iid))
+        if doomed:
+            qs.filter(pk__in=doomed).delete()
+        # rows that already held the normalized id are rewritten to the same value
+        qs.bulk_update(renamed, ["instance_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0010_index_tuning'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_instance_ids, migrations.RunPython.noop),
+    ]
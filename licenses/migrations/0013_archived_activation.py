@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0012_activation_last_seen_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedActivation',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('license_id', models.BigIntegerField()),
+                ('instance_id', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField()),
+                ('revoked_at', models.DateTimeField()),
+                ('last_seen_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations, models
+
+
+def backfill_sent_instance_ids(apps, schema_editor):
+    """
+    Existing rows only know their normalized id (0011), so that is what they
+    echo until the instance activates again. pk-range batches keep each
+    UPDATE short on a large table.
+    """
+    Activation = apps.get_model("licenses", "Activation")
+    db = schema_editor.connection.alias
+    qs = Activation.objects.using(db)
+    last_pk = qs.aggregate(m=models.Max("pk"))["m"] or 0
+    for start in range(0, last_pk, 10_000):
+        qs.filter(pk__gt=start, pk__lte=start + 10_000, sent_instance_id="").update(
+            sent_instance_id=models.F("instance_id")
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0013_archived_activation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activation',
+            name='sent_instance_id',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.RunPython(backfill_sent_instance_ids, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='activation',
+            index=models.Index(
+                condition=models.Q(('revoked_at__isnull', True)),
+                fields=['license', 'instance_id', 'sent_instance_id'],
+                name='activation_live_sent_idx',
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name='activation',
+            name='activation_live_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='activation',
+            new_name='activation_live_idx',
+            old_name='activation_live_sent_idx',
+        ),
+    ]
@@ -0,0 +1,70 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+REPORT_LIMIT = 20
+
+
+def refuse_duplicates(apps, schema_editor):
+    """
+    Concurrent provisioning could create a second key for a customer of a
+    brand, or a second license for a product under one key. The constraints
+    below can't be added while such rows exist, and folding them together
+    would retire key strings customers already hold, so stop with a report
+    instead; `manage.py merge_duplicate_keys --merge` resolves them.
+    """
+    db = schema_editor.connection.alias
+    LicenseKey = apps.get_model("licenses", "LicenseKey")
+    License = apps.get_model("licenses", "License")
+
+    problems = []
+    dup_keys = (
+        LicenseKey.objects.using(db).values("brand_id", "customer_email")
+        .annotate(n=models.Count("id")).filter(n__gt=1).order_by("brand_id", "customer_email")
+    )
+    for group in dup_keys[:REPORT_LIMIT]:
+        keys = LicenseKey.objects.using(db).filter(
+            brand_id=group["brand_id"], customer_email=group["customer_email"]
+        ).order_by("id").values_list("key", flat=True)
+        problems.append(f"brand {group['brand_id']}, {group['customer_email']}: keys {', '.join(keys)}")
+    dup_licenses = (
+        License.objects.using(db).values("license_key__key", "product_id")
+        .annotate(n=models.Count("id")).filter(n__gt=1).order_by("license_key__key", "product_id")
+    )
+    for group in dup_licenses[:REPORT_LIMIT]:
+        problems.append(f"key {group['license_key__key']}: {group['n']} licenses of product {group['product_id']}")
+    if problems:
+        raise RuntimeError(
+            "Duplicate license keys or licenses must be merged before this migration; run "
+            "`manage.py merge_duplicate_keys` to review them (the first ones are below).\n  "
+            + "\n  ".join(problems)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0014_activation_sent_instance_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(refuse_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='license',
+            constraint=models.UniqueConstraint(fields=('license_key', 'product'), name='uniq_license_key_product'),
+        ),
+        migrations.AddConstraint(
+            model_name='licensekey',
+            constraint=models.UniqueConstraint(fields=('brand', 'customer_email'), name='uniq_brand_customer_email'),
+        ),
+        migrations.AlterField(
+            model_name='license',
+            name='license_key',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='licenses', to='licenses.licensekey'),
+        ),
+        migrations.AlterField(
+            model_name='licensekey',
+            name='brand',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='license_keys', to='licenses.brand'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_api_key_digests(apps, schema_editor):
+    Brand = apps.get_model("licenses", "Brand")
+    brands = list(Brand.objects.using(schema_editor.connection.alias).only("id", "api_key"))
+    for brand in brands:
+        brand.api_key_digest = hashlib.sha256(brand.api_key.encode()).hexdigest()
+    Brand.objects.using(schema_editor.connection.alias).bulk_update(brands, ["api_key_digest"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0015_unique_key_per_customer_and_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='brand',
+            name='api_key_digest',
+            field=models.CharField(default='', editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_api_key_digests, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='brand',
+            name='api_key_digest',
+            field=models.CharField(editable=False, max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,48 @@
+import licenses.models
+from django.db import migrations, models
+
+from license_client import SigningKey
+
+
+def generate_signing_keys(apps, schema_editor):
+    # the AddField default is evaluated once; give every existing brand its own key pair
+    Brand = apps.get_model("licenses", "Brand")
+    brands = list(Brand.objects.using(schema_editor.connection.alias).only("id"))
+    for brand in brands:
+        brand.signing_key = licenses.models.generate_signing_key()
+        brand.verify_key = SigningKey(brand.signing_key).verify_key
+    Brand.objects.using(schema_editor.connection.alias).bulk_update(
+        brands, ["signing_key", "verify_key"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0016_brand_api_key_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='brand',
+            name='signing_key',
+            field=models.CharField(default='', editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='brand',
+            name='verify_key',
+            field=models.CharField(default='', editable=False, max_length=64),
+            preserve_default=False,
+        ),
+        migrations.RunPython(generate_signing_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='brand',
+            name='signing_key',
+            field=models.CharField(default=licenses.models.generate_signing_key, editable=False, max_length=64),
+        ),
+        migrations.RemoveField(
+            model_name='brand',
+            name='signing_secret',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0017_brand_signing_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedactivation',
+            name='sent_instance_id',
+            field=models.CharField(default='', max_length=255),
+        ),
+    ]
@@ -1,13 +1,60 @@
+import hashlib
+import re
 import secrets
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 
+from license_client import SigningKey
+
 
 def generate_api_key():
     # short + recognizable prefix helps debugging
     return "br_" + secrets.token_hex(24)
 
 
+def api_key_digest(api_key):
+    # what brands are looked up by (Brand.api_key_digest, auth.py)
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def generate_signing_key():
+    # Ed25519 seed (base64url) for offline license tokens (see licenses/tokens.py)
+    return secrets.token_urlsafe(32)
+
+
+_HOSTNAME = re.compile(r"[A-Za-z0-9-]+(\.[A-Za-z0-9-]+)+(:\d+)?")
+
+
+def normalize_instance_id(value):
+    """
+    Canonical form of an instance id, applied before it is stored or matched:
+    scheme and trailing slashes dropped, and the host lowercased when the id is
+    URL-shaped (had a scheme, or starts with a dotted hostname).
+    "HTTPS://Example.com/Blog/" -> "example.com/Blog"; opaque machine ids such
+    as "MACHINE-Ab12" keep their case, since it may be significant.
+    """
+    value = value.strip()
+    _, sep, rest = value.partition("://")
+    if sep:
+        value = rest
+    host, slash, path = value.partition("/")
+    if sep or _HOSTNAME.fullmatch(host):
+        host = host.lower()
+    return (host + slash + path).rstrip("/")
+
+
+class BrandQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips save(), which keeps the digest and public key in step
+        objs = list(objs)
+        for obj in objs:
+            obj.api_key_digest = api_key_digest(obj.api_key)
+            if not obj.verify_key:
+                obj.verify_key = SigningKey(obj.signing_key).verify_key
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Brand(models.Model):
     name = models.CharField(max_length=255, unique=True)
     api_key = models.CharField(
@@ -16,15 +63,41 @@ class Brand(models.Model):
         default=generate_api_key,
         editable=False,
     )
+    # sha256 of api_key, set on save; authentication filters on this, never on the key itself
+    api_key_digest = models.CharField(max_length=64, unique=True, editable=False)
+    # private half signs offline tokens and never leaves the service; products ship verify_key
+    signing_key = models.CharField(
+        max_length=64,
+        default=generate_signing_key,
+        editable=False,
+    )
+    verify_key = models.CharField(max_length=64, editable=False)
+
+    objects = BrandQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        self.api_key_digest = api_key_digest(self.api_key)
+        if not self.verify_key:
+            self.verify_key = SigningKey(self.signing_key).verify_key
+        super().save(*args, **kwargs)
+
+    def rotate_signing_key(self):
+        # outstanding offline tokens stop verifying, and products need the new verify_key
+        self.signing_key = generate_signing_key()
+        self.verify_key = SigningKey(self.signing_key).verify_key
+        self.save(update_fields=["signing_key", "verify_key"])
 
     def __str__(self):
         return self.name
 
 
 class Product(models.Model):
-    brand = models.ForeignKey(Brand, on_delete=models.PROTECT, related_name="products")
+    # no index of its own: uniq_brand_product_code leads with brand
+    brand = models.ForeignKey(Brand, on_delete=models.PROTECT, related_name="products", db_index=False)
     code = models.CharField(max_length=64)
     name = models.CharField(max_length=255)
+    # default seat limit for new licenses of this product; null = unlimited
+    max_activations = models.PositiveIntegerField(null=True, blank=True)
 
     class Meta:
         constraints = [
@@ -35,12 +108,37 @@ class Product(models.Model):
         return f"{self.brand.name}:{self.code}"
 
 
+class LicenseKeyQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create sends no post_save; tell the key filter directly
+        from .keyfilter import license_keys_created
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+        license_keys_created(obj.key for obj in objs)
+        return objs
+
+
 class LicenseKey(models.Model):
-    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name="license_keys")
+    # no index of its own: uniq_brand_customer_email leads with brand
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name="license_keys", db_index=False)
     customer_email = models.EmailField(db_index=True)
-    key = models.CharField(max_length=64, unique=True, db_index=True)
+    key = models.CharField(max_length=64, unique=True)
+    # bumped on every entitlement/activation change; drives the /check/ ETag
+    version = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = LicenseKeyQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # one key per customer and brand; bulk provisioning upserts against it
+            models.UniqueConstraint(fields=["brand", "customer_email"], name="uniq_brand_customer_email")
+        ]
+        indexes = [
+            # case-insensitive lookups by email (ListLicensesByEmailView)
+            models.Index(Lower("customer_email"), name="licensekey_email_lower_idx"),
+        ]
+
     @staticmethod
     def generate_key() -> str:
         return "lk_" + secrets.token_urlsafe(24)
@@ -53,22 +151,37 @@ class License(models.Model):
     STATUS_VALID = "valid"
     STATUS_SUSPENDED = "suspended"
     STATUS_CANCELLED = "cancelled"
+    # set by the expiry sweeper (manage.py expire_licenses) once expires_at has passed
+    STATUS_EXPIRED = "expired"
     STATUS_CHOICES = [
         (STATUS_VALID, "valid"),
         (STATUS_SUSPENDED, "suspended"),
         (STATUS_CANCELLED, "cancelled"),
+        (STATUS_EXPIRED, "expired"),
     ]
 
-    license_key = models.ForeignKey(LicenseKey, on_delete=models.CASCADE, related_name="licenses")
+    # no index of its own: uniq_license_key_product leads with license_key
+    license_key = models.ForeignKey(LicenseKey, on_delete=models.CASCADE, related_name="licenses", db_index=False)
     product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name="licenses")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_VALID)
     expires_at = models.DateTimeField()
+    # concurrent activations allowed (distinct instance_ids); null = unlimited
+    max_activations = models.PositiveIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["license_key", "product"], name="uniq_license_key_product")
+        ]
         indexes = [
             models.Index(fields=["status"]),
             models.Index(fields=["expires_at"]),
+            # activation / seat checks: a key's valid licenses, expiry range-checked in the index
+            models.Index(
+                fields=["license_key", "expires_at"],
+                condition=models.Q(status="valid"),
+                name="license_valid_by_key_idx",
+            ),
         ]
 
     def is_active(self) -> bool:
@@ -76,19 +189,50 @@ class License(models.Model):
 
 
 class Activation(models.Model):
-    license = models.ForeignKey(License, on_delete=models.CASCADE, related_name="activations")
-    instance_id = models.CharField(max_length=255)  # url/host/machine_id
+    # no index of its own: uniq_license_instance leads with license
+    license = models.ForeignKey(License, on_delete=models.CASCADE, related_name="activations", db_index=False)
+    instance_id = models.CharField(max_length=255)  # url/host/machine_id, see normalize_instance_id()
+    # the id as the product last sent it, echoed in responses (active_instances);
+    # "" for rows written without one, which echo instance_id instead
+    sent_instance_id = models.CharField(max_length=255, default="")
     created_at = models.DateTimeField(auto_now_add=True)
     revoked_at = models.DateTimeField(null=True, blank=True)
+    # last activate or /check/?instance_id= from this instance; written in coalesced
+    # batches (licenses/heartbeats.py), so it can trail by up to FLUSH_INTERVAL
+    last_seen_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=["license", "instance_id"], name="uniq_license_instance")
         ]
         indexes = [
-            models.Index(fields=["instance_id"]),
+            # live activations per license (check payloads, seat counts): revoked rows,
+            # which only accumulate, stay out of the index; covers the check query
+            models.Index(
+                fields=["license", "instance_id", "sent_instance_id"],
+                condition=models.Q(revoked_at__isnull=True),
+                name="activation_live_idx",
+            ),
+            # lookups by instance: answered from the index without touching the table
+            models.Index(fields=["instance_id", "license", "revoked_at"], name="activation_instance_idx"),
         ]
 
     def revoke(self):
         self.revoked_at = timezone.now()
         self.save(update_fields=["revoked_at"])
+
+
+class ArchivedActivation(models.Model):
+    """
+    A revoked Activation moved out of the live table by gc_activations, under
+    the id it had there. No foreign keys and no secondary indexes: rows are
+    only appended and occasionally read back by id or license.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    license_id = models.BigIntegerField()
+    instance_id = models.CharField(max_length=255)
+    sent_instance_id = models.CharField(max_length=255, default="")
+    created_at = models.DateTimeField()
+    revoked_at = models.DateTimeField()
+    last_seen_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,176 @@
+import hashlib
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+
+
+DEFAULTS = {
+    "PRIMARY": "default",
+    "REPLICAS": [],               # DATABASES aliases; empty = everything on the primary
+    "SELECTION": "round_robin",   # or "least_latency"
+    "PIN_SECONDS": 5,             # read-your-writes window after a write
+    "ALIAS": "default",           # cache holding the pins (must be shared across workers)
+    "LATENCY_DECAY": 0.2,         # EWMA weight of the newest query (least_latency)
+}
+
+
+class _Route:
+    __slots__ = ("identities", "alias")
+
+    def __init__(self):
+        self.identities = None  # set by read_from_replica(); None = primary
+        self.alias = None       # chosen on the first read, then sticky for the request
+
+
+_route = ContextVar("license_db_route", default=None)
+
+
+def key_identity(license_key):
+    return "key:" + hashlib.sha256(str(license_key).encode()).hexdigest()[:32]
+
+
+def brand_identity(api_key):
+    return "brand:" + hashlib.sha256(str(api_key).encode()).hexdigest()[:32]
+
+
+def read_from_replica(*identities):
+    """
+    Called by read-only views: the rest of this request may read from a replica,
+    unless one of `identities` wrote recently (see pin()).
+    """
+    route = _route.get()
+    if route is not None:
+        route.identities = identities
+
+
+def read_replica_used():
+    """True once the current request has read from a replica (see ReplicaRouter)."""
+    route = _route.get()
+    return route is not None and route.alias is not None and route.alias != db_routing.primary
+
+
+class ReplicaRouting:
+    """
+    Replica selection and read-your-writes pins. Writers pin the identities they
+    touched (license key, brand) in the shared cache for PIN_SECONDS; a read-only
+    request naming a pinned identity stays on the primary.
+    """
+    pin_prefix = "lic:pin:"
+
+    def __init__(self, options=None):
+        opts = {**DEFAULTS, **(options or {})}
+        self.primary = opts["PRIMARY"]
+        self.replicas = list(opts["REPLICAS"])
+        self.selection = opts["SELECTION"]
+        self.pin_seconds = opts["PIN_SECONDS"]
+        self.alias = opts["ALIAS"]
+        self.decay = opts["LATENCY_DECAY"]
+
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self.latency = {}  # alias -> EWMA seconds per query
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def choose(self):
+        if self.selection == "least_latency":
+            # unmeasured replicas first, so every one gets a latency sample
+            return min(self.replicas, key=lambda alias: self.latency.get(alias, -1.0))
+        return self.replicas[next(self._counter) % len(self.replicas)]
+
+    def observe(self, alias, seconds):
+        with self._lock:
+            previous = self.latency.get(alias)
+            self.latency[alias] = seconds if previous is None else previous + self.decay * (seconds - previous)
+
+    def pin(self, *identities):
+        if self.replicas and identities:
+            self.shared.set_many({self.pin_prefix + i: 1 for i in identities}, timeout=self.pin_seconds)
+
+    def is_pinned(self, identities):
+        return bool(self.shared.get_many([self.pin_prefix + i for i in identities]))
+
+
+db_routing = ReplicaRouting(getattr(settings, "LICENSE_DB_ROUTING", None))
+
+
+def record_replica_latency(execute, sql, params, many, context):
+    """execute_wrapper for replica connections; feeds least_latency selection."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        db_routing.observe(context["connection"].alias, time.perf_counter() - started)
+
+
+class ReplicaRouter:
+    """
+    DATABASE_ROUTERS entry. Writes always go to the primary; reads go to a
+    replica only inside requests whose view called read_from_replica().
+    """
+
+    def db_for_read(self, model, **hints):
+        route = _route.get()
+        if route is None or route.identities is None or not db_routing.replicas:
+            return db_routing.primary
+        if route.alias is None:
+            pinned = route.identities and db_routing.is_pinned(route.identities)
+            route.alias = db_routing.primary if pinned else db_routing.choose()
+        return route.alias
+
+    def db_for_write(self, model, **hints):
+        # explicit, or Django would save instances back to the replica they came from
+        return db_routing.primary
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the same rows as the primary
+
+
+class ReadReplicaMiddleware:
+    """
+    Scopes replica routing to one request, and pins the calling brand after any
+    unsafe request so its next reads (by-email) see its own writes. License keys
+    are pinned by entitlements_changed() when their writes commit.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _route.set(_Route())
+        try:
+            response = self.get_response(request)
+        finally:
+            _route.reset(token)
+        self._pin_brand(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = _route.set(_Route())
+        try:
+            response = await self.get_response(request)
+        finally:
+            _route.reset(token)
+        self._pin_brand(request, response)
+        return response
+
+    def _pin_brand(self, request, response):
+        if request.method in ("GET", "HEAD", "OPTIONS") or response.status_code >= 400 or not db_routing.replicas:
+            return
+        api_key = request.headers.get("X-API-Key")
+        if api_key:
+            db_routing.pin(brand_identity(api_key))
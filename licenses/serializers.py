@@ -1,5 +1,20 @@
 from rest_framework import serializers
-from .models import Product
+from .lifecycle import ACTIONS
+from .models import License, Product, normalize_instance_id
+
+
+class InstanceIdField(serializers.CharField):
+    """CharField storing the normalized instance id (exact-match lookups)."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("max_length", 255)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        value = normalize_instance_id(super().to_internal_value(data))
+        if not value:
+            self.fail("blank")
+        return value
 
 
 class ProvisionLicenseSerializer(serializers.Serializer):
@@ -21,4 +36,94 @@ class ProvisionLicenseSerializer(serializers.Serializer):
 
 class ActivateSerializer(serializers.Serializer):
     license_key = serializers.CharField()
-    instance_id = serializers.CharField()
+    # kept as sent: the offline token echoes it, activate_instance() stores it normalized
+    instance_id = serializers.CharField(max_length=255)
+
+    def validate_instance_id(self, value):
+        if not normalize_instance_id(value):
+            raise serializers.ValidationError("Not a valid instance id.")
+        return value
+
+
+class BatchActivateSerializer(serializers.Serializer):
+    license_key = serializers.CharField()
+    # kept as sent, like ActivateSerializer.instance_id
+    instance_ids = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=1000,
+    )
+
+    def validate_instance_ids(self, values):
+        if not all(normalize_instance_id(v) for v in values):
+            raise serializers.ValidationError("Not a valid instance id.")
+        return values
+
+
+class InstanceLookupSerializer(serializers.Serializer):
+    instance_ids = serializers.ListField(
+        child=InstanceIdField(),
+        allow_empty=False,
+        max_length=1000,
+    )
+    include_revoked = serializers.BooleanField(default=False)
+
+
+class BatchCheckSerializer(serializers.Serializer):
+    license_keys = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        max_length=500,
+    )
+
+
+class BulkProvisionItemSerializer(serializers.Serializer):
+    # product codes are resolved against the brand once per batch (see view)
+    customer_email = serializers.EmailField()
+    product_codes = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False
+    )
+
+
+class BulkProvisionSerializer(serializers.Serializer):
+    items = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=10_000,
+    )
+
+
+class LifecycleItemSerializer(serializers.Serializer):
+    license_key = serializers.CharField()
+    product_code = serializers.CharField()
+
+
+class LifecycleFilterSerializer(serializers.Serializer):
+    product_code = serializers.CharField(required=False)
+    status = serializers.ChoiceField(choices=License.STATUS_CHOICES, required=False)
+    expires_before = serializers.DateTimeField(required=False)
+    expires_after = serializers.DateTimeField(required=False)
+    # the whole brand has to be asked for explicitly, never by an empty filter
+    all = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, attrs):
+        criteria = [f for f in attrs if f != "all"]
+        if not criteria and not attrs["all"]:
+            raise serializers.ValidationError('Give at least one filter criterion, or "all": true')
+        if criteria and attrs["all"]:
+            raise serializers.ValidationError('"all" can\'t be combined with filter criteria')
+        return attrs
+
+
+class BulkLifecycleSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=ACTIONS)
+    extend_days = serializers.IntegerField(required=False, default=365, min_value=1)
+    dry_run = serializers.BooleanField(required=False, default=False)
+    items = LifecycleItemSerializer(many=True, required=False, max_length=10_000)
+    filter = LifecycleFilterSerializer(required=False)
+
+    def validate(self, attrs):
+        if ("items" in attrs) == ("filter" in attrs):
+            raise serializers.ValidationError("Provide exactly one of items or filter")
+        return attrs
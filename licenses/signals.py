@@ -0,0 +1,37 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .auth import brand_key_cache
+from .keyfilter import license_keys_created
+from .metrics import record_query
+from .models import Brand, LicenseKey
+from .routers import db_routing, record_replica_latency
+from .tokens import signing_keys
+
+
+# Sent after a committed batch of set-based status changes (expiry sweeper,
+# bulk lifecycle). kwargs: license_ids, license_keys, status, reason.
+license_status_changed = Signal()
+
+
+@receiver([post_save, post_delete], sender=Brand)
+def invalidate_brand_caches(sender, instance, **kwargs):
+    brand_key_cache.invalidate_brand(instance.pk)
+    signing_keys.clear()
+
+
+@receiver(post_save, sender=LicenseKey)
+def add_to_key_filter(sender, instance, created, **kwargs):
+    if created:
+        license_keys_created([instance.key])
+
+
+@receiver(connection_created)
+def install_query_metrics(sender, connection, **kwargs):
+    # execute_wrappers outlives reconnects (CONN_MAX_AGE=0), so only add it once
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+    if connection.alias in db_routing.replicas and record_replica_latency not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_replica_latency)
+
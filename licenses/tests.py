@@ -1,3 +1,1534 @@
-from django.test import TestCase
+import base64
+import gzip
+import importlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.core.management import CommandError, call_command
+
+from django.db import connections
+from django.test import AsyncClient, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from license_client import InvalidToken, SigningKey, sign_token, verify_token
+
+from .auth import brand_key_cache
+from .cache import EntitlementCache, entitlement_cache
+from .heartbeats import HeartbeatBuffer, heartbeats
+from .keyfilter import BloomFilter, key_filter
+from .metrics import metrics
+from .routers import db_routing
+from .lifecycle import archive_revoked, revoke_stale, sweep_expired
+from .management.commands.gc_activations import NdjsonArchive
+from .models import (
+    Activation, ArchivedActivation, Brand, License, LicenseKey, Product, api_key_digest, generate_signing_key,
+    normalize_instance_id,
+)
+from .signals import license_status_changed
+from .throttling import CacheSlidingWindow, rate_limiter
+from .tokens import issue_token, signing_keys
+from .views import build_check_payload, check_entries
+
+
+
+def setUpModule():
+    # what a server does at startup; keeps the build out of per-test query counts
+    key_filter.build()
+
+
+def tearDownModule():
+    # nothing left for the exit-time flush once the test databases are gone
+    heartbeats.reset()
+
+
+class CheckLicenseKeyQueryCountTests(TestCase):
+    """
+    /check/ must build its payload from a fixed number of queries,
+    no matter how many licenses (products) hang off the key.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="RankMath")
+        cls.products = Product.objects.bulk_create(
+            [Product(brand=cls.brand, code=f"p{i}", name=f"Product {i}") for i in range(100)]
+        )
+
+    def setUp(self):
+        entitlement_cache.clear_local()
+        entitlement_cache.shared.clear()
+
+    def _make_key(self, n_licenses):
+        lk = LicenseKey.objects.create(
+            brand=self.brand,
+            customer_email=f"buyer{n_licenses}@example.com",
+            key=LicenseKey.generate_key(),
+        )
+        expires_at = timezone.now() + timedelta(days=365)
+        licenses = License.objects.bulk_create(
+            [
+                License(license_key=lk, product=p, expires_at=expires_at)
+                for p in self.products[:n_licenses]
+            ]
+        )
+        Activation.objects.bulk_create(
+            [Activation(license=lic, instance_id="https://example.com") for lic in licenses]
+        )
+        return lk
+
+    def test_query_count_is_constant(self):
+        for n in (1, 10, 100):
+            lk = self._make_key(n)
+            with self.subTest(licenses=n), self.assertNumQueries(3):
+                resp = self.client.get(reverse("check"), {"license_key": lk.key})
+
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(len(resp.json()["licenses"]), n)
+            self.assertTrue(all(lic["is_activated"] for lic in resp.json()["licenses"]))
+
+    def test_revoked_activations_are_excluded(self):
+        lk = self._make_key(2)
+        Activation.objects.filter(license__license_key=lk).update(revoked_at=timezone.now())
+
+        resp = self.client.get(reverse("check"), {"license_key": lk.key})
+
+        for lic in resp.json()["licenses"]:
+            self.assertEqual(lic["active_instances"], [])
+            self.assertFalse(lic["is_activated"])
+
+
+class BulkProvisionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="RankMath")
+        Product.objects.create(brand=cls.brand, code="rankmath", name="RankMath")
+        Product.objects.create(brand=cls.brand, code="content_ai", name="Content AI")
+
+    def _post(self, items):
+        return self.client.post(
+            reverse("provision_bulk"),
+            {"items": items},
+            content_type="application/json",
+            HTTP_X_API_KEY=self.brand.api_key,
+        )
+
+    def test_creates_keys_and_licenses_with_per_item_results(self):
+        resp = self._post([
+            {"customer_email": "a@example.com", "product_codes": ["rankmath", "content_ai"]},
+            {"customer_email": "b@example.com", "product_codes": ["rankmath"]},
+            {"customer_email": "c@example.com", "product_codes": ["nope"]},
+            {"customer_email": "not-an-email", "product_codes": ["rankmath"]},
+        ])
+
+        self.assertEqual(resp.status_code, 200)
+        body = resp.json()
+        self.assertEqual((body["succeeded"], body["failed"]), (2, 2))
+        self.assertEqual(len(body["results"][0]["licenses"]), 2)
+        self.assertIn("errors", body["results"][2])
+        self.assertIn("errors", body["results"][3])
+        self.assertEqual(LicenseKey.objects.count(), 2)
+        self.assertEqual(License.objects.count(), 3)
+
+    def test_is_idempotent_and_reuses_existing_keys(self):
+        items = [{"customer_email": "a@example.com", "product_codes": ["rankmath"]}]
+        first = self._post(items).json()["results"][0]["license_key"]
+
+        items.append({"customer_email": "a@example.com", "product_codes": ["content_ai"]})
+        results = self._post(items).json()["results"]
+
+        self.assertEqual({r["license_key"] for r in results}, {first})
+        self.assertEqual(LicenseKey.objects.count(), 1)
+        self.assertEqual(License.objects.count(), 2)
+
+    def test_concurrent_provision_of_the_same_customer_wins(self):
+        create_keys = LicenseKey.objects.bulk_create
+        create_licenses = License.objects.bulk_create
+
+        def key_race(objs, **kwargs):
+            LicenseKey.objects.create(brand=self.brand, customer_email="a@example.com", key="lk_raced")
+            return create_keys(objs, **kwargs)
+
+        def license_race(objs, **kwargs):
+            License.objects.create(
+                license_key=LicenseKey.objects.get(key="lk_raced"), product=self.brand.products.get(code="rankmath"),
+                expires_at=timezone.now() + timedelta(days=30),
+            )
+            return create_licenses(objs, **kwargs)
+
+        with mock.patch.object(LicenseKey.objects, "bulk_create", key_race), \
+                mock.patch.object(License.objects, "bulk_create", license_race):
+            result = self._post([{"customer_email": "a@example.com", "product_codes": ["rankmath"]}]).json()
+
+        self.assertEqual(result["results"][0]["license_key"], "lk_raced")
+        self.assertEqual(LicenseKey.objects.count(), 1)
+        self.assertEqual(License.objects.count(), 1)
+
+
+class DuplicateKeyTests(TransactionTestCase):
+    """Rows from before migration 0015: its constraints are dropped for these tests."""
+
+    def setUp(self):
+        for model, name in ((LicenseKey, "uniq_brand_customer_email"), (License, "uniq_license_key_product")):
+            constraint = next(c for c in model._meta.constraints if c.name == name)
+            others = [c for c in model._meta.constraints if c is not constraint]
+            with mock.patch.object(model._meta, "constraints", others), connections["default"].schema_editor() as editor:
+                editor.remove_constraint(model, constraint)
+            self.addCleanup(self._add_constraint, model, constraint)
+        # runs first: the constraints can't come back over duplicates
+        self.addCleanup(lambda: LicenseKey.objects.all().delete())
+
+        brand = Brand.objects.create(name="RankMath")
+        product = Product.objects.create(brand=brand, code="rankmath", name="RankMath")
+        expires_at = timezone.now() + timedelta(days=30)
+        for key, instances in (("lk_first", ["a.com"]), ("lk_second", ["a.com", "b.com"])):
+            lk = LicenseKey.objects.create(brand=brand, customer_email="a@example.com", key=key)
+            lic = License.objects.create(license_key=lk, product=product, expires_at=expires_at)
+            for instance_id in instances:
+                Activation.objects.create(license=lic, instance_id=instance_id)
+
+    def _add_constraint(self, model, constraint):
+        with connections["default"].schema_editor() as editor:
+            editor.add_constraint(model, constraint)
+
+    def test_migration_refuses_duplicates(self):
+        migration = importlib.import_module("licenses.migrations.0015_unique_key_per_customer_and_product")
+
+        with self.assertRaisesMessage(RuntimeError, "keys lk_first, lk_second"):
+            migration.refuse_duplicates(django_apps, mock.Mock(connection=connections["default"]))
+        self.assertEqual(LicenseKey.objects.count(), 2)
+
+    def test_merge_command_lists_then_merges_into_the_oldest_key(self):
+        out = StringIO()
+        call_command("merge_duplicate_keys", stdout=out)
+        self.assertIn("keep lk_first, retire lk_second", out.getvalue())
+        self.assertEqual(LicenseKey.objects.count(), 2)
+
+        call_command("merge_duplicate_keys", "--merge", stdout=StringIO())
+
+        self.assertEqual(list(LicenseKey.objects.values_list("key", flat=True)), ["lk_first"])
+        lic = License.objects.get()
+        self.assertEqual(sorted(lic.activations.values_list("instance_id", flat=True)), ["a.com", "b.com"])
+
+
+class BrandAPIKeyCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="RankMath")
+
+    def setUp(self):
+        brand_key_cache.clear()
+
+    def _list(self, api_key):
+        return self.client.get(reverse("by_email"), {"email": "a@example.com"}, HTTP_X_API_KEY=api_key)
+
+    def test_warm_cache_needs_no_auth_query(self):
+        self._list(self.brand.api_key)
+
+        # only the LicenseKey listing query remains
+        with self.assertNumQueries(1):
+            resp = self._list(self.brand.api_key)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_unknown_keys_are_negatively_cached(self):
+        self.assertEqual(self._list("br_nope").status_code, 403)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self._list("br_nope").status_code, 403)
+
+    def test_brand_save_invalidates(self):
+        self._list(self.brand.api_key)
+        self.brand.name = "Rank Math"
+        self.brand.save()
+
+        self.assertEqual(self._list(self.brand.api_key).json()["email"], "a@example.com")
+        found, brand = brand_key_cache.get(api_key_digest(self.brand.api_key))
+        self.assertTrue(found)
+        self.assertEqual(brand.name, "Rank Math")
+
+    def test_bulk_created_brands_authenticate_by_digest(self):
+        brand, = Brand.objects.bulk_create([Brand(name="WP Rocket")])
+
+        self.assertEqual(Brand.objects.get(api_key_digest=api_key_digest(brand.api_key)), brand)
+        self.assertEqual(self._list(brand.api_key).status_code, 200)
+
+
+class EntitlementCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="RankMath")
+        product = Product.objects.create(brand=cls.brand, code="rankmath", name="RankMath")
+        cls.lk = LicenseKey.objects.create(brand=cls.brand, customer_email="a@example.com", key="lk_cache")
+        License.objects.create(license_key=cls.lk, product=product, expires_at=timezone.now() + timedelta(days=30))
+
+    def setUp(self):
+        entitlement_cache.clear_local()
+        entitlement_cache.shared.clear()
+
+    def test_get_or_build_builds_once_and_never_caches_misses(self):
+        cache = EntitlementCache()
+        builder = mock.Mock(side_effect=lambda key: ({"license_key": key}, 60) if key == "lk_a" else (None, None))
+
+        self.assertEqual(cache.get_or_build("lk_a", builder), {"license_key": "lk_a"})
+        self.assertEqual(cache.get_or_build("lk_a", builder), {"license_key": "lk_a"})
+        self.assertIsNone(cache.get_or_build("lk_nope", builder))
+        self.assertIsNone(cache.get_or_build("lk_nope", builder))
+
+        self.assertEqual(builder.call_args_list, [mock.call("lk_a"), mock.call("lk_nope"), mock.call("lk_nope")])
+        self.assertEqual({k: cache.stats()[k] for k in ("hits", "local_hits", "misses")},
+                         {"hits": 1, "local_hits": 1, "misses": 3})
+
+    def test_local_tier_is_a_bounded_lru(self):
+        cache = EntitlementCache({"LOCAL_MAXSIZE": 2})
+        cache.get_or_build("lk_a", lambda key: ({"n": 1}, None))
+        cache.get_or_build("lk_b", lambda key: ({"n": 2}, None))
+        cache.get("lk_a")  # now the most recently used
+        cache.get_or_build("lk_c", lambda key: ({"n": 3}, None))
+        cache.shared.clear()
+
+        self.assertEqual(cache.stats()["local_size"], 2)
+        self.assertEqual(cache.get("lk_a"), {"n": 1})
+        self.assertIsNone(cache.get("lk_b"))
+        self.assertEqual(cache.get("lk_c"), {"n": 3})
+
+    def _commit_write(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("activate"), {"license_key": self.lk.key, "instance_id": "a.com"},
+                             content_type="application/json")
+
+    def test_a_build_racing_an_invalidation_is_never_served(self):
+        payload, generation = entitlement_cache.lookup(self.lk.key)
+        self.assertIsNone(payload)
+        stale, timeout = build_check_payload(self.lk.key)
+        # the write commits and invalidates between the build and the set
+        self._commit_write()
+        entitlement_cache.set(self.lk.key, stale, timeout, generation)
+
+        self.assertIsNone(entitlement_cache.get(self.lk.key))
+        entitlement_cache.clear_local()
+        self.assertIsNone(entitlement_cache.get(self.lk.key))
+        check = self.client.get(reverse("check"), {"license_key": self.lk.key}).json()
+        self.assertEqual(check["licenses"][0]["active_instances"], ["a.com"])
+
+    def test_a_batch_build_racing_an_invalidation_is_never_served(self):
+        other = LicenseKey.objects.create(brand=self.brand, customer_email="b@example.com", key="lk_cache_2")
+        found, generations = entitlement_cache.lookup_many([self.lk.key, other.key])
+        self.assertEqual((found, set(generations)), ({}, {self.lk.key, other.key}))
+        built = check_entries(list(generations))
+        self._commit_write()
+        entitlement_cache.set_many(built, generations)
+        entitlement_cache.clear_local()
+
+        found, generations = entitlement_cache.lookup_many([self.lk.key, other.key])
+        self.assertEqual((list(found), list(generations)), ([other.key], [self.lk.key]))
+
+    def test_writes_invalidate_the_cached_check(self):
+        api = {"content_type": "application/json", "HTTP_X_API_KEY": self.brand.api_key}
+        instance = {"license_key": self.lk.key, "instance_id": "a.com"}
+        writes = [
+            ("provision", lambda: self.client.post(
+                reverse("provision"), {"customer_email": "a@example.com", "product_codes": ["rankmath"]}, **api)),
+            ("activate", lambda: self.client.post(reverse("activate"), instance, content_type="application/json")),
+            ("deactivate", lambda: self.client.post(
+                reverse("deactivate"), {**instance, "product_code": "rankmath"}, content_type="application/json")),
+            ("lifecycle", lambda: self.client.post(
+                reverse("lifecycle_bulk"),
+                {"action": "suspend", "items": [{"license_key": self.lk.key, "product_code": "rankmath"}]}, **api)),
+        ]
+        for name, write in writes:
+            with self.subTest(write=name):
+                self.client.get(reverse("check"), {"license_key": self.lk.key})
+                self.assertIsNotNone(entitlement_cache.get(self.lk.key))
+
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.assertLess(write().status_code, 300)
+
+                self.assertIsNone(entitlement_cache.get(self.lk.key))
+
+
+class BatchActivateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="RankMath")
+        product = Product.objects.create(brand=cls.brand, code="rankmath", name="RankMath")
+        cls.lk = LicenseKey.objects.create(brand=cls.brand, customer_email="a@example.com", key="lk_batch")
+        cls.lic = License.objects.create(
+            license_key=cls.lk, product=product, expires_at=timezone.now() + timedelta(days=30)
+        )
+
+    def _post(self, instance_ids):
+        return self.client.post(
+            reverse("activate_batch"),
+            {"license_key": self.lk.key, "instance_ids": instance_ids},
+            content_type="application/json",
+        )
+
+    def test_activates_all_instances_and_unrevokes(self):
+        Activation.objects.create(license=self.lic, instance_id="a.com", revoked_at=timezone.now())
+
+        resp = self._post(["https://a.com", "https://b.com", "https://b.com"])
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.json()["activated"]), 2)
+        self.assertEqual(
+            set(Activation.objects.filter(revoked_at__isnull=True).values_list("instance_id", flat=True)),
+            {"a.com", "b.com"},
+        )
+
+    def test_inactive_licenses_are_rejected(self):
+        License.objects.update(status=License.STATUS_SUSPENDED)
+
+        self.assertEqual(self._post(["https://a.com"]).status_code, 403)
+        self.assertFalse(Activation.objects.exists())
+
+
+class ActivateQueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="RankMath")
+        products = Product.objects.bulk_create(
+            [Product(brand=cls.brand, code=f"p{i}", name=f"Product {i}") for i in range(20)]
+        )
+        cls.lk = LicenseKey.objects.create(brand=cls.brand, customer_email="a@example.com", key="lk_act")
+        License.objects.bulk_create(
+            [
+                License(license_key=cls.lk, product=p, expires_at=timezone.now() + timedelta(days=30))
+                for p in products
+            ]
+        )
+
+    def _activate(self, instance_id="https://a.com"):
+        return self.client.post(
+            reverse("activate"),
+            {"license_key": self.lk.key, "instance_id": instance_id},
+            content_type="application/json",
+        )
+
+    def test_query_count_does_not_grow_with_products_and_is_idempotent(self):
+        Activation.objects.create(
+            license=License.objects.first(), instance_id="a.com", revoked_at=timezone.now()
+        )
+
+        for _ in range(2):
+            # savepoint, key lookup, locked active licenses, one upsert, version bump, release
+            with self.assertNumQueries(6):
+                resp = self._activate()
+            self.assertEqual(len(resp.json()["activated"]), 20)
+
+        self.assertEqual(Activation.objects.count(), 20)
+        self.assertFalse(Activation.objects.filter(revoked_at__isnull=False).exists())
+
+
+class SeatLimitTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="RankMath")
+        limited = Product.objects.create(brand=cls.brand, code="rankmath", name="RankMath", max_activations=2)
+        unlimited = Product.objects.create(brand=cls.brand, code="content_ai", name="Content AI")
+        cls.lk = LicenseKey.objects.create(brand=cls.brand, customer_email="a@example.com", key="lk_seats")
+        for p in (limited, unlimited):
+            License.objects.create(
+                license_key=cls.lk, product=p, max_activations=p.max_activations,
+                expires_at=timezone.now() + timedelta(days=30),
+            )
+
+    def _activate(self, instance_id):
+        return self.client.post(
+            reverse("activate"),
+            {"license_key": self.lk.key, "instance_id": instance_id},
+            content_type="application/json",
+        )
+
+    def test_limit_is_enforced_per_license(self):
+        self._activate("https://a.com")
+        self._activate("https://b.com")
+        resp = self._activate("https://c.com")
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([a["product"] for a in resp.json()["activated"]], ["content_ai"])
+        self.assertEqual(resp.json()["rejected"][0]["product"], "rankmath")
+        self.assertEqual(
+            Activation.objects.filter(license__product__code="rankmath", revoked_at__isnull=True).count(), 2
+        )
+
+    def test_reactivating_an_existing_instance_takes_no_new_seat(self):
+        self._activate("https://a.com")
+        self._activate("https://b.com")
+
+        resp = self._activate("https://a.com")
+
+        self.assertNotIn("rejected", resp.json())
+
+    def test_deactivation_frees_a_seat(self):
+        self._activate("https://a.com")
+        self._activate("https://b.com")
+        self.client.post(
+            reverse("deactivate"),
+            {"license_key": self.lk.key, "product_code": "rankmath", "instance_id": "https://a.com"},
+            content_type="application/json",
+        )
+
+        resp = self._activate("https://c.com")
+
+        self.assertNotIn("rejected", resp.json())
+
+
+class OfflineTokenTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="RankMath")
+        product = Product.objects.create(brand=cls.brand, code="rankmath", name="RankMath")
+        cls.lk = LicenseKey.objects.create(brand=cls.brand, customer_email="a@example.com", key="lk_token")
+        License.objects.create(license_key=cls.lk, product=product, expires_at=timezone.now() + timedelta(days=30))
+
+    def setUp(self):
+        entitlement_cache.clear_local()
+        entitlement_cache.shared.clear()
+        signing_keys.clear()
+
+    def test_activation_and_check_tokens_verify_offline(self):
+        token = self.client.post(
+            reverse("activate"),
+            {"license_key": self.lk.key, "instance_id": "https://a.com"},
+            content_type="application/json",
+        ).json()["token"]
+        payload = verify_token(token, self.brand.verify_key, instance_id="https://a.com", product="rankmath")
+        self.assertEqual(payload["key"], self.lk.key)
+
+        token = self.client.get(
+            reverse("check"), {"license_key": self.lk.key, "instance_id": "https://a.com"}
+        ).json()["token"]
+        verify_token(token, self.brand.verify_key, instance_id="https://a.com", product="rankmath")
+
+        with self.assertRaises(InvalidToken):
+            verify_token(token, self.brand.verify_key, instance_id="https://b.com")
+
+    def _activate(self, instance_id):
+        self.client.post(reverse("activate"), {"license_key": self.lk.key, "instance_id": instance_id},
+                         content_type="application/json")
+
+    def test_rotated_key_invalidates_tokens(self):
+        self._activate("https://a.com")
+        token = self.client.get(
+            reverse("check"), {"license_key": self.lk.key, "instance_id": "https://a.com"}
+        ).json()["token"]
+        old_verify_key = self.brand.verify_key
+        self.brand.rotate_signing_key()
+
+        with self.assertRaises(InvalidToken):
+            verify_token(token, self.brand.verify_key)
+        verify_token(token, old_verify_key)
+
+    def test_rotation_in_another_process_is_picked_up_after_the_ttl(self):
+        self._activate("https://a.com")
+        signing_keys.get(self.brand.name)
+        # what another worker's rotation looks like here: no signal in this process
+        seed = generate_signing_key()
+        Brand.objects.filter(pk=self.brand.pk).update(signing_key=seed, verify_key=SigningKey(seed).verify_key)
+
+        with mock.patch("licenses.tokens.time.monotonic", return_value=time.monotonic() + signing_keys.ttl + 1):
+            token = self.client.get(
+                reverse("check"), {"license_key": self.lk.key, "instance_id": "https://a.com"}
+            ).json()["token"]
+        verify_token(token, SigningKey(seed).verify_key)
+
+    def test_no_token_without_entitlements(self):
+        resp = self.client.get(reverse("check"), {"license_key": self.lk.key, "instance_id": "https://a.com"})
+        self.assertIsNone(resp.json()["token"])
+
+        empty = issue_token(signing_keys.get(self.brand.name), brand=self.brand.name, license_key=self.lk.key,
+                            instance_id="https://a.com", products=[])
+        with self.assertRaises(InvalidToken):
+            verify_token(empty, self.brand.verify_key)
+
+    def test_products_cannot_forge_tokens(self):
+        # everything a product ships is the public key, and that doesn't sign
+        self._activate("https://a.com")
+        token = self.client.get(
+            reverse("check"), {"license_key": self.lk.key, "instance_id": "https://a.com"}
+        ).json()["token"]
+        version, body, sig = token.split(".")
+        forged = sign_token({"alg": "EdDSA", "products": {"rankmath": 2**40}, "instance": "https://a.com",
+                             "rdl": 2**40}, SigningKey(generate_signing_key()))
+        for bad in [forged, f"{version}.{forged.split('.')[1]}.{sig}", f"v1.{body}.{sig}"]:
+            with self.subTest(token=bad), self.assertRaises(InvalidToken):
+                verify_token(bad, self.brand.verify_key)
+
+    def test_ed25519_matches_rfc8032(self):
+        # RFC 8032 section 7.1, test 2
+        seed = bytes.fromhex("4ccd089b28ff96da9db6c346ec114e0f5b8a319f35aba624da8cf6ed4fb8a6fb")
+        key = SigningKey(base64.urlsafe_b64encode(seed).rstrip(b"=").decode())
+        self.assertEqual(
+            base64.urlsafe_b64decode(key.verify_key + "="),
+            bytes.fromhex("3d4017c3e843895a92b70aa74d1b7ebc9c982ccf2ec4968cc0cd55f12af4660c"),
+        )
+        self.assertEqual(key.sign(b"\x72").hex(), (
+            "92a009a9f0d4cab8720e820b5f642540a2b27b5416503f8fb3762223ebdb69da"
+            "085ac1e43e15996e458f3613d0f11d8c387b2eaeb4302aeeb00d291612bb0c00"
+        ))
+
+
+class CheckETagTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="RankMath")
+        product = Product.objects.create(brand=cls.brand, code="rankmath", name="RankMath")
+        cls.lk = LicenseKey.objects.create(brand=cls.brand, customer_email="a@example.com", key="lk_etag")
+        License.objects.create(license_key=cls.lk, product=product, expires_at=timezone.now() + timedelta(days=30))
+
+    def setUp(self):
+        entitlement_cache.clear_local()
+        entitlement_cache.shared.clear()
+
+    def _check(self, **headers):
+        return self.client.get(reverse("check"), {"license_key": self.lk.key}, headers=headers)
+
+    def test_unchanged_key_gets_304_from_version_alone(self):
+        etag = self._check()["ETag"]
+        entitlement_cache.clear_local()
+        entitlement_cache.shared.clear()
+
+        with self.assertNumQueries(1):
+            resp = self._check(if_none_match=etag)
+
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp["ETag"], etag)
+
+    def test_writes_change_the_etag(self):
+        etag = self._check()["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("activate"),
+                {"license_key": self.lk.key, "instance_id": "https://a.com"},
+                content_type="application/json",
+            )
+
+        resp = self._check(if_none_match=etag)
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+        self.assertEqual(resp.json()["licenses"][0]["active_instances"], ["https://a.com"])
+
+    def test_etag_goes_stale_at_next_expiry(self):
+        etag = self._check()["ETag"]
+        License.objects.update(expires_at=timezone.now() - timedelta(seconds=1))  # no version bump
+        entitlement_cache.clear_local()
+        entitlement_cache.shared.clear()
+        version = LicenseKey.objects.get(pk=self.lk.pk).version
+
+        self.assertTrue(etag.startswith(f'"{version}-'))
+        with mock.patch("licenses.views.time.time", return_value=time.time() + 31 * 86400):
+            resp = self._check(if_none_match=etag)
+        self.assertEqual(resp.status_code, 200)
+
+
+class ListByEmailTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="RankMath")
+        LicenseKey.objects.bulk_create(
+            [
+                LicenseKey(brand=cls.brand, customer_email=email, key=f"lk_email_{i}")
+                for i, email in enumerate(["Buyer@Example.com", "buyer@example.com", "BUYER@example.com", "x@y.com"])
+            ]
+        )
+
+    def _list(self, **params):
+        return self.client.get(
+            reverse("by_email"), {"email": "buyer@EXAMPLE.com", **params}, HTTP_X_API_KEY=self.brand.api_key
+        )
+
+    def test_keyset_pagination_is_case_insensitive(self):
+        seen = []
+        cursor = None
+        while True:
+            body = self._list(limit=2, **({"cursor": cursor} if cursor else {})).json()
+            seen += [r["license_key"] for r in body["results"]]
+            cursor = body["next_cursor"]
+            if not cursor:
+                break
+
+        self.assertEqual(seen, ["lk_email_0", "lk_email_1", "lk_email_2"])
+
+    def test_streaming_ndjson(self):
+        resp = self._list(stream=1)
+
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson")
+        lines = b"".join(resp.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["license_key"] for line in lines], ["lk_email_0", "lk_email_1", "lk_email_2"])
+
+    def test_bad_cursor(self):
+        self.assertEqual(self._list(cursor="nope").status_code, 400)
+
+
+class BulkLifecycleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="RankMath")
+        other = Brand.objects.create(name="WP Rocket")
+        cls.product = Product.objects.create(brand=cls.brand, code="rankmath", name="RankMath")
+        other_product = Product.objects.create(brand=other, code="rocket", name="WP Rocket")
+        expires_at = timezone.now() + timedelta(days=30)
+        for i in range(5):
+            lk = LicenseKey.objects.create(brand=cls.brand, customer_email=f"{i}@example.com", key=f"lk_bulk_{i}")
+            License.objects.create(license_key=lk, product=cls.product, expires_at=expires_at)
+        lk = LicenseKey.objects.create(brand=other, customer_email="0@example.com", key="lk_other")
+        License.objects.create(license_key=lk, product=other_product, expires_at=expires_at)
+
+    def _post(self, body):
+        return self.client.post(
+            reverse("lifecycle_bulk"), body, content_type="application/json", HTTP_X_API_KEY=self.brand.api_key
+        )
+
+    def test_filter_run_is_brand_scoped_and_dry_run_counts_only(self):
+        body = {"action": "suspend", "filter": {"product_code": "rankmath"}, "dry_run": True}
+        self.assertEqual(self._post(body).json()["matched"], 5)
+        self.assertFalse(License.objects.filter(status=License.STATUS_SUSPENDED).exists())
+
+        body["dry_run"] = False
+        self.assertEqual(self._post({**body, "filter": {"all": True}}).json()["updated"], 5)
+        self.assertEqual(License.objects.filter(status=License.STATUS_SUSPENDED).count(), 5)
+
+    def test_items_and_resume_skips_cancelled(self):
+        self._post({"action": "suspend", "filter": {"all": True}})
+        self._post({"action": "cancel", "items": [{"license_key": "lk_bulk_0", "product_code": "rankmath"}]})
+
+        result = self._post({"action": "resume", "filter": {"all": True}}).json()
+
+        self.assertEqual(result["updated"], 4)
+        self.assertEqual(License.objects.get(license_key__key="lk_bulk_0").status, License.STATUS_CANCELLED)
+
+    def test_empty_filter_is_rejected(self):
+        for criteria in ({}, {"all": False}, {"all": True, "status": "valid"}):
+            with self.subTest(filter=criteria):
+                self.assertEqual(self._post({"action": "cancel", "filter": criteria}).status_code, 400)
+        self.assertFalse(License.objects.filter(status=License.STATUS_CANCELLED).exists())
+
+    def test_renew_extends_from_expiry(self):
+        before = License.objects.get(license_key__key="lk_bulk_1").expires_at
+
+        self._post({"action": "renew", "extend_days": 10, "items": [{"license_key": "lk_bulk_1", "product_code": "rankmath"}]})
+
+        self.assertEqual(License.objects.get(license_key__key="lk_bulk_1").expires_at, before + timedelta(days=10))
+
+
+class ExpirySweeperTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name="RankMath")
+        cls.lk = LicenseKey.objects.create(brand=brand, customer_email="a@example.com", key="lk_sweep")
+        now = timezone.now()
+        for n, (days, status) in enumerate([(-2, License.STATUS_VALID), (-1, License.STATUS_VALID),
+                                            (-1, License.STATUS_SUSPENDED), (5, License.STATUS_VALID)]):
+            product = Product.objects.create(brand=brand, code=f"p{n}", name=f"Product {n}")
+            License.objects.create(
+                license_key=cls.lk, product=product, status=status, expires_at=now + timedelta(days=days)
+            )
+
+    def test_expires_only_lapsed_valid_licenses_and_emits_events(self):
+        events = []
+
+        def receiver(sender, **kwargs):
+            events.append(kwargs)
+
+        license_status_changed.connect(receiver)
+        self.addCleanup(license_status_changed.disconnect, receiver)
+        batches = []
+
+        with self.captureOnCommitCallbacks(execute=True):
+            total = sweep_expired(batch_size=1, on_batch=lambda *args: batches.append(args))
+
+        self.assertEqual(total, 2)
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(
+            sorted(License.objects.values_list("status", flat=True)),
+            ["expired", "expired", "suspended", "valid"],
+        )
+        self.assertEqual([e["status"] for e in events], ["expired", "expired"])
+        self.assertEqual(LicenseKey.objects.get(pk=self.lk.pk).version, 3)
+        self.assertEqual(sweep_expired(), 0)
+
+
+class ImportExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name="RankMath")
+        products = [Product.objects.create(brand=brand, code=f"p{i}", name=f"Product {i}") for i in range(2)]
+        for i in range(3):
+            lk = LicenseKey.objects.create(brand=brand, customer_email=f"{i}@example.com", key=f"lk_io_{i}")
+            for product in products[:i + 1]:
+                lic = License.objects.create(license_key=lk, product=product, expires_at=timezone.now() + timedelta(days=30))
+                Activation.objects.create(license=lic, instance_id="a.com", sent_instance_id="https://A.com")
+        past = timezone.now() - timedelta(days=400)
+        for model in (LicenseKey, License, Activation):
+            model.objects.update(created_at=past)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def _export(self, name):
+        path = os.path.join(self.dir, name)
+        call_command("export_licenses", "-o", path, stderr=StringIO())
+        with open(path, encoding="utf-8") as fh:
+            return path, fh.read()
+
+    def _import(self, path, *args):
+        out = StringIO()
+        call_command("import_licenses", path, *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def _wipe(self):
+        LicenseKey.objects.all().delete()
+        Product.objects.all().delete()
+        Brand.objects.all().delete()
+
+    def test_export_import_round_trip(self):
+        path, exported = self._export("a.ndjson")
+        self._wipe()
+
+        self.assertIn("3 keys, 5 licenses, 5 activations created", self._import(path))
+        self.assertEqual(self._export("b.ndjson")[1], exported)
+        self.assertIn("0 keys, 0 licenses, 0 activations created", self._import(path))
+        self.assertTrue(LicenseKey._meta.get_field("created_at").auto_now_add)
+
+    def test_interrupted_import_resumes_after_the_last_batch(self):
+        from licenses.management.commands import import_licenses
+
+        path, exported = self._export("a.ndjson")
+        self._wipe()
+        import_records = import_licenses.Command._import_records
+
+        def dies_on_second_batch(command, batch):
+            if LicenseKey.objects.exists():
+                raise KeyboardInterrupt
+            return import_records(command, batch)
+
+        with mock.patch.object(import_licenses.Command, "_import_records", dies_on_second_batch), \
+                self.assertRaises(KeyboardInterrupt):
+            self._import(path, "--batch-size", "1")
+        self.assertEqual(LicenseKey.objects.count(), 1)
+
+        self.assertIn("imported 2 records", self._import(path, "--batch-size", "1", "--resume"))
+        self.assertEqual(self._export("b.ndjson")[1], exported)
+        self.assertFalse(os.path.exists(f"{path}.checkpoint"))
+
+    def test_errors_after_resume_name_the_physical_line(self):
+        path = os.path.join(self.dir, "gaps.ndjson")
+        good = {"brand": "RankMath", "customer_email": "new@example.com"}
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(json.dumps({**good, "license_key": "lk_gap_1"}) + "\n\n\n")
+            fh.write(json.dumps({**good, "license_key": "lk_gap_2", "customer_email": "new2@example.com"}) + "\n\n")
+            fh.write(json.dumps({**good, "license_key": "lk_gap_3", "licenses": [{"product": "p0"}]}) + "\n")
+        with self.assertRaisesMessage(CommandError, "line 6: each license needs"):
+            self._import(path, "--batch-size", "1")
+        with open(f"{path}.checkpoint", encoding="utf-8") as fh:
+            self.assertEqual(json.load(fh)["line"], 4)
+
+        with self.assertRaisesMessage(CommandError, "line 6: each license needs"):
+            self._import(path, "--batch-size", "1", "--resume")
+
+    def test_malformed_records_name_their_line(self):
+        path = os.path.join(self.dir, "bad.ndjson")
+        good = {"brand": "RankMath", "license_key": "lk_new", "customer_email": "new@example.com"}
+        cases = [
+            ({**good, "licenses": [{"product": "p0"}]}, "line 2: each license needs"),
+            ({**good, "licenses": [{"product": "p0", "expires_at": "soon"}]}, "line 2: invalid datetime"),
+            ({**good, "customer_email": "0@example.com"}, "line 2: 0@example.com already has another license key"),
+        ]
+        for record, message in cases:
+            with self.subTest(message=message):
+                with open(path, "w", encoding="utf-8") as fh:
+                    fh.write(json.dumps({**good, "license_key": "lk_ok", "customer_email": "ok@example.com"}) + "\n")
+                    fh.write(json.dumps(record) + "\n")
+
+                with self.assertRaisesMessage(CommandError, message):
+                    self._import(path)
+                self.assertFalse(LicenseKey.objects.filter(key__in=["lk_ok", "lk_new"]).exists())
+
+
+class ActivationGcTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name="RankMath")
+        product = Product.objects.create(brand=brand, code="rankmath", name="RankMath")
+        cls.lk = LicenseKey.objects.create(brand=brand, customer_email="a@example.com", key="lk_gc")
+        lic = License.objects.create(license_key=cls.lk, product=product, expires_at=timezone.now() + timedelta(days=30))
+        now = timezone.now()
+        for instance_id, revoked_days, seen_days in [
+            ("old1.com", 200, 210), ("old2.com", 100, 150), ("recent.com", 10, 20),
+            ("live.com", None, 1), ("stale.com", None, 60),
+        ]:
+            Activation.objects.create(
+                license=lic, instance_id=instance_id, sent_instance_id=f"https://{instance_id}/",
+                revoked_at=now - timedelta(days=revoked_days) if revoked_days else None,
+                last_seen_at=now - timedelta(days=seen_days),
+            )
+
+    def _instances(self, model=Activation):
+        return sorted(model.objects.values_list("instance_id", flat=True))
+
+    def test_archives_and_deletes_revoked_rows_past_retention(self):
+        batches = []
+        total = archive_revoked(
+            revoked_before=timezone.now() - timedelta(days=90), batch_size=1,
+            on_batch=lambda *args: batches.append(args),
+        )
+
+        self.assertEqual(total, 2)
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(self._instances(), ["live.com", "recent.com", "stale.com"])
+        self.assertEqual(self._instances(ArchivedActivation), ["old1.com", "old2.com"])
+        self.assertEqual(ArchivedActivation.objects.get(instance_id="old1.com").sent_instance_id, "https://old1.com/")
+        self.assertEqual(archive_revoked(revoked_before=timezone.now() - timedelta(days=90)), 0)
+
+    def test_revokes_stale_activations_and_bumps_the_key(self):
+        total = revoke_stale(seen_before=timezone.now() - timedelta(days=30))
+
+        self.assertEqual(total, 1)
+        self.assertIsNotNone(Activation.objects.get(instance_id="stale.com").revoked_at)
+        self.assertIsNone(Activation.objects.get(instance_id="live.com").revoked_at)
+        self.assertEqual(LicenseKey.objects.get(pk=self.lk.pk).version, 2)
+
+    def test_buffered_heartbeat_prevents_revocation(self):
+        self.addCleanup(heartbeats.reset)
+        heartbeats.record("lk_gc", "stale.com")
+
+        total = revoke_stale(seen_before=timezone.now() - timedelta(days=30))
+
+        self.assertEqual(total, 0)
+        self.assertIsNone(Activation.objects.get(instance_id="stale.com").revoked_at)
+        self.assertEqual(heartbeats.pending(), 0)
+
+    def test_stale_window_has_a_floor(self):
+        with self.assertRaises(ValueError):
+            revoke_stale(seen_before=timezone.now() - timedelta(hours=1))
+        with self.assertRaisesMessage(CommandError, "--stale-days must be at least"):
+            call_command("gc_activations", "--stale-days", "1", stdout=StringIO(), stderr=StringIO())
+        self.assertIsNone(Activation.objects.get(instance_id="stale.com").revoked_at)
+
+    def test_command_archives_to_ndjson_file(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "archive.ndjson.gz")
+        out = StringIO()
+        call_command("gc_activations", "--retention-days", "5", "--stale-days", "30",
+                     "--output", path, stdout=out, stderr=StringIO())
+
+        with gzip.open(path, "rt") as fh:
+            archived = [json.loads(line) for line in fh]
+        self.assertEqual(sorted(r["instance_id"] for r in archived), ["old1.com", "old2.com", "recent.com"])
+        self.assertEqual({r["sent_instance_id"] for r in archived}, {f"https://{r['instance_id']}/" for r in archived})
+        self.assertFalse(ArchivedActivation.objects.exists())
+        # revoked just now: kept until it's past retention
+        self.assertEqual(self._instances(), ["live.com", "stale.com"])
+        self.assertIn("rows/s", out.getvalue())
+
+    def test_failed_archive_write_leaves_the_file_and_the_rows(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "archive.ndjson.gz")
+        archive = NdjsonArchive(path)
+        archive([{"id": 1, "instance_id": "earlier.com"}])
+        size = os.path.getsize(path)
+
+        with mock.patch("licenses.management.commands.gc_activations.os.fsync", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                archive_revoked(revoked_before=timezone.now() - timedelta(days=90), archive=archive)
+
+        self.assertEqual(os.path.getsize(path), size)
+        self.assertEqual(self._instances(), ["live.com", "old1.com", "old2.com", "recent.com", "stale.com"])
+
+
+class AsyncViewTests(TransactionTestCase):
+
+    def setUp(self):
+        entitlement_cache.clear_local()
+        entitlement_cache.shared.clear()
+        brand = Brand.objects.create(name="RankMath")
+        product = Product.objects.create(brand=brand, code="rankmath", name="RankMath")
+        self.lk = LicenseKey.objects.create(brand=brand, customer_email="a@example.com", key="lk_async")
+        License.objects.create(license_key=self.lk, product=product, expires_at=timezone.now() + timedelta(days=30))
+
+    async def test_activate_check_deactivate(self):
+        client = AsyncClient()
+
+        resp = await client.post(
+            reverse("activate_async"),
+            {"license_key": self.lk.key, "instance_id": "https://a.com"},
+            content_type="application/json",
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("token", resp.json())
+
+        resp = await client.get(reverse("check_async"), {"license_key": self.lk.key})
+        self.assertEqual(resp.json()["licenses"][0]["active_instances"], ["https://a.com"])
+        etag = resp["ETag"]
+        resp = await client.get(reverse("check_async"), {"license_key": self.lk.key}, headers={"if-none-match": etag})
+        self.assertEqual(resp.status_code, 304)
+
+        resp = await client.post(
+            reverse("deactivate_async"),
+            {"license_key": self.lk.key, "product_code": "rankmath", "instance_id": "https://a.com"},
+            content_type="application/json",
+        )
+        self.assertTrue(resp.json()["deactivated"])
+
+        resp = await client.get(reverse("check_async"), {"license_key": self.lk.key}, headers={"if-none-match": etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["licenses"][0]["active_instances"], [])
+
+
+class RateLimitTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name="RankMath")
+        cls.lk = LicenseKey.objects.create(brand=brand, customer_email="a@example.com", key="lk_limited")
+
+    def setUp(self):
+        rate_limiter.reset()
+        patcher = mock.patch.dict(rate_limiter.rates, {"ip": (5, 60), "license_key": (2, 60)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(rate_limiter.reset)
+
+    def _check(self, key):
+        return self.client.get(reverse("check"), {"license_key": key})
+
+    def test_per_key_limit_rejects_without_queries(self):
+        for _ in range(2):
+            self.assertEqual(self._check(self.lk.key).status_code, 200)
+
+        with self.assertNumQueries(0):
+            resp = self._check(self.lk.key)
+        self.assertEqual(resp.status_code, 429)
+        self.assertGreater(int(resp["Retry-After"]), 0)
+
+        # other keys are unaffected
+        self.assertEqual(self._check("lk_other").status_code, 404)
+        self.assertEqual(rate_limiter.stats()["throttled"], {"license_key": 1})
+
+    def test_per_ip_limit_covers_random_keys(self):
+        for i in range(5):
+            self.assertEqual(self._check(f"lk_guess{i}").status_code, 404)
+
+        with self.assertNumQueries(0):
+            resp = self.client.post(
+                reverse("activate"),
+                {"license_key": "lk_guess9", "instance_id": "https://a.com"},
+                content_type="application/json",
+            )
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(rate_limiter.stats()["throttled"]["ip"], 1)
+
+    def test_spoofed_forwarded_for_shares_the_ip_bucket(self):
+        for i in range(5):
+            resp = self.client.get(reverse("check"), {"license_key": f"lk_guess{i}"}, HTTP_X_FORWARDED_FOR=f"10.0.0.{i}")
+            self.assertEqual(resp.status_code, 404)
+
+        resp = self.client.get(reverse("check"), {"license_key": "lk_guess9"}, HTTP_X_FORWARDED_FOR="10.0.0.9")
+        self.assertEqual(resp.status_code, 429)
+
+    def _check_batch(self, keys):
+        return self.client.post(reverse("check_batch"), {"license_keys": keys}, content_type="application/json")
+
+    def test_batch_check_charges_every_key(self):
+        self.assertEqual(self._check_batch([self.lk.key, "lk_a", "lk_b"]).status_code, 200)
+
+        # the batch spent 3 of the IP's 5 tokens and one of lk_limited's 2
+        self.assertEqual(self._check(self.lk.key).status_code, 200)
+        self.assertEqual(self._check(self.lk.key).status_code, 429)
+        self.assertEqual(self._check_batch(["lk_c", "lk_d"]).status_code, 429)
+        self.assertEqual(rate_limiter.stats()["throttled"], {"license_key": 1, "ip": 1})
+
+    def test_shared_cache_sliding_window(self):
+        window = CacheSlidingWindow()
+        window.prefix = f"lic:rl:test:{time.time()}:"
+
+        self.assertEqual(window.consume("license_key", "lk", 2, 60), 0.0)
+        self.assertEqual(window.consume("license_key", "lk", 2, 60), 0.0)
+        self.assertGreater(window.consume("license_key", "lk", 2, 60), 0.0)
+        self.assertEqual(window.consume("license_key", "lk2", 2, 60), 0.0)
+
+
+class KeyFilterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="RankMath")
+        cls.lk = LicenseKey.objects.create(brand=cls.brand, customer_email="a@example.com", key="lk_known")
+
+    def setUp(self):
+        # one test process: its LocMem cache is shared by every "worker" there is
+        patcher = mock.patch.object(key_filter, "cache_is_shared", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _check(self, key):
+        return self.client.get(reverse("check"), {"license_key": key})
+
+    def test_per_process_cache_never_rejects(self):
+        key_filter.cache_is_shared = False
+
+        self.assertTrue(key_filter.might_exist("lk_never_issued"))
+        self.assertEqual(self._check("lk_never_issued").status_code, 404)  # from the database
+
+    def test_lookups_before_the_build_fall_through_and_build_in_background(self):
+        with mock.patch.object(key_filter, "_bloom", None), \
+                mock.patch.object(key_filter, "build_in_background") as build, \
+                self.assertNumQueries(0):
+            self.assertTrue(key_filter.might_exist("lk_never_issued"))
+        build.assert_called_once_with()
+
+    def test_lookups_never_wait_for_a_running_build(self):
+        # a build holds the lock for its whole table scan
+        scanning, done = threading.Event(), threading.Event()
+
+        def build():
+            with key_filter._build_lock:
+                scanning.set()
+                done.wait(5)
+
+        builder = threading.Thread(target=build)
+        builder.start()
+        self.addCleanup(builder.join)
+        self.addCleanup(done.set)
+        scanning.wait()
+
+        started = time.monotonic()
+        with mock.patch.object(key_filter, "generation", None), self.assertNumQueries(0):
+            self.assertTrue(key_filter.might_exist("lk_never_issued"))
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_unknown_key_is_rejected_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self._check("lk_never_issued").status_code, 404)
+        self.assertEqual(self._check(self.lk.key).status_code, 200)
+
+    def test_bulk_created_keys_are_added(self):
+        LicenseKey.objects.bulk_create([LicenseKey(brand=self.brand, customer_email="b@example.com", key="lk_bulk")])
+
+        self.assertEqual(self._check("lk_bulk").status_code, 200)
+
+    def test_keys_from_other_processes_are_synced(self):
+        # a key this process never heard about, followed by the writer's on-commit bump
+        with mock.patch("licenses.keyfilter.license_keys_created"):
+            LicenseKey.objects.bulk_create([LicenseKey(brand=self.brand, customer_email="c@example.com", key="lk_remote")])
+        key_filter.bump_generation()
+
+        self.assertTrue(key_filter.might_exist("lk_remote"))
+        with self.assertNumQueries(0):
+            self.assertFalse(key_filter.might_exist("lk_still_unknown"))
+
+    def test_bloom_filter_false_positive_rate(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"lk_{i}")
+
+        self.assertTrue(all(f"lk_{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"other_{i}" in bloom for i in range(10_000))
+        self.assertLess(false_positives / 10_000, 0.03)
+
+
+class MetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name="RankMath")
+        product = Product.objects.create(brand=brand, code="rankmath", name="RankMath")
+        cls.lk = LicenseKey.objects.create(brand=brand, customer_email="a@example.com", key="lk_metrics")
+        License.objects.create(license_key=cls.lk, product=product, expires_at=timezone.now() + timedelta(days=30))
+
+    def setUp(self):
+        metrics.reset()
+        entitlement_cache.clear_local()
+        entitlement_cache.shared.clear()
+
+    def test_exposition_per_url_name(self):
+        with self.assertNumQueries(3):
+            self.client.get(reverse("check"), {"license_key": self.lk.key})
+
+        body = self.client.get(reverse("metrics")).content.decode()
+
+        self.assertIn('license_http_requests_total{view="check",status="200"} 1', body)
+        self.assertIn('license_http_request_duration_seconds_count{view="check"} 1', body)
+        self.assertIn('license_db_queries_per_request_sum{view="check"} 3', body)
+        self.assertIn('license_check_cache_requests_total{result="miss"}', body)
+        self.assertNotIn('view="metrics"', body)
+
+    def test_slow_request_log_includes_sql(self):
+        with mock.patch.object(metrics, "slow_request_ms", 0), self.assertLogs("licenses.slow_requests") as logs:
+            self.client.get(reverse("check"), {"license_key": self.lk.key})
+
+        self.assertIn("(check) -> 200", logs.output[0])
+        self.assertIn("licenses_licensekey", logs.output[0])
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    "replica" (license_service/settings_test.py) is a separately migrated
+    database that nothing replicates into, so reads that find nothing went there.
+    """
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        entitlement_cache.clear_local()
+        entitlement_cache.shared.clear()
+        patcher = mock.patch.object(db_routing, "replicas", ["replica"])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.brand = Brand.objects.create(name="RankMath")
+        self.product = Product.objects.create(brand=self.brand, code="rankmath", name="RankMath")
+        self.lk = LicenseKey.objects.create(brand=self.brand, customer_email="a@example.com", key="lk_replica")
+        License.objects.create(license_key=self.lk, product=self.product, expires_at=timezone.now() + timedelta(days=30))
+
+    def _check(self):
+        return self.client.get(reverse("check"), {"license_key": self.lk.key})
+
+    def test_check_reads_replica_until_the_key_writes(self):
+        self.assertEqual(self._check().status_code, 404)  # not on the replica
+
+        self.client.post(
+            reverse("activate"),
+            {"license_key": self.lk.key, "instance_id": "https://a.com"},
+            content_type="application/json",
+        )
+        resp = self._check()  # pinned to the primary
+        self.assertEqual(resp.json()["licenses"][0]["active_instances"], ["https://a.com"])
+
+    def test_replica_reads_are_cached_no_longer_than_the_pin(self):
+        for obj in (self.brand, self.product, self.lk, self.lk.licenses.get()):
+            obj.save(using="replica")
+        self.assertEqual(self._check().status_code, 200)  # from the replica
+
+        self.assertIsNotNone(entitlement_cache.shared.get(entitlement_cache._cache_key(self.lk.key)))
+        later = time.time() + db_routing.pin_seconds + 1
+        entitlement_cache.clear_local()
+        with mock.patch("django.core.cache.backends.locmem.time.time", return_value=later):
+            self.assertIsNone(entitlement_cache.get(self.lk.key))
+
+    def test_by_email_pins_brand_after_provision(self):
+        def listing():
+            resp = self.client.get(reverse("by_email"), {"email": "a@example.com"}, HTTP_X_API_KEY=self.brand.api_key)
+            return resp.json()["results"]
+
+        self.assertEqual(listing(), [])
+        self.client.post(
+            reverse("provision"),
+            {"customer_email": "a@example.com", "product_codes": ["rankmath"]},
+            content_type="application/json",
+            HTTP_X_API_KEY=self.brand.api_key,
+        )
+        self.assertEqual(len(listing()), 1)
+
+    def test_writes_go_to_primary_and_round_robin(self):
+        self.assertEqual(LicenseKey.objects.using("replica").count(), 0)
+        with mock.patch.object(db_routing, "replicas", ["replica", "replica2"]):
+            self.assertEqual([db_routing.choose() for _ in range(4)].count("replica"), 2)
+
+
+class BatchCheckTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name="Agency")
+        products = Product.objects.bulk_create(
+            [Product(brand=brand, code=f"p{i}", name=f"Product {i}") for i in range(3)]
+        )
+        expires_at = timezone.now() + timedelta(days=365)
+        cls.keys = []
+        for i in range(60):
+            lk = LicenseKey.objects.create(brand=brand, customer_email=f"c{i}@example.com", key=LicenseKey.generate_key())
+            License.objects.bulk_create([License(license_key=lk, product=p, expires_at=expires_at) for p in products])
+            cls.keys.append(lk.key)
+        Activation.objects.create(license=License.objects.filter(license_key__key=cls.keys[0]).first(), instance_id="a.com")
+
+    def setUp(self):
+        entitlement_cache.clear_local()
+        entitlement_cache.shared.clear()
+        # every key costs an IP token: don't leave later tests a drained bucket
+        rate_limiter.reset()
+        self.addCleanup(rate_limiter.reset)
+
+    def _post(self, keys):
+        return self.client.post(reverse("check_batch"), {"license_keys": keys}, content_type="application/json")
+
+    def test_query_count_is_constant(self):
+        for n in (1, 60):
+            entitlement_cache.clear_local()
+            entitlement_cache.shared.clear()
+            with self.subTest(keys=n), self.assertNumQueries(3):
+                resp = self._post(self.keys[:n])
+
+            self.assertEqual(resp.status_code, 200)
+            results = resp.json()["results"]
+            self.assertEqual(list(results), self.keys[:n])
+            self.assertTrue(all(r["found"] and len(r["licenses"]) == 3 for r in results.values()))
+
+        self.assertEqual(results[self.keys[0]]["licenses"][0]["active_instances"], ["a.com"])
+
+    def test_unknown_keys_are_reported_inline(self):
+        resp = self._post([self.keys[0], "nope", self.keys[0]])
+
+        self.assertEqual(resp.status_code, 200)
+        results = resp.json()["results"]
+        self.assertEqual(list(results), [self.keys[0], "nope"])
+        self.assertEqual(results["nope"], {"found": False, "detail": "License key not found"})
+
+    def test_cached_keys_skip_the_database(self):
+        self._post(self.keys[:10])
+        entitlement_cache.clear_local()  # shared tier only
+
+        with self.assertNumQueries(3):
+            resp = self._post(self.keys[:20])
+        self.assertEqual(len(resp.json()["results"]), 20)
+
+        with self.assertNumQueries(0):
+            self._post(self.keys[:20])
+        # /check/ reads the same entries
+        with self.assertNumQueries(0):
+            self.client.get(reverse("check"), {"license_key": self.keys[5]})
+
+    def test_batch_size_is_capped(self):
+        resp = self._post([f"k{i}" for i in range(501)])
+        self.assertEqual(resp.status_code, 400)
+
+
+class InstanceLookupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.brand = Brand.objects.create(name="RankMath")
+        other = Brand.objects.create(name="Other")
+        expires_at = timezone.now() + timedelta(days=30)
+        for brand, key in ((cls.brand, "lk_inst_1"), (cls.brand, "lk_inst_2"), (other, "lk_inst_3")):
+            product = Product.objects.create(brand=brand, code=f"p_{key}", name=key)
+            lk = LicenseKey.objects.create(brand=brand, customer_email=f"{key}@example.com", key=key)
+            License.objects.create(license_key=lk, product=product, expires_at=expires_at)
+
+    def _activate(self, key, instance_id):
+        return self.client.post(
+            reverse("activate"), {"license_key": key, "instance_id": instance_id}, content_type="application/json"
+        )
+
+    def _lookup(self, instance_ids, **extra):
+        return self.client.post(
+            reverse("by_instance"), {"instance_ids": instance_ids, **extra},
+            content_type="application/json", HTTP_X_API_KEY=self.brand.api_key,
+        )
+
+    def test_normalize_instance_id(self):
+        for raw, expected in [
+            ("HTTPS://Example.com/Blog/", "example.com/Blog"),
+            ("example.com", "example.com"),
+            ("  http://Example.com//  ", "example.com"),
+            ("Example.com:8080/Shop", "example.com:8080/Shop"),
+            # opaque machine ids keep their case: it may be what tells two apart
+            ("MACHINE-42", "MACHINE-42"),
+            ("ab12Cd-34", "ab12Cd-34"),
+        ]:
+            with self.subTest(raw=raw):
+                self.assertEqual(normalize_instance_id(raw), expected)
+
+    def test_instance_ids_are_stored_normalized_and_echoed_as_sent(self):
+        resp = self._activate("lk_inst_1", "https://Shop.Example.com/")
+
+        self.assertEqual(Activation.objects.get().instance_id, "shop.example.com")
+        # responses and the offline token echo the id as sent, which is what the product compares
+        self.assertEqual(resp.json()["activated"][0]["instance_id"], "https://Shop.Example.com/")
+        verify_token(resp.json()["token"], self.brand.verify_key, instance_id="https://Shop.Example.com/")
+        check = self.client.get(reverse("check"), {"license_key": "lk_inst_1"}).json()
+        self.assertEqual(check["licenses"][0]["active_instances"], ["https://Shop.Example.com/"])
+        self.assertEqual(self._activate("lk_inst_1", "https://").status_code, 400)
+
+        resp = self.client.post(
+            reverse("deactivate"),
+            {"license_key": "lk_inst_1", "product_code": "p_lk_inst_1", "instance_id": "shop.example.com"},
+            content_type="application/json",
+        )
+        self.assertTrue(resp.json()["deactivated"])
+
+    def test_normalizing_migration_merges_duplicates(self):
+        migration = importlib.import_module("licenses.migrations.0011_normalize_instance_ids")
+        lic = License.objects.get(license_key__key="lk_inst_1")
+        now = timezone.now()
+        Activation.objects.bulk_create([
+            Activation(license=lic, instance_id="https://A.com/", revoked_at=now),
+            Activation(license=lic, instance_id="a.com"),
+            Activation(license=lic, instance_id="HTTP://a.com", revoked_at=now),
+            Activation(license=lic, instance_id="MACHINE-X"),
+        ])
+
+        migration.normalize_instance_ids(django_apps, mock.Mock(connection=connections["default"]))
+
+        self.assertEqual(
+            sorted(Activation.objects.values_list("instance_id", "revoked_at")),
+            [("MACHINE-X", None), ("a.com", None)],
+        )
+
+    def test_batch_lookup_is_brand_scoped_and_one_query(self):
+        self._activate("lk_inst_1", "https://a.com")
+        self._activate("lk_inst_2", "a.com/")
+        self._activate("lk_inst_3", "https://a.com")  # another brand
+        self._activate("lk_inst_2", "b.com")
+        self._lookup(["a.com"])  # warm the API key cache
+
+        with self.assertNumQueries(1):
+            resp = self._lookup(["HTTPS://A.com", "b.com", "nowhere.example"])
+
+        results = resp.json()["results"]
+        self.assertEqual(list(results), ["a.com", "b.com", "nowhere.example"])
+        self.assertEqual([r["license_key"] for r in results["a.com"]], ["lk_inst_1", "lk_inst_2"])
+        self.assertEqual(results["b.com"][0]["product"], "p_lk_inst_2")
+        self.assertEqual(results["nowhere.example"], [])
+
+    def test_revoked_activations_on_request(self):
+        self._activate("lk_inst_1", "a.com")
+        Activation.objects.update(revoked_at=timezone.now())
+
+        self.assertEqual(self._lookup(["a.com"]).json()["results"]["a.com"], [])
+        resp = self.client.get(
+            reverse("by_instance"), {"instance_id": "a.com", "include_revoked": "1"}, HTTP_X_API_KEY=self.brand.api_key
+        )
+        self.assertIsNotNone(resp.json()["results"]["a.com"][0]["revoked_at"])
+
+    def test_requires_brand_api_key(self):
+        self.assertIn(self.client.get(reverse("by_instance"), {"instance_id": "a.com"}).status_code, (401, 403))
+
+
+class HeartbeatTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        brand = Brand.objects.create(name="RankMath")
+        product = Product.objects.create(brand=brand, code="rankmath", name="RankMath")
+        cls.keys = []
+        for i in range(3):
+            lk = LicenseKey.objects.create(brand=brand, customer_email=f"h{i}@example.com", key=f"lk_hb_{i}")
+            License.objects.create(license_key=lk, product=product, expires_at=timezone.now() + timedelta(days=30))
+            cls.keys.append(lk.key)
+
+    def setUp(self):
+        heartbeats.reset()
+        entitlement_cache.clear_local()
+        entitlement_cache.shared.clear()
+
+    def _activate(self, key, instance_id):
+        self.client.post(reverse("activate"), {"license_key": key, "instance_id": instance_id},
+                         content_type="application/json")
+
+    def _check(self, key, instance_id):
+        return self.client.get(reverse("check"), {"license_key": key, "instance_id": instance_id})
+
+    def test_activation_sets_last_seen_at(self):
+        self._activate(self.keys[0], "a.com")
+        self.assertIsNotNone(Activation.objects.get().last_seen_at)
+
+    def test_checks_are_coalesced_into_one_update_per_batch(self):
+        for key in self.keys:
+            self._activate(key, "a.com")
+        Activation.objects.update(last_seen_at=None)
+        for key in self.keys:
+            self._check(key, "a.com")  # warm the /check/ cache
+        heartbeats.reset()
+
+        with self.assertNumQueries(0):
+            for _ in range(50):
+                for key in self.keys:
+                    self._check(key, "https://A.com/")
+            self._check(self.keys[0], "nowhere.example")  # not activated: no heartbeat
+
+        self.assertEqual(heartbeats.pending(), 3)
+        with self.assertNumQueries(1):
+            self.assertEqual(heartbeats.flush(), 3)
+        self.assertFalse(Activation.objects.filter(last_seen_at__isnull=True).exists())
+
+    def test_flush_never_moves_last_seen_backwards_or_touches_revoked_rows(self):
+        self._activate(self.keys[0], "a.com")
+        self._activate(self.keys[1], "a.com")
+        latest = Activation.objects.get(license__license_key__key=self.keys[0]).last_seen_at
+        Activation.objects.filter(license__license_key__key=self.keys[1]).update(
+            revoked_at=timezone.now(), last_seen_at=None
+        )
+
+        heartbeats.record(self.keys[0], "a.com", seen=latest - timedelta(minutes=5))
+        heartbeats.record(self.keys[1], "a.com")
+
+        self.assertEqual(heartbeats.flush(), 0)
+        self.assertEqual(Activation.objects.get(license__license_key__key=self.keys[0]).last_seen_at, latest)
+
+    def test_requests_only_record_even_once_due(self):
+        self._activate(self.keys[0], "a.com")
+        self._check(self.keys[0], "a.com")
+
+        with mock.patch.object(heartbeats, "flush_interval", 0), self.assertNumQueries(0):
+            self._check(self.keys[0], "a.com")
+
+        self.assertEqual(heartbeats.pending(), 1)
+        self.assertEqual(heartbeats.stats()["statements"], 0)
+
+    def test_flusher_thread_writes_when_full(self):
+        buffer = HeartbeatBuffer({"FLUSH_INTERVAL": 3600, "MAX_PENDING": 2})
+        written = threading.Event()
+
+        def write(rows):
+            written.set()
+            return len(rows)
+
+        with mock.patch.object(buffer, "_write", write):
+            buffer.start()
+            buffer.record(self.keys[0], "a.com")
+            self.assertFalse(written.wait(0.1))
+            buffer.record(self.keys[1], "a.com")
+            self.assertTrue(written.wait(5))
+
+        self.assertEqual(buffer.pending(), 0)
+
+    def test_flusher_starts_from_ready_only_with_autostart(self):
+        config = django_apps.get_app_config("licenses")
+        with mock.patch.object(heartbeats, "start") as start:
+            config.ready()
+            start.assert_not_called()
+            with mock.patch.object(heartbeats, "autostart", True):
+                config.ready()
+            start.assert_called_once_with()
+
+    def test_forked_child_gets_fresh_locks_event_and_buffer(self):
+        buffer = HeartbeatBuffer()
+        buffer.record(self.keys[0], "a.com")
+        # what a fork mid-flush inherits: held locks and a set event nobody waits on any more
+        buffer._lock.acquire()
+        buffer._flush_lock.acquire()
+        buffer._wake.set()
+
+        with mock.patch.object(buffer, "start") as start:
+            buffer._after_fork()
+
+        self.assertFalse(buffer._lock.locked())
+        self.assertFalse(buffer._flush_lock.locked())
+        self.assertFalse(buffer._wake.is_set())
+        self.assertEqual(buffer.stats(), {"recorded": 0, "pending": 0, "flushed": 0, "statements": 0})
+        start.assert_called_once_with()
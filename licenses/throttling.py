@@ -0,0 +1,238 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    "BACKEND": "local",    # "local": per-process token buckets; "cache": shared, via ALIAS
+    "ALIAS": "default",
+    "RATES": {
+        "ip": "600/min",
+        "license_key": "120/min",
+    },
+    "MAXSIZE": 100_000,    # local backend: buckets kept (LRU)
+}
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """'120/min' -> (120, 60). None disables the scope."""
+    if not rate:
+        return None
+    num, period = rate.split("/")
+    return int(num), PERIODS[period[0]]
+
+
+class LocalTokenBuckets:
+    """
+    One token bucket per (scope, ident), in this process only.
+    Capacity `limit`, refilled at limit/period tokens per second.
+    Bounded (LRU): an evicted ident just starts again with a full bucket.
+    """
+
+    def __init__(self, maxsize=100_000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()  # (scope, ident) -> (tokens, updated_at_monotonic)
+        self._lock = threading.Lock()
+
+    def consume(self, scope, ident, limit, period, cost=1):
+        """Take `cost` tokens. Returns 0.0 if allowed, else seconds until they are available."""
+        now = time.monotonic()
+        refill = limit / period
+        key = (scope, ident)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(limit)
+            else:
+                tokens = min(limit, bucket[0] + (now - bucket[1]) * refill)
+                self._buckets.move_to_end(key)
+
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (cost - tokens) / refill
+
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheSlidingWindow:
+    """
+    Sliding-window counter in a shared Django cache (Redis/Memcached), so the
+    limit holds across workers and hosts. Two fixed-window counters per ident;
+    the previous window is weighted by how much of it still overlaps.
+    add() + incr() are atomic on the real backends; rejected requests count too,
+    so a client that keeps hammering stays throttled.
+    """
+    prefix = "lic:rl:"
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+
+    def consume(self, scope, ident, limit, period, cost=1):
+        cache = caches[self.alias]
+        now = time.time()
+        window, fraction = divmod(now / period, 1)
+        base = f"{self.prefix}{scope}:{hashlib.sha256(ident.encode()).hexdigest()}:"
+        current_key = base + str(int(window))
+
+        cache.add(current_key, 0, timeout=period * 2)
+        try:
+            current = cache.incr(current_key, cost)
+        except ValueError:  # expired between add() and incr()
+            cache.set(current_key, cost, timeout=period * 2)
+            current = cost
+        previous = cache.get(base + str(int(window) - 1), 0)
+
+        if previous * (1 - fraction) + current <= limit:
+            return 0.0
+        if current >= limit or not previous:
+            return (1 - fraction) * period
+        # the previous window's weight has to drop far enough to make room
+        return max(0.0, (1 - (limit - current) / previous - fraction) * period)
+
+    def reset(self):
+        pass  # entries age out on their own
+
+
+class RateLimiter:
+    """
+    Request limiter for the unauthenticated product endpoints, keyed by scope
+    ("ip", "license_key") and identifier. O(1) per request; no database access.
+    Counts allowed/throttled requests per scope (see stats()).
+    """
+
+    def __init__(self, options=None):
+        opts = {**DEFAULTS, **(options or {})}
+        self.enabled = opts["ENABLED"]
+        self.rates = {scope: parse_rate(rate) for scope, rate in opts["RATES"].items()}
+        if opts["BACKEND"] == "cache":
+            self.backend = CacheSlidingWindow(opts["ALIAS"])
+        else:
+            self.backend = LocalTokenBuckets(opts["MAXSIZE"])
+
+        self._lock = threading.Lock()
+        self.allowed = {}
+        self.throttled = {}
+
+    def hit(self, scope, ident, cost=1):
+        """Record one request (worth `cost` requests). Returns seconds to wait; 0.0 means allowed."""
+        rate = self.rates.get(scope)
+        if not self.enabled or rate is None or not ident:
+            return 0.0
+        wait = self.backend.consume(scope, ident, *rate, cost=cost)
+        counts = self.throttled if wait else self.allowed
+        with self._lock:
+            counts[scope] = counts.get(scope, 0) + 1
+        return wait
+
+    async def ahit(self, scope, ident):
+        if isinstance(self.backend, CacheSlidingWindow):
+            return await sync_to_async(self.hit)(scope, ident)
+        return self.hit(scope, ident)  # in-memory, doesn't block the loop
+
+    def stats(self):
+        with self._lock:
+            return {"allowed": dict(self.allowed), "throttled": dict(self.throttled)}
+
+    def reset(self):
+        self.backend.reset()
+        with self._lock:
+            self.allowed.clear()
+            self.throttled.clear()
+
+
+rate_limiter = RateLimiter(getattr(settings, "LICENSE_RATE_LIMIT", None))
+
+
+def throttled_message(wait):
+    return f"Request was throttled. Expected available in {math.ceil(wait)} seconds."
+
+
+class _RateLimiterThrottle(BaseThrottle):
+    scope = None
+
+    def get_limit_ident(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self._wait = rate_limiter.hit(self.scope, self.get_limit_ident(request))
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+class ClientIPRateThrottle(_RateLimiterThrottle):
+    """
+    Per client IP: REMOTE_ADDR, or with REST_FRAMEWORK NUM_PROXIES > 0 the
+    address that many proxies back in X-Forwarded-For. Settings pin
+    NUM_PROXIES to 0 by default; left unset, DRF would trust a client-sent
+    X-Forwarded-For and any client could pick its own ident.
+    """
+    scope = "ip"
+
+    def get_limit_ident(self, request):
+        return self.get_ident(request)
+
+
+class LicenseKeyRateThrottle(_RateLimiterThrottle):
+    """Per license key, from ?license_key= or the request body."""
+    scope = "license_key"
+
+    def get_limit_ident(self, request):
+        key = request.query_params.get("license_key")
+        if key is None and request.method != "GET" and hasattr(request.data, "get"):
+            key = request.data.get("license_key")
+        return key if isinstance(key, str) else None
+
+
+PRODUCT_THROTTLES = [ClientIPRateThrottle, LicenseKeyRateThrottle]
+
+
+class BatchCheckRateThrottle(BaseThrottle):
+    """
+    PRODUCT_THROTTLES for {"license_keys": [...]}: each key in the batch costs
+    what a /check/ for it would, one IP token and one token of its own key's
+    bucket, so batching doesn't multiply either budget.
+    """
+
+    def allow_request(self, request, view):
+        keys = request.data.get("license_keys") if hasattr(request.data, "get") else None
+        if not isinstance(keys, list):
+            keys = []
+        keys = list(dict.fromkeys(k for k in keys if isinstance(k, str)))
+        waits = [rate_limiter.hit("ip", self.get_ident(request), cost=max(len(keys), 1))]
+        waits += [rate_limiter.hit("license_key", key) for key in keys]
+        self._wait = max(waits)
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+async def arate_limit(request, license_key):
+    """
+    The PRODUCT_THROTTLES checks for plain async views. Returns seconds to
+    wait (the longest of the two), 0.0 if the request may proceed.
+    """
+    ip_wait = await rate_limiter.ahit("ip", ClientIPRateThrottle().get_ident(request))
+    key_wait = await rate_limiter.ahit("license_key", license_key if isinstance(license_key, str) else None)
+    return max(ip_wait, key_wait)
@@ -0,0 +1,114 @@
+import threading
+import time
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from license_client import ALGORITHM, SigningKey, sign_token
+from .models import Brand, normalize_instance_id
+
+
+TOKEN_TTL = getattr(settings, "LICENSE_TOKEN_TTL", 3 * 24 * 3600)
+KEY_TTL = getattr(settings, "LICENSE_SIGNING_KEY_TTL", 30)
+
+
+class _SigningKeyCache:
+    """
+    brand name -> SigningKey, for at most `ttl` seconds; also saves re-deriving
+    the public half on every token. Cleared on Brand save/delete (signals.py),
+    which only reaches this process: the TTL is what bounds how long other
+    workers keep signing with a rotated-out key.
+    """
+
+    def __init__(self, ttl=KEY_TTL):
+        self.ttl = ttl
+        self._keys = {}  # brand name -> (expires_at_monotonic, seed, SigningKey)
+        self._lock = threading.Lock()
+
+    def get(self, brand_name):
+        with self._lock:
+            entry = self._keys.get(brand_name)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[2]
+        seed = Brand.objects.filter(name=brand_name).values_list("signing_key", flat=True).first()
+        if seed is None:
+            with self._lock:
+                self._keys.pop(brand_name, None)
+            return None
+        return self._store(brand_name, seed)
+
+    def for_brand(self, brand):
+        """Key of an already loaded Brand: no query, and no stale key either."""
+        with self._lock:
+            entry = self._keys.get(brand.name)
+        if entry is not None and entry[1] == brand.signing_key:
+            return entry[2]
+        return self._store(brand.name, brand.signing_key)
+
+    def _store(self, brand_name, seed):
+        key = SigningKey(seed)
+        with self._lock:
+            self._keys[brand_name] = (time.monotonic() + self.ttl, seed, key)
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+
+signing_keys = _SigningKeyCache()
+
+
+def issue_token(signing_key, *, brand, license_key, instance_id, products, now=None):
+    """
+    signing_key: the brand's license_client.SigningKey (signing_keys.get()).
+    products: iterable of (product_code, expires_at datetime) the instance is entitled to.
+    The refresh deadline is TOKEN_TTL from now, but never past the earliest expiry,
+    so a token can't outlive an entitlement it vouches for.
+    """
+    now = int(time.time() if now is None else now)
+    entitlements = {code: int(expires_at.timestamp()) for code, expires_at in products}
+
+    refresh_deadline = now + TOKEN_TTL
+    if entitlements:
+        refresh_deadline = min(refresh_deadline, min(entitlements.values()))
+
+    return sign_token(
+        {
+            "alg": ALGORITHM,
+            "brand": brand,
+            "key": license_key,
+            "instance": instance_id,
+            "products": entitlements,
+            "iat": now,
+            "rdl": refresh_deadline,
+        },
+        signing_key,
+    )
+
+
+def token_for_check_payload(payload, instance_id):
+    """
+    Token for an instance from a (possibly cached) /check/ payload. Activations
+    are matched on the normalized id (active_instances lists ids as sent); the token carries the id as the product
+    sent it, which is what it verifies against. None when the instance isn't
+    entitled to anything: a token with no products would still verify offline.
+    """
+    normalized = normalize_instance_id(instance_id)
+    products = [
+        (lic["product"], parse_datetime(lic["expires_at"]))
+        for lic in payload["licenses"]
+        if lic["is_active"] and normalized in map(normalize_instance_id, lic["active_instances"])
+    ]
+    if not products:
+        return None
+    signing_key = signing_keys.get(payload["brand"])
+    if signing_key is None:
+        return None
+    return issue_token(
+        signing_key,
+        brand=payload["brand"],
+        license_key=payload["license_key"],
+        instance_id=instance_id,
+        products=products,
+    )
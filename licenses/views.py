@@ -1,18 +1,36 @@
 # licenses/views.py
 
+import base64
+import json
+import time
 from datetime import timedelta
 
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, Prefetch, Value, When
+from django.db.models.functions import Lower
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.http import parse_etags
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 
 from .auth import BrandAPIKeyAuthentication
-from .models import LicenseKey, License, Activation, Product
-from .serializers import ProvisionLicenseSerializer, ActivateSerializer
+from .cache import entitlement_cache, entitlements_changed
+from .heartbeats import heartbeat_from_check
+from .keyfilter import key_filter
+from .lifecycle import apply_bulk_lifecycle, select_licenses
+from .models import LicenseKey, License, Activation, Product, normalize_instance_id
+from .routers import brand_identity, key_identity, read_from_replica
+from .serializers import (
+    ProvisionLicenseSerializer, ActivateSerializer, BatchActivateSerializer, BatchCheckSerializer,
+    BulkProvisionSerializer, BulkProvisionItemSerializer, BulkLifecycleSerializer, InstanceLookupSerializer,
+)
+from .throttling import PRODUCT_THROTTLES, BatchCheckRateThrottle
+from .tokens import issue_token, signing_keys, token_for_check_payload
 
 
 class ProvisionLicenseView(APIView):
@@ -50,11 +68,14 @@ class ProvisionLicenseView(APIView):
                 defaults={
                     "status": License.STATUS_VALID,
                     "expires_at": timezone.now() + timedelta(days=365),
+                    "max_activations": product.max_activations,
                 }
             )
             # If already exists, keep it as-is for now.
             licenses_out.append(lic)
 
+        entitlements_changed(license_key.key)
+
         return Response(
             {
                 "license_key": license_key.key,
@@ -73,50 +94,366 @@ class ProvisionLicenseView(APIView):
         )
 
 
+class BulkProvisionLicenseView(APIView):
+    """
+    Brand back-office batch provisioning: many (customer_email, product_codes) items per call.
+    Products are resolved once, keys and licenses are inserted with bulk_create.
+    Auth: Brand API Key.
+
+    Body:
+      {"items": [{"customer_email": "...", "product_codes": ["rankmath", ...]}, ...]}
+    """
+    authentication_classes = [BrandAPIKeyAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    batch_size = 1000
+
+    @transaction.atomic
+    def post(self, request):
+        brand = request.user.brand
+
+        serializer = BulkProvisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data["items"]
+
+        products_by_code = {p.code: p for p in Product.objects.filter(brand=brand)}
+
+        # Validate each item on its own so one bad row doesn't sink the batch.
+        # One serializer instance is reused: building its fields per item dominates otherwise.
+        item_serializer = BulkProvisionItemSerializer()
+        results = [None] * len(items)
+        wanted = {}  # email -> set(product_id), merged across duplicate items
+        valid_items = []  # (index, email, [product_id])
+        for i, item in enumerate(items):
+            try:
+                data = item_serializer.run_validation(item)
+            except ValidationError as exc:
+                results[i] = {"index": i, "errors": exc.detail}
+                continue
+
+            email = data["customer_email"]
+            codes = data["product_codes"]
+            unknown = sorted({c for c in codes if c not in products_by_code})
+            if unknown:
+                results[i] = {
+                    "index": i,
+                    "errors": {"product_codes": [f"Unknown products for this brand: {', '.join(unknown)}"]},
+                }
+                continue
+
+            product_ids = [products_by_code[c].id for c in dict.fromkeys(codes)]
+            wanted.setdefault(email, set()).update(product_ids)
+            valid_items.append((i, email, product_ids))
+
+        keys_by_email = self._ensure_keys(brand, wanted.keys())
+        products_by_id = {p.id: p for p in products_by_code.values()}
+        licenses = self._ensure_licenses(keys_by_email, wanted, products_by_id)
+
+        for i, email, product_ids in valid_items:
+            lk = keys_by_email[email]
+            results[i] = {
+                "index": i,
+                "license_key": lk.key,
+                "customer_email": email,
+                "licenses": [
+                    {
+                        "product": products_by_id[pid].code,
+                        "status": licenses[(lk.id, pid)].status,
+                        "expires_at": licenses[(lk.id, pid)].expires_at.isoformat(),
+                    }
+                    for pid in product_ids
+                ],
+            }
+
+        entitlements_changed(*(lk.key for lk in keys_by_email.values()))
+
+        failed = sum(1 for r in results if "errors" in r)
+        return Response(
+            {
+                "brand": brand.name,
+                "succeeded": len(results) - failed,
+                "failed": failed,
+                "results": results,
+            },
+            status=status.HTTP_200_OK
+        )
+
+    def _ensure_keys(self, brand, emails):
+        """
+        Return {email: LicenseKey}, creating missing keys in bulk. Keys a
+        concurrent provision inserted first lose to uniq_brand_customer_email
+        and are skipped; the re-read returns theirs.
+        """
+        emails = list(emails)
+        if not emails:
+            return {}
+
+        def fetch():
+            return {
+                lk.customer_email: lk
+                for lk in LicenseKey.objects.filter(brand=brand, customer_email__in=emails)
+            }
+
+        keys = fetch()
+        missing = [e for e in emails if e not in keys]
+        if missing:
+            LicenseKey.objects.bulk_create(
+                [
+                    LicenseKey(brand=brand, customer_email=e, key=LicenseKey.generate_key())
+                    for e in missing
+                ],
+                batch_size=self.batch_size,
+                ignore_conflicts=True,
+            )
+            keys = fetch()
+        return keys
+
+    def _ensure_licenses(self, keys_by_email, wanted, products_by_id):
+        """
+        Return {(license_key_id, product_id): License}, creating missing ones in
+        bulk against uniq_license_key_product, like _ensure_keys().
+        """
+        key_ids = [lk.id for lk in keys_by_email.values()]
+        product_ids = set().union(*wanted.values()) if wanted else set()
+        if not key_ids:
+            return {}
+
+        def fetch():
+            qs = (
+                License.objects
+                .filter(license_key_id__in=key_ids, product_id__in=product_ids)
+                .only("id", "license_key_id", "product_id", "status", "expires_at")
+            )
+            return {(lic.license_key_id, lic.product_id): lic for lic in qs}
+
+        licenses = fetch()
+        expires_at = timezone.now() + timedelta(days=365)
+        to_create = [
+            License(
+                license_key_id=keys_by_email[email].id,
+                product_id=pid,
+                status=License.STATUS_VALID,
+                expires_at=expires_at,
+                max_activations=products_by_id[pid].max_activations,
+            )
+            for email, pids in wanted.items()
+            for pid in pids
+            if (keys_by_email[email].id, pid) not in licenses
+        ]
+        if to_create:
+            License.objects.bulk_create(to_create, batch_size=self.batch_size, ignore_conflicts=True)
+            licenses = fetch()
+        return licenses
+
+
 class ActivateLicenseView(APIView):
     """
     US3 (core): End-user product activates a license key for an instance_id.
-    No auth for this exercise (call out rate limiting + abuse prevention in docs).
+    No auth for this exercise; rate limited per client IP and per key (throttling.py).
     """
+    throttle_classes = PRODUCT_THROTTLES
+
+    @transaction.atomic
     def post(self, request):
         s = ActivateSerializer(data=request.data)
         s.is_valid(raise_exception=True)
 
+        if not key_filter.might_exist(s.validated_data["license_key"]):
+            return Response({"detail": "License key not found"}, status=404)
+
+        lk = LicenseKey.objects.filter(key=s.validated_data["license_key"]).select_related("brand").first()
+        if not lk:
+            return Response({"detail": "License key not found"}, status=404)
+
+        body, status_code = activate_instance(lk, s.validated_data["instance_id"])
+        return Response(body, status=status_code)
+
+
+def activate_instance(lk, instance_id):
+    """
+    Activate all ACTIVE licenses under `lk` for one instance_id. Must run inside a
+    transaction (row locks). Returns (body, status_code); shared by the sync and
+    async activation views. The instance is matched normalized; the response and
+    the offline token carry it as the product sent it, which is what it compares
+    and verifies against.
+    """
+    sent_instance_id, instance_id = instance_id, normalize_instance_id(instance_id)
+    # Activate all ACTIVE licenses under that key (simple + matches “key unlocks multiple products”)
+    active_licenses = lock_active_licenses(lk)
+    if not active_licenses:
+        return {"detail": "No active licenses on this key"}, 403
+
+    active_licenses, rejected = enforce_seat_limits(active_licenses, [instance_id])
+    if not active_licenses:
+        return {"detail": "Activation limit reached", "rejected": rejected}, 409
+
+    # One upsert for all products; idempotent and safe under concurrent identical requests.
+    upsert_activations(active_licenses, {instance_id: sent_instance_id})
+
+    activations = [
+        {"product": lic.product.code, "instance_id": sent_instance_id}
+        for lic in active_licenses
+    ]
+
+    entitlements_changed(lk.key)
+
+    body = {
+        "license_key": lk.key,
+        "customer_email": lk.customer_email,
+        "activated": activations,
+        # verify locally with license_client.verify_token until its refresh deadline
+        "token": issue_token(
+            signing_keys.for_brand(lk.brand),
+            brand=lk.brand.name,
+            license_key=lk.key,
+            instance_id=sent_instance_id,
+            products=[(lic.product.code, lic.expires_at) for lic in active_licenses],
+        ),
+    }
+    if rejected:
+        body["rejected"] = rejected
+    return body, 200
+
+
+def lock_active_licenses(lk):
+    """
+    Active licenses on a key, row-locked (SELECT ... FOR UPDATE) for the rest of
+    the transaction. Locks are per license, so activations on different keys never
+    wait on each other; concurrent activations on the same key queue up here
+    so seat counts can't race.
+    """
+    return list(
+        lk.licenses
+        .select_related("product")
+        .filter(status=License.STATUS_VALID, expires_at__gt=timezone.now())
+        .select_for_update(of=("self",))
+        .order_by("id")
+    )
+
+
+def enforce_seat_limits(licenses, instance_ids):
+    """
+    Split licenses into (allowed, rejected) for activating all `instance_ids`.
+    Instances that are already active don't take a new seat. Call with the
+    licenses locked (lock_active_licenses) so the count can't change under us.
+    """
+    limited = [lic for lic in licenses if lic.max_activations is not None]
+    if not limited:
+        return licenses, []
+
+    # seats held by *other* instances, per license, in one query
+    others = dict(
+        Activation.objects
+        .filter(license__in=limited, revoked_at__isnull=True)
+        .exclude(instance_id__in=instance_ids)
+        .values("license_id")
+        .annotate(n=Count("id"))
+        .values_list("license_id", "n")
+    )
+
+    allowed, rejected = [], []
+    for lic in licenses:
+        if lic.max_activations is not None and others.get(lic.id, 0) + len(instance_ids) > lic.max_activations:
+            rejected.append({
+                "product": lic.product.code,
+                "max_activations": lic.max_activations,
+                "detail": "Activation limit reached",
+            })
+        else:
+            allowed.append(lic)
+    return allowed, rejected
+
+
+def upsert_activations(licenses, instance_ids):
+    """
+    Activate every (license, instance_id) pair in one statement: insert new rows and
+    clear revoked_at on rows that were previously deactivated. instance_ids maps
+    normalized id -> id as sent, which is stored for responses to echo. An
+    activation is also a heartbeat; it's written here directly since the row is
+    written anyway.
+    """
+    now = timezone.now()
+    rows = [
+        Activation(license=lic, instance_id=instance_id, sent_instance_id=sent,
+                   revoked_at=None, last_seen_at=now)
+        for lic in licenses
+        for instance_id, sent in instance_ids.items()
+    ]
+    if not rows:
+        return
+
+    if connection.features.supports_update_conflicts_with_target:
+        # INSERT ... ON CONFLICT (license_id, instance_id) DO UPDATE SET revoked_at = NULL, ...
+        Activation.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["license", "instance_id"],
+            update_fields=["sent_instance_id", "revoked_at", "last_seen_at"],
+        )
+        return
+
+    Activation.objects.bulk_create(rows, ignore_conflicts=True)
+    Activation.objects.filter(
+        license__in=licenses,
+        instance_id__in=list(instance_ids),
+    ).update(
+        revoked_at=None,
+        last_seen_at=now,
+        sent_instance_id=Case(
+            *[When(instance_id=iid, then=Value(sent)) for iid, sent in instance_ids.items()],
+            default=F("sent_instance_id"),
+        ),
+    )
+
+
+class BatchActivateLicenseView(APIView):
+    """
+    Fleet activation: one license key on many instance_ids in a single call
+    (agencies / hosting partners). Same rules as ActivateLicenseView.
+    No auth for this exercise.
+    """
+    throttle_classes = PRODUCT_THROTTLES
+
+    @transaction.atomic
+    def post(self, request):
+        s = BatchActivateSerializer(data=request.data)
+        s.is_valid(raise_exception=True)
+
+        if not key_filter.might_exist(s.validated_data["license_key"]):
+            return Response({"detail": "License key not found"}, status=404)
+
         lk = LicenseKey.objects.filter(key=s.validated_data["license_key"]).first()
         if not lk:
             return Response({"detail": "License key not found"}, status=404)
 
-        # Activate all ACTIVE licenses under that key (simple + matches “key unlocks multiple products”)
-        active_licenses = [
-            lic for lic in lk.licenses.select_related("product").all()
-            if lic.is_active()
-        ]
+        active_licenses = lock_active_licenses(lk)
         if not active_licenses:
             return Response({"detail": "No active licenses on this key"}, status=403)
 
-        instance_id = s.validated_data["instance_id"]
-        activations = []
-        for lic in active_licenses:
-            act, _created = Activation.objects.get_or_create(
-                license=lic,
-                instance_id=instance_id,
-                defaults={"revoked_at": None},
-            )
-            # If it existed but was revoked previously, un-revoke it.
-            if act.revoked_at is not None:
-                act.revoked_at = None
-                act.save(update_fields=["revoked_at"])
+        # normalized -> as sent; the first spelling of an instance wins
+        instance_ids = {}
+        for sent in s.validated_data["instance_ids"]:
+            instance_ids.setdefault(normalize_instance_id(sent), sent)
+        active_licenses, rejected = enforce_seat_limits(active_licenses, list(instance_ids))
+        if not active_licenses:
+            return Response({"detail": "Activation limit reached", "rejected": rejected}, status=409)
 
-            activations.append({"product": lic.product.code, "instance_id": instance_id})
+        upsert_activations(active_licenses, instance_ids)
 
-        return Response(
-            {
-                "license_key": lk.key,
-                "customer_email": lk.customer_email,
-                "activated": activations,
-            },
-            status=200
-        )
+        entitlements_changed(lk.key)
+
+        body = {
+            "license_key": lk.key,
+            "customer_email": lk.customer_email,
+            "activated": [
+                {"product": lic.product.code, "instance_id": sent}
+                for lic in active_licenses
+                for sent in instance_ids.values()
+            ],
+        }
+        if rejected:
+            body["rejected"] = rejected
+        return Response(body, status=200)
 
 
 class DeactivateLicenseView(APIView):
@@ -124,17 +461,25 @@ class DeactivateLicenseView(APIView):
     US5 (optional): End-user product/customer can deactivate an activation for a product+instance_id.
     No auth for this exercise.
     """
+    throttle_classes = PRODUCT_THROTTLES
+
     def post(self, request):
         license_key = request.data.get("license_key")
         product_code = request.data.get("product_code")
         instance_id = request.data.get("instance_id")
 
+        if instance_id:
+            # matched normalized, echoed as sent
+            sent_instance_id, instance_id = str(instance_id), normalize_instance_id(str(instance_id))
         if not license_key or not product_code or not instance_id:
             return Response(
                 {"detail": "license_key, product_code and instance_id are required"},
                 status=400
             )
 
+        if not key_filter.might_exist(license_key):
+            return Response({"detail": "License key not found"}, status=404)
+
         lk = LicenseKey.objects.filter(key=license_key).first()
         if not lk:
             return Response({"detail": "License key not found"}, status=404)
@@ -160,7 +505,7 @@ class DeactivateLicenseView(APIView):
                 {
                     "license_key": lk.key,
                     "product": product_code,
-                    "instance_id": instance_id,
+                    "instance_id": sent_instance_id,
                     "deactivated": False,
                     "detail": "No active activation found"
                 },
@@ -169,12 +514,13 @@ class DeactivateLicenseView(APIView):
 
         act.revoked_at = timezone.now()
         act.save(update_fields=["revoked_at"])
+        entitlements_changed(lk.key)
 
         return Response(
             {
                 "license_key": lk.key,
                 "product": product_code,
-                "instance_id": instance_id,
+                "instance_id": sent_instance_id,
                 "deactivated": True,
                 "revoked_at": act.revoked_at.isoformat(),
             },
@@ -182,50 +528,233 @@ class DeactivateLicenseView(APIView):
         )
 
 
+def check_queryset():
+    """
+    Fixed query plan regardless of how many products are on the key:
+      1) key + brand  2) licenses + products  3) unrevoked activations
+    """
+    return (
+        LicenseKey.objects
+        .select_related("brand")
+        .prefetch_related(
+            Prefetch(
+                "licenses",
+                queryset=License.objects.select_related("product").prefetch_related(
+                    Prefetch(
+                        "activations",
+                        queryset=Activation.objects
+                        .filter(revoked_at__isnull=True)
+                        .only("id", "license_id", "instance_id", "sent_instance_id"),
+                        to_attr="active_activations",
+                    )
+                ),
+            )
+        )
+    )
+
+
+def build_check_payload(key):
+    """
+    Build the cached /check/ entry for a license key: {"etag": ..., "payload": ...}.
+    Returns (entry, cache_timeout) or (None, None) if the key does not exist.
+    """
+    return check_entry(check_queryset().filter(key=key).first())
+
+
+def check_entry(lk):
+    """
+    (entry, cache_timeout) for a LicenseKey loaded via check_queryset(), or (None, None).
+    The timeout is capped at the next expiry so `is_active` never goes stale.
+    """
+    if not lk:
+        return None, None
+    licenses = [
+        (lic.product.code, lic.status, lic.expires_at, [act.sent_instance_id or act.instance_id for act in lic.active_activations])
+        for lic in lk.licenses.all()
+    ]
+    return make_check_entry(lk.key, lk.version, lk.brand.name, lk.customer_email, licenses)
+
+
+def make_check_entry(key, version, brand_name, customer_email, licenses):
+    """licenses: [(product_code, status, expires_at, active_instances)] -> (entry, cache_timeout)."""
+    now = timezone.now()
+    next_expiry = None
+    licenses_out = []
+    for product_code, lic_status, expires_at, active_instances in licenses:
+        if expires_at > now and (next_expiry is None or expires_at < next_expiry):
+            next_expiry = expires_at
+
+        licenses_out.append(
+            {
+                "product": product_code,
+                "status": lic_status,
+                "expires_at": expires_at.isoformat(),
+                "is_active": lic_status == License.STATUS_VALID and expires_at > now,  # License.is_active()
+                # NEW: what the product actually cares about
+                "is_activated": len(active_instances) > 0,
+                "active_instances": active_instances,
+            }
+        )
+
+    payload = {
+        "license_key": key,
+        "brand": brand_name,
+        "customer_email": customer_email,
+        "licenses": licenses_out,
+    }
+    timeout = int((next_expiry - now).total_seconds()) if next_expiry else None
+    return {"etag": make_check_etag(version, next_expiry), "payload": payload}, timeout
+
+
+def check_entries(keys):
+    """
+    {key: (entry, cache_timeout)} for the existing keys among `keys`, from three
+    IN (...) queries: keys + brands, licenses + products, unrevoked activations.
+    Reads plain rows; model instances would cost more than the SQL at this size.
+    """
+    rows = list(
+        LicenseKey.objects.filter(key__in=keys)
+        .values_list("id", "key", "version", "brand__name", "customer_email")
+    )
+    if not rows:
+        return {}
+    licenses_by_key = {key_id: [] for key_id, *_ in rows}
+    licenses = {}
+    for lic_id, key_id, code, lic_status, expires_at in (
+        License.objects.filter(license_key_id__in=licenses_by_key)
+        .order_by("id")
+        .values_list("id", "license_key_id", "product__code", "status", "expires_at")
+    ):
+        licenses[lic_id] = (code, lic_status, expires_at, [])
+        licenses_by_key[key_id].append(licenses[lic_id])
+    if licenses:
+        for lic_id, instance_id, sent_instance_id in (
+            Activation.objects.filter(license_id__in=licenses, revoked_at__isnull=True)
+            .order_by("id")
+            .values_list("license_id", "instance_id", "sent_instance_id")
+        ):
+            licenses[lic_id][3].append(sent_instance_id or instance_id)
+    return {
+        key: make_check_entry(key, version, brand_name, email, licenses_by_key[key_id])
+        for key_id, key, version, brand_name, email in rows
+    }
+
+
+def make_check_etag(version, next_expiry):
+    """
+    Strong ETag for /check/: the key's version plus the moment the payload goes stale
+    on its own (next expires_at, 0 = never). Freshness can then be decided from the
+    ETag and the current version alone.
+    """
+    return f'"{version}-{int(next_expiry.timestamp()) if next_expiry else 0}"'
+
+
+def etag_still_fresh(etag, version):
+    try:
+        etag_version, stale_at = (int(part) for part in etag.strip('"').split("-"))
+    except ValueError:
+        return False
+    return etag_version == version and (stale_at == 0 or time.time() < stale_at)
+
+
 class CheckLicenseKeyView(APIView):
     """
     US4 (core): Check what a license key unlocks + statuses + expiry + activations.
+    Read-through cached (see licenses/cache.py); writers invalidate by key.
+    With ?instance_id=..., also returns a signed offline token for that instance.
+    Plain checks carry an ETag; a matching If-None-Match gets a 304 decided from
+    the key's version alone (no licenses/activations loaded).
     """
+    throttle_classes = PRODUCT_THROTTLES
+
     def get(self, request):
         key = request.query_params.get("license_key")
         if not key:
             return Response({"detail": "license_key query param is required"}, status=400)
-
-        lk = LicenseKey.objects.filter(key=key).first()
-        if not lk:
+        if not key_filter.might_exist(key):
+            # definitely not a key we issued (guessing, typos): no cache or DB work
             return Response({"detail": "License key not found"}, status=404)
+        read_from_replica(key_identity(key))
 
-        licenses = lk.licenses.select_related("product", "product__brand").all()
+        instance_id = request.query_params.get("instance_id")
+        # tokens are time-bound, so token requests always get a fresh body
+        client_etags = [] if instance_id else parse_etags(request.headers.get("If-None-Match", ""))
 
-        licenses_out = []
-        for lic in licenses:
-            active_instances = list(
-                Activation.objects.filter(
-                    license=lic,
-                    revoked_at__isnull=True
-                ).values_list("instance_id", flat=True)
-            )
+        entry, generation = entitlement_cache.lookup(key)
+        if entry is None and client_etags:
+            version = LicenseKey.objects.filter(key=key).values_list("version", flat=True).first()
+            if version is None:
+                return Response({"detail": "License key not found"}, status=404)
+            for etag in client_etags:
+                if etag_still_fresh(etag, version):
+                    return Response(status=304, headers={"ETag": etag})
 
-            licenses_out.append(
-                {
-                    "product": lic.product.code,
-                    "status": lic.status,
-                    "expires_at": lic.expires_at.isoformat(),
-                    "is_active": lic.is_active(),
-                    # NEW: what the product actually cares about
-                    "is_activated": len(active_instances) > 0,
-                    "active_instances": active_instances,
-                }
-            )
+        if entry is None:
+            entry, timeout = build_check_payload(key)
+            if entry is None:
+                return Response({"detail": "License key not found"}, status=404)
+            entitlement_cache.set(key, entry, timeout, generation)
 
-        return Response(
-            {
-                "license_key": lk.key,
-                "brand": lk.brand.name,
-                "customer_email": lk.customer_email,
-                "licenses": licenses_out,
-            }
-        )
+        if instance_id:
+            payload = entry["payload"]
+            heartbeat_from_check(payload, instance_id)
+            return Response({**payload, "token": token_for_check_payload(payload, instance_id)})
+
+        # cached entries never outlive their next expiry, so a match is still fresh
+        if entry["etag"] in client_etags:
+            return Response(status=304, headers={"ETag": entry["etag"]})
+        return Response(entry["payload"], headers={"ETag": entry["etag"]})
+
+
+class BatchCheckLicenseKeyView(APIView):
+    """
+    /check/ for many keys in one call (brand dashboards, agency tools).
+    Cached entries come from one shared-cache round trip; the rest load with
+    check_entries()' three IN (...) queries however many keys miss.
+    Unknown keys are reported inline, not as errors.
+
+    Body:
+      {"license_keys": ["...", ...]}   (up to 500)
+
+    Rate limited per key, not per call (BatchCheckRateThrottle).
+    """
+    throttle_classes = [BatchCheckRateThrottle]
+
+    def post(self, request):
+        s = BatchCheckSerializer(data=request.data)
+        s.is_valid(raise_exception=True)
+        keys = list(dict.fromkeys(s.validated_data["license_keys"]))
+
+        candidates = [k for k in keys if key_filter.might_exist(k)]
+        read_from_replica(*(key_identity(k) for k in candidates))
+
+        entries, generations = entitlement_cache.lookup_many(candidates)
+        if generations:
+            built = check_entries(list(generations))
+            entitlement_cache.set_many(built, generations)
+            entries.update((key, entry) for key, (entry, _) in built.items())
+
+        results = {}
+        for key in keys:
+            entry = entries.get(key)
+            if entry is None:
+                results[key] = {"found": False, "detail": "License key not found"}
+            else:
+                results[key] = {"found": True, **entry["payload"]}
+        return Response({"results": results})
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(f"lk:{last_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Opaque keyset cursor -> last LicenseKey.id seen. Raises ValueError if malformed."""
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    prefix, _, last_id = raw.partition(":")
+    if prefix != "lk":
+        raise ValueError("bad cursor")
+    return int(last_id)
 
 
 class ListLicensesByEmailView(APIView):
@@ -233,38 +762,136 @@ class ListLicensesByEmailView(APIView):
     US6 (core): Brand-only internal list across all brands by email.
     In prod: internal service token / admin auth + audit logging.
     For the exercise: protect with Brand API key + IsAuthenticated.
+
+    Email matching is case-insensitive (backed by the lower(customer_email) index).
+    Keyset-paginated on LicenseKey.id: ?limit=N&cursor=<next_cursor>.
+    ?stream=1 (or Accept: application/x-ndjson) streams every key as NDJSON instead.
     """
     authentication_classes = [BrandAPIKeyAuthentication]
     permission_classes = [IsAuthenticated]
 
+    default_limit = 100
+    max_limit = 1000
+    stream_chunk_size = 500
+
     def get(self, request):
         email = request.query_params.get("email")
         if not email:
             return Response({"detail": "email query param is required"}, status=400)
+        read_from_replica(brand_identity(request.auth))
 
         keys = (
             LicenseKey.objects
-            .filter(customer_email=email)
+            .alias(email_lower=Lower("customer_email"))
+            .filter(email_lower=email.lower())
             .select_related("brand")
             .prefetch_related("licenses__product")
+            .order_by("id")
         )
 
-        out = []
-        for lk in keys:
-            out.append({
-                "brand": lk.brand.name,
-                "license_key": lk.key,
-                "licenses": [
-                    {
-                        "product": lic.product.code,
-                        "status": lic.status,
-                        "expires_at": lic.expires_at.isoformat(),
-                    }
-                    for lic in lk.licenses.all()
-                ]
-            })
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            try:
+                keys = keys.filter(id__gt=decode_cursor(cursor))
+            except ValueError:
+                return Response({"detail": "Invalid cursor"}, status=400)
+
+        if request.query_params.get("stream") or "application/x-ndjson" in request.headers.get("Accept", ""):
+            return self._stream(keys)
 
-        return Response({"email": email, "results": out})
+        try:
+            limit = min(int(request.query_params.get("limit", self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({"detail": "limit must be an integer"}, status=400)
+        if limit < 1:
+            return Response({"detail": "limit must be positive"}, status=400)
+
+        page = list(keys[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        return Response({
+            "email": email,
+            "results": [self._serialize(lk) for lk in page],
+            "next_cursor": encode_cursor(page[-1].id) if has_more else None,
+        })
+
+    def _serialize(self, lk):
+        return {
+            "brand": lk.brand.name,
+            "license_key": lk.key,
+            "licenses": [
+                {
+                    "product": lic.product.code,
+                    "status": lic.status,
+                    "expires_at": lic.expires_at.isoformat(),
+                }
+                for lic in lk.licenses.all()
+            ]
+        }
+
+    def _stream(self, keys):
+        def lines():
+            # chunked iterator: prefetches run per chunk, the full set never sits in memory
+            for lk in keys.iterator(chunk_size=self.stream_chunk_size):
+                yield json.dumps(self._serialize(lk), separators=(",", ":")) + "\n"
+
+        return StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+
+
+class ListActivationsByInstanceView(APIView):
+    """
+    Support / fraud tooling: which of this brand's licenses are activated on
+    these sites/machines. Instance ids are normalized like at activation time,
+    so this is one exact-match IN (...) on the instance_id index, joined to the
+    license, key and product; ids with no activations come back with [].
+
+      GET  ?instance_id=a.com&instance_id=b.com[&include_revoked=1]
+      POST {"instance_ids": [...], "include_revoked": false}   (up to 1000)
+
+    Auth: Brand API Key; only the calling brand's licenses are returned.
+    """
+    authentication_classes = [BrandAPIKeyAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return self._lookup(request, {
+            "instance_ids": request.query_params.getlist("instance_id"),
+            "include_revoked": request.query_params.get("include_revoked", False),
+        })
+
+    def post(self, request):
+        return self._lookup(request, request.data)
+
+    def _lookup(self, request, data):
+        s = InstanceLookupSerializer(data=data)
+        s.is_valid(raise_exception=True)
+        instance_ids = list(dict.fromkeys(s.validated_data["instance_ids"]))
+        read_from_replica(brand_identity(request.auth))
+
+        activations = Activation.objects.filter(
+            instance_id__in=instance_ids,
+            license__license_key__brand=request.user.brand,
+        )
+        if not s.validated_data["include_revoked"]:
+            activations = activations.filter(revoked_at__isnull=True)
+
+        results = {instance_id: [] for instance_id in instance_ids}
+        for row in activations.order_by("id").values(
+            "instance_id", "created_at", "revoked_at",
+            "license__license_key__key", "license__license_key__customer_email",
+            "license__product__code", "license__status", "license__expires_at",
+        ):
+            results[row["instance_id"]].append({
+                "license_key": row["license__license_key__key"],
+                "customer_email": row["license__license_key__customer_email"],
+                "product": row["license__product__code"],
+                "status": row["license__status"],
+                "expires_at": row["license__expires_at"].isoformat(),
+                "activated_at": row["created_at"].isoformat(),
+                "revoked_at": row["revoked_at"].isoformat() if row["revoked_at"] else None,
+            })
+        return Response({"results": results})
 
 
 class LicenseLifecycleView(APIView):
@@ -313,8 +940,8 @@ class LicenseLifecycleView(APIView):
             lic.status = License.STATUS_SUSPENDED
             lic.save(update_fields=["status"])
         elif action == "resume":
-            # only resume if it wasn't cancelled
-            if lic.status != License.STATUS_CANCELLED:
+            # only resume if it wasn't cancelled (or expired: that takes a renew)
+            if lic.status not in (License.STATUS_CANCELLED, License.STATUS_EXPIRED):
                 lic.status = License.STATUS_VALID
                 lic.save(update_fields=["status"])
         elif action == "cancel":
@@ -334,6 +961,8 @@ class LicenseLifecycleView(APIView):
         else:
             return Response({"detail": "Unknown action"}, status=400)
 
+        entitlements_changed(lk.key)
+
         return Response(
             {
                 "license_key": lk.key,
@@ -344,3 +973,59 @@ class LicenseLifecycleView(APIView):
             },
             status=200
         )
+
+
+class BulkLicenseLifecycleView(APIView):
+    """
+    Brand-wide suspend/resume/cancel/renew campaigns as set-based UPDATEs in bounded batches.
+    Auth: Brand API Key. For runs in the hundreds of thousands prefer
+    `manage.py bulk_lifecycle`, which uses the same code path without an HTTP timeout.
+
+    Body:
+      {
+        "action": "suspend" | "resume" | "cancel" | "renew",
+        "extend_days": 365,          # renew only
+        "dry_run": false,            # only count what would change
+        "items": [{"license_key": "lk_...", "product_code": "rankmath"}, ...]
+        # or, with at least one criterion
+        "filter": {"product_code": "...", "status": "valid",
+                   "expires_before": "2026-01-01T00:00:00Z", "expires_after": "..."}
+        # or, for every license of the brand
+        "filter": {"all": true}
+      }
+    """
+    authentication_classes = [BrandAPIKeyAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    batch_size = 1000
+
+    def post(self, request):
+        brand = request.user.brand
+
+        s = BulkLifecycleSerializer(data=request.data)
+        s.is_valid(raise_exception=True)
+        data = s.validated_data
+
+        if "items" in data:
+            qs = select_licenses(brand, items=data["items"])
+        else:
+            criteria = dict(data["filter"])
+            qs = select_licenses(brand, all_licenses=criteria.pop("all"), **criteria)
+
+        result = apply_bulk_lifecycle(
+            qs,
+            data["action"],
+            extend_days=data["extend_days"],
+            batch_size=self.batch_size,
+            dry_run=data["dry_run"],
+        )
+
+        return Response(
+            {
+                "brand": brand.name,
+                "action": data["action"],
+                "dry_run": data["dry_run"],
+                **result,
+            },
+            status=200
+        )
@@ -4,6 +4,8 @@ import sys
 
 
 def main():
+    if sys.argv[1:2] == ["test"]:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "license_service.settings_test")
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "license_service.settings")
     try:
         from django.core.management import execute_from_command_line